@@ -7,8 +7,14 @@ import asyncio
 import json
 import sys
 import os
+import atexit
 import base64
-from typing import Any, Dict, List, Optional
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Any, Dict, Iterator, List, Optional
 
 # 手动读取.env文件
 def load_env_file():
@@ -31,57 +37,277 @@ def load_env_file():
     except Exception as e:
         print(f"读取.env文件时出错: {e}", file=sys.stderr)
 
-# 加载环境变量
-load_env_file()
+# 加载环境变量（spawn工作进程以__mp_main__导入本模块时，环境变量已从服务器进程继承）
+if __name__ == "__main__":
+    load_env_file()
+
+from tools.github_cache import ResponseCache, SingleFlight
+from tools.csv_lookup import CHUNK_SIZE, CSVIndexCache, build_csv_index, iter_csv_pairs
+from tools.local_mirror import LocalRepoMirror
+from tools.metrics import metrics, start_exporters
+from tools.progress import RequestCancelled, RequestContext, bind, cancellable, report_progress, unbind
+from tools.rate_limiter import RateLimitScheduler
+from tools.result_pages import PagedResult, format_page, result_store
+from tools.tool_result import (
+    EncodedResponse, ToolError, ToolResult, as_bool, build_call_result, encode_json,
+    pop_output_options
+)
 
 # GitHub API 客户端类（简化版，使用requests同步调用）
 class GitHubClient:
-    def __init__(self, token: str):
+    # contents API 以raw媒体类型返回的文件大小上限，超过时改用blobs API
+    CONTENTS_RAW_LIMIT = 100 * 1024 * 1024
+    RAW_MEDIA_TYPE = "application/vnd.github.raw"
+
+    def __init__(self, token: str, base_url: str = None, pool_size: int = None,
+                 cache: ResponseCache = None, scheduler: RateLimitScheduler = None,
+                 single_flight: bool = True):
         self.token = token
-        self.base_url = "https://api.github.com"
+        self.base_url = (base_url or os.getenv("GITHUB_API_URL", "https://api.github.com")).rstrip('/')
+        self.pool_size = pool_size or int(os.getenv("GITHUB_POOL_SIZE", "10"))
         self.headers = {
             "Authorization": f"Bearer {token}",
             "Accept": "application/vnd.github.v3+json",
-            "User-Agent": "MCP-GitHub-Client/1.0"
+            "User-Agent": "MCP-GitHub-Client/1.0",
+            "Connection": "keep-alive"
         }
-    
-    def search_files(self, repo: str, filename: str) -> List[Dict]:
-        """搜索仓库中的文件（同步版本）"""
+        self.session = self._create_session()
+        # 响应缓存（None表示不缓存）
+        self.cache = cache
+        # 限流调度器（None表示直接发送请求）
+        self.scheduler = scheduler
+        # 合并并发的相同请求（None表示不合并）
+        self.single_flight = SingleFlight() if single_flight else None
+
+    def _create_session(self):
+        """创建带连接池的HTTP会话，复用TCP/TLS连接"""
         try:
             import requests
-            search_url = f"{self.base_url}/search/code"
-            params = {
-                "q": f"filename:{filename} repo:{repo}",
-                "per_page": 10
-            }
-            
-            response = requests.get(search_url, headers=self.headers, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('items', [])
-            else:
-                raise Exception(f"GitHub API错误: {response.status_code} - {response.text}")
+            from requests.adapters import HTTPAdapter
         except ImportError:
             raise Exception("需要安装requests库: pip install requests")
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(self.headers)
+        return session
+
+    def close(self):
+        """关闭会话并释放连接池"""
+        self.session.close()
+
+    def _get(self, url: str, params: Dict = None, headers: Dict = None, stream: bool = False):
+        """通过共享会话发送GET请求，启用调度器时排队并在限流时重试"""
+        def send():
+            response = self.session.get(url, params=params, headers=headers, stream=stream)
+            metrics.count('github_requests', endpoint=RateLimitScheduler.classify(url),
+                          status=response.status_code)
+            return response
+        if self.scheduler is None:
+            return send()
+        return self.scheduler.request(url, send)
+
+    def _get_json(self, url: str, params: Dict, cache_key: str, error_prefix: str):
+        """
+        获取JSON响应，并发的相同请求（方法+URL+参数）共享同一次上游调用
+
+        返回的数据可能被多个调用方共享，调用方不应修改。
+        """
+        def fetch():
+            return self._fetch_json(url, params, cache_key, error_prefix)
+        if self.single_flight is None:
+            return fetch()
+        key = ("GET", url, tuple(sorted((params or {}).items())))
+        return self.single_flight.do(key, fetch)
+
+    def _fetch_json(self, url: str, params: Dict, cache_key: str, error_prefix: str):
+        """
+        获取JSON响应，启用缓存时使用ETag条件请求
+
+        缓存新鲜时不发请求；过期时携带If-None-Match，304直接复用缓存数据。
+        """
+        entry = None
+        if self.cache is not None:
+            fresh, entry = self.cache.lookup(cache_key)
+            if fresh:
+                return entry['data']
+
+        headers = None
+        if entry is not None and entry.get('etag'):
+            headers = {"If-None-Match": entry['etag']}
+
+        response = self._get(url, params=params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            revalidated = self.cache.revalidate(cache_key)
+            if revalidated is not None:
+                return revalidated['data']
+            # 条件请求期间条目已被淘汰，重新发送不带If-None-Match的请求
+            response = self._get(url, params=params)
+        if response.status_code == 200:
+            data = response.json()
+            if self.cache is not None:
+                self.cache.store(cache_key, response.headers.get('ETag'), data, size=len(response.content))
+            return data
+        raise Exception(f"{error_prefix}: {response.status_code} - {response.text}")
+    
+    def search_files(self, repo: str, filename: str) -> List[Dict]:
+        """搜索仓库中的文件（同步版本）"""
+        search_url = f"{self.base_url}/search/code"
+        params = {
+            "q": f"filename:{filename} repo:{repo}",
+            "per_page": 10
+        }
+        
+        cache_key = ResponseCache.make_key(repo, f"search:{filename}")
+        data = self._get_json(search_url, params, cache_key, "GitHub API错误")
+        return data.get('items', [])
     
     def get_file_content(self, repo: str, path: str, ref: str = "main") -> Dict:
         """获取文件内容（同步版本）"""
-        import requests
         url = f"{self.base_url}/repos/{repo}/contents/{path}"
         params = {"ref": ref}
         
-        response = requests.get(url, headers=self.headers, params=params)
-        if response.status_code == 200:
-            return response.json()
+        cache_key = ResponseCache.make_key(repo, path, ref)
+        return self._get_json(url, params, cache_key, "获取文件失败")
+
+    def list_directory(self, repo: str, path: str = "") -> List[Dict]:
+        """列出仓库目录内容（同步版本）"""
+        url = f"{self.base_url}/repos/{repo}/contents/{path}"
+
+        cache_key = ResponseCache.make_key(repo, f"dir:{path}")
+        return self._get_json(url, None, cache_key, "获取文件列表失败")
+
+    def stream_file_content(self, repo: str, path: str, ref: str = "main",
+                            sha: str = None, size: int = None,
+                            chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        以raw媒体类型流式获取文件内容，按块产出字节（不做base64解码，不缓存）
+
+        已知大小超过contents API上限，或contents API拒绝返回时，
+        使用blob SHA改走Git blobs API。
+        """
+        raw_headers = {"Accept": self.RAW_MEDIA_TYPE}
+        blob_url = f"{self.base_url}/repos/{repo}/git/blobs/{sha}" if sha else None
+
+        if blob_url and size and size > self.CONTENTS_RAW_LIMIT:
+            response = self._get(blob_url, headers=raw_headers, stream=True)
         else:
-            raise Exception(f"获取文件失败: {response.status_code} - {response.text}")
+            url = f"{self.base_url}/repos/{repo}/contents/{path}"
+            response = self._get(url, params={"ref": ref}, headers=raw_headers, stream=True)
+            if response.status_code in (403, 413, 422) and blob_url:
+                # 文件超过contents API限制
+                response.close()
+                response = self._get(blob_url, headers=raw_headers, stream=True)
+
+        if response.status_code != 200:
+            message = response.text
+            response.close()
+            raise Exception(f"获取文件失败: {response.status_code} - {message}")
+        return self._iter_response(response, chunk_size)
+
+    @staticmethod
+    def _iter_response(response, chunk_size: int) -> Iterator[bytes]:
+        """逐块读取响应体，迭代结束或提前停止时释放连接"""
+        try:
+            yield from response.iter_content(chunk_size=chunk_size)
+        finally:
+            response.close()
+
+def _item_name(item) -> str:
+    """进度消息中的文件名"""
+    return item.get('path', '') if isinstance(item, dict) else str(item)
+
+# 异步GitHub客户端：在线程中复用同步客户端的连接池，并发获取多个文件
+class AsyncGitHubClient:
+    def __init__(self, client: GitHubClient, max_concurrency: int = None):
+        self.client = client
+        self.max_concurrency = max_concurrency or int(os.getenv("GITHUB_FETCH_CONCURRENCY", "5"))
+
+    async def search_files(self, repo: str, filename: str) -> List[Dict]:
+        """搜索仓库中的文件（异步版本）"""
+        return await asyncio.to_thread(self.client.search_files, repo, filename)
+
+    async def get_file_content(self, repo: str, path: str, ref: str = "main") -> Dict:
+        """获取文件内容（异步版本）"""
+        return await asyncio.to_thread(self.client.get_file_content, repo, path, ref)
+
+    async def fetch_all(self, items: List[Any], fetch, errors: List = None) -> List[Any]:
+        """
+        并发处理多个候选文件，按items顺序返回 fetch(item) 的结果
+
+        fetch在工作线程中执行（通常包含获取和解析文件）；失败的文件对应结果为None，
+        传入errors列表时记录 (item, 异常)。
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def worker(item):
+            async with semaphore:
+                try:
+                    result = await asyncio.to_thread(fetch, item)
+                except Exception as e:
+                    if errors is not None:
+                        errors.append((item, e))
+                    result = None  # 跳过无法处理的文件
+                report_progress(1, f"已处理文件: {_item_name(item)}", total=len(items))
+                return result
+
+        return await asyncio.gather(*(worker(item) for item in items))
+
+    async def find_first(self, items: List[Any], fetch, errors: List = None) -> Optional[tuple]:
+        """
+        并发处理多个候选文件，返回按items顺序最靠前的匹配结果 (item, value)
+
+        fetch(item) 在工作线程中执行，返回None表示未匹配。
+        找到结果后取消其余尚未完成的获取；获取或解析失败的文件会被跳过，
+        传入errors列表时记录 (item, 异常)。
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def worker(item):
+            async with semaphore:
+                value = await asyncio.to_thread(fetch, item)
+                report_progress(1, f"已处理文件: {_item_name(item)}", total=len(items))
+                return value
+
+        tasks = [asyncio.create_task(worker(item)) for item in items]
+        try:
+            # 按搜索顺序依次等待，保证靠前的匹配优先，结果与串行查找一致
+            for item, task in zip(items, tasks):
+                try:
+                    value = await task
+                except Exception as e:
+                    if errors is not None:
+                        errors.append((item, e))
+                    continue  # 跳过无法处理的文件
+                if value:
+                    return item, value
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
 # MCP服务器框架
 class MCPServer:
-    def __init__(self, name: str):
+    # 支持的协议版本，2025-06-18起工具结果可以携带structuredContent
+    PROTOCOL_VERSIONS = ("2024-11-05", "2025-06-18")
+    STRUCTURED_CONTENT_VERSION = "2025-06-18"
+
+    def __init__(self, name: str, max_concurrency: int = None, max_workers: int = None):
         self.name = name
         self.tools = {}
         self.resources = {}
+        # 同时处理中的请求上限，以及同步工具使用的线程池大小（可通过环境变量配置）
+        self.max_concurrency = max_concurrency or int(os.getenv("MCP_MAX_CONCURRENCY", "8"))
+        self.max_workers = max_workers or int(os.getenv("MCP_MAX_WORKERS", str(self.max_concurrency)))
+        self._executor = None
+        self._semaphore = None
+        self._loop = None
+        # 处理中的请求: 请求id → (任务, 请求上下文)，用于取消
+        self._active = {}
+        self.protocol_version = self.PROTOCOL_VERSIONS[0]
         
     def tool(self, name: str = None):
         """装饰器：注册MCP工具"""
@@ -123,12 +349,15 @@ class MCPServer:
             return self._error_response(request_id, str(e))
     
     async def _handle_initialize(self, params: Dict, request_id: str):
-        """处理初始化请求"""
+        """处理初始化请求（客户端请求的协议版本受支持时使用该版本，否则使用2024-11-05）"""
+        requested = params.get('protocolVersion')
+        if requested in self.PROTOCOL_VERSIONS:
+            self.protocol_version = requested
         return {
             "jsonrpc": "2.0",
             "id": request_id,
             "result": {
-                "protocolVersion": "2024-11-05",
+                "protocolVersion": self.protocol_version,
                 "capabilities": {
                     "tools": {},
                     "resources": {}
@@ -159,37 +388,67 @@ class MCPServer:
         }
     
     async def _handle_call_tool(self, params: Dict, request_id: str):
-        """执行工具调用"""
+        """
+        执行工具调用
+
+        参数中的response_format（text/json）和verbosity（compact/verbose）由服务器处理，
+        不传给工具函数，默认值来自MCP_RESPONSE_FORMAT和MCP_RESPONSE_VERBOSITY。
+        """
         tool_name = params.get('name')
-        arguments = params.get('arguments', {})
+        arguments = dict(params.get('arguments') or {})
         
         if tool_name not in self.tools:
             return self._error_response(request_id, f"Tool not found: {tool_name}")
         
         tool_func = self.tools[tool_name]['function']
+        try:
+            response_format, verbose = pop_output_options(arguments)
+        except ValueError as e:
+            return self._error_response(request_id, str(e))
         
+        structured_content = self.protocol_version >= self.STRUCTURED_CONTENT_VERSION
+        encode = functools.partial(self._encode_call_result, request_id,
+                                   response_format=response_format, verbose=verbose,
+                                   structured_content=structured_content)
         try:
-            # 调用工具函数
+            # 调用工具函数：同步工具连同结果的渲染和编码一起放到线程池中执行，避免阻塞事件循环
             if asyncio.iscoroutinefunction(tool_func):
                 result = await tool_func(**arguments)
-            else:
-                result = tool_func(**arguments)
-            
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": str(result)
-                        }
-                    ]
-                }
-            }
+                return await self._run_sync(encode, result)
+            return await self._run_sync(lambda: encode(tool_func(**arguments)))
         except Exception as e:
             return self._error_response(request_id, f"Tool execution failed: {str(e)}")
+
+    def _encode_call_result(self, request_id, result, response_format: str, verbose: bool,
+                            structured_content: bool) -> EncodedResponse:
+        """
+        把工具返回值渲染为tools/call响应并编码（在工具线程中执行）
+
+        大结果的文本报告生成和JSON编码可能耗时数百毫秒，放在事件循环线程中
+        会推迟其他请求的读取、通知和响应写出。
+        """
+        response = {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": build_call_result(result, response_format, verbose,
+                                        structured_content=structured_content)
+        }
+        status = "error" if isinstance(result, ToolError) else "ok"
+        return EncodedResponse(encode_json(response) + b"\n", status)
     
+    async def _run_sync(self, func, *args, **kwargs):
+        """在有界线程池中执行同步函数"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="mcp-tool"
+            )
+        loop = asyncio.get_running_loop()
+        # 复制当前上下文，工具线程中可以访问请求上下文（进度和取消）
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
     def _error_response(self, request_id: str, error_message: str):
         """生成错误响应"""
         return {
@@ -201,137 +460,593 @@ class MCPServer:
             }
         }
     
-    async def run(self):
-        """启动MCP服务器，监听stdin"""
-        print("MCP服务器启动中...", file=sys.stderr)
-        
-        while True:
-            try:
-                # 从stdin读取请求
-                line = await asyncio.get_event_loop().run_in_executor(
-                    None, sys.stdin.readline
-                )
-                
-                if not line:
-                    break
-                
-                # 解析JSON请求
-                request = json.loads(line.strip())
-                
-                # 处理请求
+    def _write_response(self, response) -> int:
+        """
+        发送响应到stdout（在事件循环线程中整行写出，响应之间不会交错），返回写出的字节数
+
+        response可以是dict，也可以是工具线程中已编码好的EncodedResponse。
+        """
+        if isinstance(response, EncodedResponse):
+            data = response.data
+        else:
+            data = encode_json(response) + b"\n"
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        return len(data)
+
+    def _send_notification(self, method: str, params: Dict[str, Any]):
+        """发送通知（可在工具线程中调用，转到事件循环线程写出）"""
+        message = {"jsonrpc": "2.0", "method": method, "params": params}
+        self._loop.call_soon_threadsafe(self._write_response, message)
+
+    def _handle_notification(self, request: Dict[str, Any]):
+        """处理客户端通知（没有id，不返回响应）"""
+        if request.get('method') == 'notifications/cancelled':
+            params = request.get('params') or {}
+            self._cancel_request(params.get('requestId'), params.get('reason'))
+
+    def _cancel_request(self, request_id, reason: str = None):
+        """
+        取消处理中的请求：设置取消标志并取消任务
+
+        排队或等待中的任务立即结束；线程池中的同步工具在下一次检查取消时退出。
+        被取消的请求不再发送响应。
+        """
+        active = self._active.get(request_id)
+        if active is None:
+            return
+        task, context = active
+        context.cancel(reason)
+        task.cancel()
+        print(f"请求已取消: {request_id}" + (f" ({reason})" if reason else ""), file=sys.stderr)
+
+    def _start_request(self, request: Dict[str, Any], size: int = 0):
+        """为请求创建上下文和处理任务，并登记以便取消（size为请求的字节数）"""
+        request_id = request.get('id')
+        meta = (request.get('params') or {}).get('_meta') or {}
+        context = RequestContext(request_id, meta.get('progressToken'), self._send_notification)
+        task = asyncio.create_task(self._dispatch(request, context, size))
+        self._active[request_id] = (task, context)
+        return task
+
+    async def _dispatch(self, request: Dict[str, Any], context: RequestContext, size: int = 0):
+        """处理单个请求并写回响应，响应通过JSON-RPC id与请求对应"""
+        request_id = request.get('id')
+        token = bind(context)
+        started = None
+        status = "cancelled"
+        written = 0
+        try:
+            # 达到并发上限时在此排队（排队时间不计入工具延迟）
+            async with self._semaphore:
+                started = time.perf_counter()
                 response = await self.handle_request(request)
-                
-                # 发送响应到stdout
-                print(json.dumps(response), flush=True)
-                
-            except json.JSONDecodeError as e:
-                print(f"JSON解析错误: {e}", file=sys.stderr)
-            except Exception as e:
-                print(f"处理请求时出错: {e}", file=sys.stderr)
+            if not context.cancelled.is_set():
+                status = self._response_status(response)
+                written = self._write_response(response)
+        except (asyncio.CancelledError, RequestCancelled):
+            pass
+        except Exception as e:
+            status = "error"
+            print(f"处理请求时出错: {e}", file=sys.stderr)
+        finally:
+            if started is not None:
+                self._record_call(request, time.perf_counter() - started, status, size, written)
+            if self._active.get(request_id, (None, None))[1] is context:
+                del self._active[request_id]
+            unbind(token)
+
+    @staticmethod
+    def _response_status(response) -> str:
+        """调用结果状态：JSON-RPC错误（包括工具抛出的异常）和工具返回的ToolError计为error"""
+        if isinstance(response, EncodedResponse):
+            return response.status
+        return "error" if 'error' in response else "ok"
+
+    def _record_call(self, request: Dict[str, Any], seconds: float, status: str,
+                     bytes_in: int, bytes_out: int):
+        """记录工具调用的指标（只统计已注册工具的tools/call请求）"""
+        if request.get('method') != 'tools/call':
+            return
+        tool_name = (request.get('params') or {}).get('name')
+        if tool_name in self.tools:
+            metrics.observe_call(tool_name, seconds, status, bytes_in, bytes_out)
+
+    async def run(self):
+        """启动MCP服务器，监听stdin
+
+        请求按到达顺序读取后并发处理，同时处理的请求数不超过max_concurrency，
+        响应按完成顺序写出。通知（如notifications/cancelled）在读取时立即处理，
+        不受并发上限影响。
+        """
+        print(f"MCP服务器启动中... (最大并发: {self.max_concurrency})", file=sys.stderr)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = self._loop = asyncio.get_running_loop()
+        # stdin单独占用一个线程，避免与工具线程池互相争用
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mcp-stdin")
+        pending = set()
+
+        try:
+            while True:
+                try:
+                    # 从stdin读取请求
+                    line = await loop.run_in_executor(reader, sys.stdin.readline)
+
+                    if not line:
+                        break
+                    if not line.strip():
+                        continue
+
+                    # 解析JSON请求
+                    request = json.loads(line.strip())
+
+                    if 'id' not in request:
+                        self._handle_notification(request)
+                        continue
+
+                    task = self._start_request(request, len(line.encode('utf-8')))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+
+                except json.JSONDecodeError as e:
+                    print(f"JSON解析错误: {e}", file=sys.stderr)
+                except Exception as e:
+                    print(f"处理请求时出错: {e}", file=sys.stderr)
+
+            # stdin关闭后等待所有处理中的请求完成
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            reader.shutdown(wait=False)
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
 
 # 创建GitHub文件管理服务器实例
 server = MCPServer("multi-tool-mcp-server")
 
 # 从环境变量获取GitHub token
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+# 仓库数据来源: api（GitHub API）或 local（本地bare clone镜像，搜索和读取都走本地磁盘）
+GITHUB_BACKEND = os.getenv("GITHUB_BACKEND", "api").lower()
 github_client = None
+async_github_client = None
+repo_backend = None
 
-if not GITHUB_TOKEN:
-    print("警告: 未设置GITHUB_TOKEN环境变量，将使用模拟数据", file=sys.stderr)
-else:
-    try:
-        github_client = GitHubClient(GITHUB_TOKEN)
-        print("GitHub客户端初始化成功", file=sys.stderr)
-    except Exception as e:
-        print(f"GitHub客户端初始化失败: {e}", file=sys.stderr)
-
-def parse_csv_content(content: str, search_key: str) -> Optional[str]:
-    """解析CSV内容，根据第一列查找第二列的值"""
-    lines = content.strip().split('\n')
-    for line in lines:
-        if not line.strip():
-            continue
-        parts = line.split(',')
-        if len(parts) >= 2:
-            # 去除引号和空格
-            key = parts[0].strip().strip('"\'')
-            value = parts[1].strip().strip('"\'')
-            if key == search_key:
-                return value
+def init_github_backend():
+    """
+    按环境变量创建GitHub客户端、本地镜像和异步客户端
+
+    只在服务器进程中调用：批量工具的spawn工作进程会以__mp_main__重新导入本模块，
+    放在模块顶层会在每个工作进程里重复初始化客户端、加载缓存并注册退出时的持久化。
+    """
+    global github_client, async_github_client, repo_backend
+    if not GITHUB_TOKEN:
+        print("警告: 未设置GITHUB_TOKEN环境变量，将使用模拟数据", file=sys.stderr)
+    else:
+        try:
+            github_cache = ResponseCache(
+                max_entries=int(os.getenv("GITHUB_CACHE_SIZE", "512")),
+                max_bytes=int(float(os.getenv("GITHUB_CACHE_MB", "64")) * 1024 * 1024),
+                ttl=float(os.getenv("GITHUB_CACHE_TTL", "60")),
+                persist_path=os.getenv("GITHUB_CACHE_FILE") or None,
+                save_every=int(os.getenv("GITHUB_CACHE_SAVE_EVERY", "32")),
+                save_interval=float(os.getenv("GITHUB_CACHE_SAVE_INTERVAL", "300"))
+            )
+            atexit.register(github_cache.save)
+            github_scheduler = RateLimitScheduler(
+                limits={
+                    'search': (int(os.getenv("GITHUB_SEARCH_RATE", "30")), 60.0,
+                               int(os.getenv("GITHUB_SEARCH_BURST", "10"))),
+                    'core': (int(os.getenv("GITHUB_CORE_RATE", "5000")), 3600.0,
+                             int(os.getenv("GITHUB_CORE_BURST", "100")))
+                },
+                max_retries=int(os.getenv("GITHUB_MAX_RETRIES", "5"))
+            )
+            github_client = GitHubClient(GITHUB_TOKEN, cache=github_cache, scheduler=github_scheduler)
+            metrics.register_collector('github_cache', github_cache.stats)
+            metrics.register_collector('github_single_flight', github_client.single_flight.stats)
+            metrics.register_collector('github_scheduler', github_scheduler.stats)
+            print("GitHub客户端初始化成功", file=sys.stderr)
+        except Exception as e:
+            print(f"GitHub客户端初始化失败: {e}", file=sys.stderr)
+
+    repo_backend = github_client
+
+    if GITHUB_BACKEND == 'local':
+        try:
+            repo_backend = LocalRepoMirror(
+                cache_dir=os.path.expanduser(os.getenv("GITHUB_MIRROR_DIR", "~/.cache/mcp-github-mirrors")),
+                remote_template=os.getenv("GITHUB_MIRROR_REMOTE", "https://github.com/{repo}.git"),
+                token=GITHUB_TOKEN,
+                refresh_interval=float(os.getenv("GITHUB_MIRROR_REFRESH", "300"))
+            )
+            print(f"本地仓库镜像已启用: {repo_backend.cache_dir}", file=sys.stderr)
+        except Exception as e:
+            print(f"本地仓库镜像初始化失败: {e}", file=sys.stderr)
+
+    if repo_backend is not None:
+        async_github_client = AsyncGitHubClient(repo_backend)
+
+# 按blob SHA缓存的CSV索引，同一文件的重复查找无需重新解析
+csv_index_cache = CSVIndexCache(
+    max_bytes=int(os.getenv("CSV_INDEX_CACHE_MB", "64")) * 1024 * 1024
+)
+metrics.register_collector('csv_index_cache', csv_index_cache.stats)
+metrics.register_collector('result_store', result_store.stats)
+
+# 文件内容获取方式: json（contents API + base64）或 raw（raw媒体类型流式获取）
+GITHUB_CONTENT_MODE = os.getenv("GITHUB_CONTENT_MODE", "json").lower()
+
+# 超过该大小的文件不建立索引，改为流式查找（找到即停止）
+CSV_INDEX_MAX_FILE_BYTES = int(os.getenv("CSV_INDEX_MAX_FILE_MB", "16")) * 1024 * 1024
+
+def parse_csv_content(content, search_key: str, **options) -> Optional[str]:
+    """流式解析CSV内容，根据关键列查找值列的值，找到后立即停止读取
+
+    content可以是文本、字节或字节块迭代器；options支持
+    key_column、value_column（1-based，默认1和2）、delimiter、encoding。
+    """
+    for key, value in iter_csv_pairs(content, **options):
+        if key == search_key:
+            return value
     return None
 
+def csv_options(key_column=1, value_column=2, delimiter: str = None) -> Dict[str, Any]:
+    """整理CSV解析选项（工具参数可能以字符串传入）"""
+    return {
+        'key_column': int(key_column),
+        'value_column': int(value_column),
+        'delimiter': delimiter or None
+    }
+
+def _csv_index_key(sha: Optional[str], options: Dict[str, Any]):
+    """CSV索引缓存key：blob SHA加解析选项，没有SHA时不缓存"""
+    return (sha, tuple(sorted(options.items()))) if sha else None
+
+def get_csv_index(file_data: Dict, **options) -> Dict[str, str]:
+    """获取文件的CSV索引，按blob SHA缓存，命中时跳过base64解码和解析"""
+    def build():
+        # 解码base64内容，交给解析器按字节流增量解码
+        return build_csv_index(base64.b64decode(file_data['content']), **options)
+    return csv_index_cache.get_or_build(_csv_index_key(file_data.get('sha'), options), build)
+
+def lookup_csv_value(file_data: Dict, search_key: str, **options) -> Optional[str]:
+    """在文件中查找key：普通文件使用缓存索引，大文件流式查找"""
+    if file_data.get('size', 0) > CSV_INDEX_MAX_FILE_BYTES:
+        return parse_csv_content(base64.b64decode(file_data['content']), search_key, **options)
+    return get_csv_index(file_data, **options).get(search_key)
+
+def _fetch_json_content(repo: str, file_info: Dict) -> tuple:
+    """
+    按当前模式获取文件：json模式返回 (file_data, None)；
+    raw模式、本地镜像或contents API未返回内容（大文件）时返回 (None, 文件信息) 供流式获取
+    """
+    if GITHUB_CONTENT_MODE != 'raw' and GITHUB_BACKEND != 'local':
+        file_data = github_client.get_file_content(repo, file_info['path'])
+        if file_data.get('encoding') == 'base64' and file_data.get('content'):
+            return file_data, None
+        file_info = file_data
+    return None, file_info
+
+def _stream_file(repo: str, file_info: Dict):
+    """以raw字节流获取文件，调用方负责在读取结束后关闭；每个数据块之前检查请求是否已取消"""
+    return closing(cancellable(repo_backend.stream_file_content(
+        repo, file_info['path'], sha=file_info.get('sha'), size=file_info.get('size')
+    )))
+
+def find_csv_value(repo: str, file_info: Dict, search_key: str, **options) -> Optional[str]:
+    """获取文件并查找key（在工作线程中执行）"""
+    file_data, stream_info = _fetch_json_content(repo, file_info)
+    if file_data is not None:
+        return lookup_csv_value(file_data, search_key, **options)
+    # 流式查找，找到后立即停止读取并关闭连接
+    with _stream_file(repo, stream_info) as chunks:
+        return parse_csv_content(chunks, search_key, **options)
+
+def load_csv_index(repo: str, file_info: Dict, **options) -> Dict[str, str]:
+    """获取文件并返回其CSV索引（在工作线程中执行）"""
+    file_data, stream_info = _fetch_json_content(repo, file_info)
+    if file_data is not None:
+        return get_csv_index(file_data, **options)
+
+    def build():
+        with _stream_file(repo, stream_info) as chunks:
+            return build_csv_index(chunks, **options)
+    return csv_index_cache.get_or_build(_csv_index_key(stream_info.get('sha'), options), build)
+
+def format_fetch_errors(errors: List) -> str:
+    """格式化获取失败的文件列表，附加在结果末尾"""
+    if not errors:
+        return ""
+    lines = [f"\n⚠️ {len(errors)} 个文件获取失败:"]
+    for file_info, error in errors:
+        lines.append(f"  - {file_info['path']}: {error}")
+    return "\n".join(lines)
+
+def parse_search_keys(search_keys) -> List[str]:
+    """解析批量查找的key列表：支持列表、JSON数组字符串或逗号分隔字符串"""
+    if isinstance(search_keys, str):
+        text = search_keys.strip()
+        if text.startswith('['):
+            search_keys = json.loads(text)
+        else:
+            search_keys = text.split(',')
+    return [str(key).strip() for key in search_keys if str(key).strip()]
+
 # 定义工具函数
 @server.tool()
-def search_file_content(repo_name: str, filename: str, search_key: str):
+async def search_file_content(repo_name: str, filename: str, search_key: str,
+                              key_column: int = 1, value_column: int = 2, delimiter: str = None):
     """
     在GitHub仓库中搜索文件内容
     
     参数:
     - repo_name: 仓库名称 (例如: "user/repo-name")
     - filename: 文件名或部分文件名
-    - search_key: 要搜索的关键字（第一列的值）
+    - search_key: 要搜索的关键字（关键列的值）
+    - key_column: 关键列（1-based，默认第1列）
+    - value_column: 返回值所在列（1-based，默认第2列）
+    - delimiter: 分隔符（默认自动识别）
     """
-    if not github_client:
+    options = csv_options(key_column, value_column, delimiter)
+    if not repo_backend:
         return f"模拟结果: 在仓库 {repo_name} 中找到文件 {filename}，{search_key} 对应的值为: 模拟值"
     
     try:
         # 1. 搜索文件
-        files = github_client.search_files(repo_name, filename)
+        files = await async_github_client.search_files(repo_name, filename)
         
         if not files:
             return f"未找到包含 '{filename}' 的文件"
         
-        # 2. 遍历找到的文件，查找内容
-        for file_info in files:
+        # 2. 并发获取找到的文件，按搜索顺序取第一个匹配
+        def match(file_info):
+            # 解析CSV查找对应值
+            return find_csv_value(repo_name, file_info, search_key, **options)
+
+        errors = []
+        found = await async_github_client.find_first(files, match, errors)
+
+        if found:
+            file_info, result_value = found
             file_path = file_info['path']
-            try:
-                # 获取文件内容
-                file_data = github_client.get_file_content(repo_name, file_path)
-                
-                # 解码base64内容
-                content = base64.b64decode(file_data['content']).decode('utf-8')
-                
-                # 解析CSV查找对应值
-                result_value = parse_csv_content(content, search_key)
-                
-                if result_value:
-                    return f"✅ 找到文件: {file_path}\n🔍 {search_key} 对应的值为: {result_value}"
-            
-            except Exception as e:
-                continue  # 跳过无法处理的文件
+            return ToolResult(
+                {'key': search_key, 'value': result_value, 'file': file_path},
+                text=lambda: f"✅ 找到文件: {file_path}\n🔍 {search_key} 对应的值为: {result_value}"
+            )
         
-        return f"❌ 在找到的文件中未发现 '{search_key}' 对应的值"
+        return ToolError(f"❌ 在找到的文件中未发现 '{search_key}' 对应的值" + format_fetch_errors(errors))
         
     except Exception as e:
-        return f"❌ 搜索过程中出错: {str(e)}"
+        return ToolError(f"❌ 搜索过程中出错: {str(e)}")
+
+@server.tool()
+async def batch_search_file_content(repo_name: str, filename: str, search_keys,
+                                    key_column: int = 1, value_column: int = 2, delimiter: str = None):
+    """
+    在GitHub仓库中批量查找多个关键字
+
+    参数:
+    - repo_name: 仓库名称 (例如: "user/repo-name")
+    - filename: 文件名或部分文件名
+    - search_keys: 要搜索的关键字列表（关键列的值），可以是数组、JSON数组字符串或逗号分隔字符串
+    - key_column: 关键列（1-based，默认第1列）
+    - value_column: 返回值所在列（1-based，默认第2列）
+    - delimiter: 分隔符（默认自动识别）
+    """
+    options = csv_options(key_column, value_column, delimiter)
+    try:
+        keys = parse_search_keys(search_keys)
+    except json.JSONDecodeError:
+        return ToolError(f"❌ 关键字列表格式错误: {search_keys}")
+    if not keys:
+        return ToolError("❌ 未提供要搜索的关键字")
+
+    if not repo_backend:
+        return "模拟结果:\n" + "\n".join(f"🔍 {key} 对应的值为: 模拟值" for key in keys)
+
+    try:
+        files = await async_github_client.search_files(repo_name, filename)
+
+        if not files:
+            return f"未找到包含 '{filename}' 的文件"
+
+        # 并发获取并索引所有候选文件，每个key取搜索顺序中第一个匹配的文件
+        paths = [file_info['path'] for file_info in files]
+        errors = []
+        indexes = await async_github_client.fetch_all(
+            files, functools.partial(load_csv_index, repo_name, **options), errors
+        )
+
+        matches = []
+        for key in keys:
+            for file_path, index in zip(paths, indexes):
+                value = index.get(key) if index else None
+                if value:
+                    matches.append({'key': key, 'value': value, 'file': file_path})
+                    break
+            else:
+                matches.append({'key': key, 'value': None, 'file': None})
+        found_count = sum(1 for match in matches if match['file'])
+
+        def render():
+            lines = [
+                f"✅ {match['key']} = {match['value']}  ({match['file']})" if match['file']
+                else f"❌ {match['key']}: 未找到"
+                for match in matches
+            ]
+            return (f"🔍 批量查找完成: {found_count}/{len(keys)} 个关键字找到\n" + "\n".join(lines)
+                    + format_fetch_errors(errors))
+
+        return ToolResult(
+            {
+                'repo': repo_name,
+                'filename': filename,
+                'found': found_count,
+                'total': len(keys),
+                'failed_files': [
+                    {'path': file_info['path'], 'error': str(error)} for file_info, error in errors
+                ],
+            },
+            text=render,
+            details={'results': matches}
+        )
+
+    except Exception as e:
+        return ToolError(f"❌ 搜索过程中出错: {str(e)}")
+
+def file_entry(file: Dict) -> Dict:
+    """目录条目的返回字段"""
+    return {'name': file['name'], 'type': file['type'], 'path': file.get('path'), 'size': file.get('size')}
+
+def file_line(entry: Dict) -> str:
+    return f"📁 {entry['name']} ({entry['type']})"
 
 @server.tool()
-def list_files(repo_name: str, path: str = ""):
+def list_files(repo_name: str, path: str = "", page_size: int = 0):
     """
     列出GitHub仓库中的所有文件（测试用）
     
     参数:
     - repo_name: 仓库名称
     - path: 路径（默认为根目录）
+    - page_size: 大于0时只返回第一页（page_size项）和下一页游标，
+      目录列表保留在服务器上，用fetch_result_page继续获取
     """
-    if not github_client:
+    if not repo_backend:
         return "模拟结果: 文件列表获取需要GitHub token"
     
     try:
-        import requests
-        url = f"https://api.github.com/repos/{repo_name}/contents/{path}"
-        response = requests.get(url, headers=github_client.headers)
-        
-        if response.status_code == 200:
-            files = response.json()
-            file_list = []
-            for file in files:
-                file_list.append(f"📁 {file['name']} ({file['type']})")
-            return "文件列表:\n" + "\n".join(file_list)
-        else:
-            return f"获取文件列表失败: {response.status_code} - {response.text}"
+        files = repo_backend.list_directory(repo_name, path)
+        if int(page_size) > 0:
+            pages = PagedResult('files', {'files': files}, item={'files': file_entry},
+                                line={'files': file_line})
+            _, cursors = result_store.publish(pages, page_size)
+            if not cursors:
+                return "文件列表:\n"
+            page, line = result_store.page(cursors['files'])
+            return ToolResult(
+                {'repo': repo_name, 'path': path, **page},
+                text=lambda: format_page(page, line)
+            )
+        return ToolResult(
+            {
+                'repo': repo_name,
+                'path': path,
+                'count': len(files),
+                'files': [{'name': file['name'], 'type': file['type']} for file in files],
+            },
+            text=lambda: "文件列表:\n" + "\n".join(file_line(file) for file in files),
+            details={'files': [file_entry(file) for file in files]}
+        )
     except Exception as e:
-        return f"错误: {str(e)}"
+        return ToolError(f"❌ 获取文件列表失败: {str(e)}")
+
+@server.tool()
+def fetch_result_page(cursor: str, page_size: int = 0):
+    """
+    按游标获取服务器上保留结果的一页（compare_excel_files、list_files等传入page_size时返回游标）
+
+    参数:
+    - cursor: 上一次返回的游标（第一页游标或next_cursor）
+    - page_size: 每页条目数（默认沿用游标中的页大小，最大1000）
+    """
+    try:
+        page, line = result_store.page(cursor, page_size)
+    except KeyError as e:
+        return ToolError(f"❌ {e.args[0]}，请重新执行原始查询")
+    except ValueError as e:
+        return ToolError(f"❌ {e}")
+    return ToolResult(page, text=lambda: format_page(page, line))
+
+@server.tool()
+def github_cache_stats():
+    """
+    查看GitHub响应缓存的命中统计，以及合并的重复请求数
+    """
+    if not github_client:
+        return "GitHub缓存未启用"
+
+    cache_stats = github_client.cache.stats() if github_client.cache is not None else None
+    flight = github_client.single_flight.stats() if github_client.single_flight is not None else None
+
+    def render():
+        lines = ["📦 GitHub缓存统计"]
+        if cache_stats is not None:
+            lines += [
+                f"条目数: {cache_stats['entries']}/{cache_stats['max_entries']} (TTL {cache_stats['ttl']}秒)",
+                f"内存占用: {cache_stats['bytes'] / 1024 / 1024:.1f}MB / {cache_stats['max_bytes'] / 1024 / 1024:.0f}MB"
+                f" (淘汰 {cache_stats['evictions']})",
+                f"命中: {cache_stats['hits']}",
+                f"ETag重新验证(304): {cache_stats['revalidated']}",
+                f"未命中: {cache_stats['misses']}",
+                f"命中率: {cache_stats['hit_rate']:.2%}"
+            ]
+        else:
+            lines.append("响应缓存未启用")
+        if flight is not None:
+            lines.append(f"合并的重复请求: {flight['shared']} (实际发出 {flight['executed']}, 进行中 {flight['in_flight']})")
+        return "\n".join(lines)
+
+    return ToolResult({'cache': cache_stats, 'single_flight': flight}, text=render)
+
+@server.tool()
+def github_rate_limit_stats():
+    """
+    查看GitHub请求调度器的排队和限流统计
+    """
+    if not github_client or github_client.scheduler is None:
+        return "GitHub请求调度器未启用"
+
+    stats = github_client.scheduler.stats()
+    blocked = ", ".join(
+        f"{name} 至 {time.strftime('%H:%M:%S', time.localtime(until))}"
+        for name, until in stats['blocked_until'].items()
+    ) or "无"
+    return ToolResult(stats, text=lambda: f"""⏱️ GitHub请求调度统计
+当前排队: {stats['queue_depth']} (峰值 {stats['max_queue_depth']})
+已调度请求: {stats['requests']} (其中 {stats['waited_requests']} 个需要等待)
+等待时间: 总计 {stats['total_wait']}秒, 平均 {stats['avg_wait']}秒, 最长 {stats['max_wait']}秒
+重试次数: {stats['retries']} (限流 {stats['rate_limited']} 次)
+暂停中的端点: {blocked}""")
+
+@server.tool()
+def server_metrics(prometheus: bool = False):
+    """
+    查看服务器运行指标：每个工具的调用次数、延迟分位数（p50/p95/p99）、错误数和收发字节数，
+    上游GitHub请求数和各缓存的命中统计
+
+    参数:
+    - prometheus: 是否返回Prometheus文本格式（默认返回可读的汇总）
+    """
+    if as_bool(prometheus):
+        return metrics.prometheus_text()
+
+    snapshot = metrics.snapshot()
+
+    def render():
+        lines = [f"📈 服务器运行指标（运行 {snapshot['uptime']}秒）"]
+        if snapshot['tools']:
+            lines.append("\n工具调用（延迟为最近调用的分位数，单位秒）:")
+            for name, tool in snapshot['tools'].items():
+                latency = tool['latency']
+                lines.append(
+                    f"  - {name}: {tool['calls']}次, 错误 {tool['errors']}, 取消 {tool['cancelled']}, "
+                    f"p50 {latency['p50']} / p95 {latency['p95']} / p99 {latency['p99']} (最长 {latency['max']}), "
+                    f"收 {tool['bytes_in']}B / 发 {tool['bytes_out']}B"
+                )
+        else:
+            lines.append("\n尚无工具调用")
+        for name, values in snapshot['counters'].items():
+            lines.append(f"\n{name}:")
+            lines += [f"  - {label}: {value}" for label, value in values.items()]
+        for name, stats in snapshot['collectors'].items():
+            fields = ", ".join(f"{k}={v}" for k, v in stats.items() if not isinstance(v, dict))
+            lines.append(f"\n{name}: {fields}")
+        return "\n".join(lines)
+
+    return ToolResult(snapshot, text=render)
 
 @server.tool()
 def update_file_content(repo_name: str, filename: str, search_key: str, new_value: str):
@@ -376,7 +1091,9 @@ def load_all_tools():
 
 # 如果直接运行此文件，启动MCP服务器
 if __name__ == "__main__":
+    init_github_backend()
     # 加载所有工具
     load_all_tools()
+    start_exporters(metrics)
 
     asyncio.run(server.run())
\ No newline at end of file
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+tests/bench_excel_columnar.py
+对比引擎端到端基准测试：python引擎 与 columnar引擎 完整执行compare_sheets
+（包括读取和编码）的耗时，分三种数据来源:
+
+- 解析XLSX: 没有缓存和旁路文件，两个引擎都要用openpyxl解析XML
+- 工作表缓存: 行数据已在进程内的sheet_cache中
+- 旁路文件: EXCEL_SIDECAR=1生成的列式旁路文件，columnar引擎直接映射单元格编号
+
+并检查两个引擎的对比结果一致
+
+用法:
+    python tests/bench_excel_columnar.py [行数] [列数]    # 默认 50000 10
+"""
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+# 旁路文件开关在导入时读取
+os.environ["EXCEL_SIDECAR"] = "1"
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook
+
+from tools.excel_cache import sheet_cache
+from tools.excel_processor import compare_sheets
+
+# 文件2中修改、删除的行比例，以及新增的行数比例
+DRIFT = 0.01
+# 各数据形态和数据来源下要求的最低端到端加速比（python耗时 / columnar耗时），
+# 略低于实测值（50000行 × 10列，单核）。解析XLSX时两个引擎都被openpyxl的解析耗时主导，
+# 实测约1x，只检查结果一致
+MIN_SPEEDUP = {
+    "unique": {"工作表缓存": 1.2, "旁路文件": 1.1},        # 实测 1.5x / 1.2x
+    "repetitive": {"工作表缓存": 4.0, "旁路文件": 4.0},    # 实测 6.1x / 6.1x
+}
+
+
+def cell_value(r: int, c: int, shape: str):
+    """unique: 几乎每个单元格的值都不同；repetitive: 每列只有少量不同的值（类似分类、状态、日期列）"""
+    if shape == "unique":
+        return f"r{r}c{c}" if c % 2 else r * c
+    return f"cat{(r * 7 + c) % 40}" if c % 2 else (r // 100) % 250 + c
+
+
+def create_sheet(path: str, rows: int, cols: int, shape: str, drift: bool = False):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([f"Column {c}" for c in range(1, cols + 1)])
+    step = int(1 / DRIFT)
+    for r in range(rows):
+        if drift and r % step == 1:
+            continue  # 删除
+        row = [f"k{r}"] + [cell_value(r, c, shape) for c in range(2, cols + 1)]
+        if drift and r % step == 0:
+            row[-1] = f"changed{r % 7}"  # 修改
+        sheet.append(row)
+    if drift:
+        for r in range(rows, rows + int(rows * DRIFT)):
+            sheet.append([f"k{r}"] + [cell_value(r, c, shape) for c in range(2, cols + 1)])  # 新增
+    workbook.save(path)
+
+
+def summary(diff):
+    return (diff.total1, diff.total2, sorted(diff.removed), sorted(diff.added),
+            sorted(diff.modified), {key: list(diff.changed_columns[key]) for key in diff.modified})
+
+
+def run(engine: str, file1: str, file2: str):
+    start = time.perf_counter()
+    diff = compare_sheets(file1, file2, 0, engine)
+    return time.perf_counter() - start, summary(diff)
+
+
+def remove_sidecars(directory: str):
+    for path in glob.glob(os.path.join(directory, "*.xlcol")):
+        os.remove(path)
+
+
+def bench_shape(tmp: str, rows: int, cols: int, shape: str):
+    """一种数据形态下三种数据来源的加速比"""
+    file1 = os.path.join(tmp, f"{shape}_a.xlsx")
+    file2 = os.path.join(tmp, f"{shape}_b.xlsx")
+    create_sheet(file1, rows, cols, shape)
+    create_sheet(file2, rows, cols, shape, drift=True)
+    cache_bytes = sheet_cache.max_bytes
+    speedups = {}
+    print(f"{shape}:")
+
+    def scenario(name, prepare):
+        times = {}
+        results = {}
+        for engine in ("python", "columnar"):
+            prepare()
+            times[engine], results[engine] = run(engine, file1, file2)
+        assert results["python"] == results["columnar"], f"{shape}/{name}: 两个引擎的结果不一致"
+        speedups[name] = times["python"] / times["columnar"]
+        print(f"  {name}: python {times['python']:6.2f}秒  columnar {times['columnar']:6.2f}秒  "
+              f"加速 {speedups[name]:5.1f}x")
+
+    def parse_xlsx():
+        sheet_cache.clear()
+        sheet_cache.max_bytes = 0
+        remove_sidecars(tmp)
+
+    def cached():
+        sheet_cache.max_bytes = cache_bytes
+
+    def sidecar():
+        sheet_cache.clear()
+        sheet_cache.max_bytes = 0
+
+    scenario("解析XLSX", parse_xlsx)
+    # 预热工作表缓存
+    sheet_cache.max_bytes = cache_bytes
+    compare_sheets(file1, file2, 0, "python")
+    scenario("工作表缓存", cached)
+    # 生成旁路文件（之后的读取不再解析XLSX）
+    sheet_cache.clear()
+    sheet_cache.max_bytes = 0
+    remove_sidecars(tmp)
+    compare_sheets(file1, file2, 0, "python")
+    assert len(glob.glob(os.path.join(tmp, "*.xlcol"))) == 2, "旁路文件没有生成"
+    scenario("旁路文件", sidecar)
+    remove_sidecars(tmp)
+    sheet_cache.clear()
+    sheet_cache.max_bytes = cache_bytes
+    return speedups
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"📊 对比引擎端到端耗时（含读取）: {rows}行 × {cols}列, {DRIFT:.0%}的行有变化")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {shape: bench_shape(tmp, rows, cols, shape) for shape in ("unique", "repetitive")}
+
+    for shape, speedups in results.items():
+        for name, minimum in MIN_SPEEDUP[shape].items():
+            assert speedups[name] >= minimum, \
+                f"{shape}/{name}: columnar引擎加速 {speedups[name]:.1f}x，低于 {minimum}x"
+    print("✅ 两个引擎结果一致，加速比达到预期")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+tests/bench_excel_copy.py
+按映射复制基准测试：宽表上的窄映射，逐单元格写入 与 列投影+整行追加 的耗时对比
+
+用法:
+    python tests/bench_excel_copy.py [行数] [列数]    # 默认 20000 60
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook, load_workbook
+
+from tools.excel_cache import sheet_cache
+from tools.excel_processor import SheetStream, copy_rows_in_place
+
+
+def create_wide_sheet(path: str, rows: int, cols: int):
+    """生成宽表源文件"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([f"Column {c}" for c in range(1, cols + 1)])
+    for r in range(rows):
+        sheet.append([f"r{r}c{c}" if c % 4 else r * c for c in range(1, cols + 1)])
+    workbook.save(path)
+
+
+def create_target(path: str, cols: int):
+    """生成只有表头的目标文件"""
+    workbook = Workbook()
+    workbook.active.append([f"Target {c}" for c in range(1, cols + 1)])
+    workbook.save(path)
+
+
+def copy_rows_cellwise(source_file: str, target_file: str, mapping: dict):
+    """旧的复制方式：读取源行全部列，每行重新解析映射并逐个单元格写入"""
+    with SheetStream(source_file) as source:
+        source_data = [
+            [cell_value if cell_value is not None else "" for cell_value in row]
+            for row in source.rows()
+        ]
+    target_wb = load_workbook(target_file)
+    target_sheet = target_wb.active
+    if target_sheet.max_row > 1:
+        target_sheet.delete_rows(2, target_sheet.max_row - 1)
+    for src_row_idx, src_row_data in enumerate(source_data):
+        for src_col_str, target_col_str in mapping.items():
+            src_col = int(src_col_str) - 1
+            target_col = int(target_col_str)
+            if 0 <= src_col < len(src_row_data):
+                target_sheet.cell(row=src_row_idx + 2, column=target_col, value=src_row_data[src_col])
+    target_wb.save(target_file)
+    target_wb.close()
+
+
+def run(label: str, copy, source: str, target_template: str, target: str, mapping: dict):
+    shutil.copy(target_template, target)
+    sheet_cache.clear()
+    start = time.perf_counter()
+    copy(source, target, mapping)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<10} {elapsed:7.2f}秒")
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    print(f"📊 按映射复制基准: {rows}行 × {cols}列")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.xlsx")
+        target_template = os.path.join(tmp, "target_template.xlsx")
+        target = os.path.join(tmp, "target.xlsx")
+        create_wide_sheet(source, rows, cols)
+        create_target(target_template, 4)
+
+        mappings = {
+            "窄映射(2列)": {"1": "1", str(cols): "2"},
+            "中等映射(4列)": {"1": "1", "2": "2", str(cols // 2): "3", str(cols): "4"},
+            "全部列": {str(c): str(c) for c in range(1, cols + 1)},
+        }
+        for name, mapping in mappings.items():
+            print(f"{name}:")
+            old = run("逐单元格", copy_rows_cellwise, source, target_template, target, mapping)
+            new = run("列投影", copy_rows_in_place, source, target_template, target, mapping)
+            print(f"  提升: {old / new:.2f}倍")
+
+
+if __name__ == "__main__":
+    main()
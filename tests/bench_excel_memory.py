@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+tests/bench_excel_memory.py
+Excel对比行存储内存基准测试：普通字典+列表 与 PackedRows 的内存占用和对比耗时
+
+用法:
+    python tests/bench_excel_memory.py [行数] [列数]    # 默认 500000 30
+"""
+
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.excel_processor import build_keyed_rows, diff_keyed_rows
+
+CATEGORIES = ["Open Source", "Under Review", "Approved", "Pending Review", "Deprecated"]
+
+
+def synthetic_rows(rows: int, cols: int, seed: int = 0, change: float = 0.0):
+    """
+    生成与openpyxl读取结果相同形式的行（单元格值tuple）
+
+    列类型循环分布：key、分类文本、整数、小数、自由文本、空单元格
+    """
+    rng = random.Random(seed)
+    for r in range(rows):
+        row = [f"PKG-{r:08d}"]
+        for c in range(1, cols):
+            kind = c % 5
+            if kind == 0:
+                row.append(None)
+            elif kind == 1:
+                row.append(CATEGORIES[(r + c) % len(CATEGORIES)])
+            elif kind == 2:
+                row.append(r * c)
+            elif kind == 3:
+                row.append(r / (c + 1))
+            else:
+                row.append(f"/src/module_{r % 997}/file_{r}_{c}.py")
+        if change and rng.random() < change:
+            row[1] = "CHANGED"
+        yield tuple(row)
+
+
+def build_dict_rows(rows, key_col_idx: int):
+    """旧的行存储方式：key → 字符串列表"""
+    data = {}
+    for row in rows:
+        row_data = [str(cell_value) if cell_value is not None else "" for cell_value in row]
+        if key_col_idx < len(row_data) and row_data[key_col_idx]:
+            data[row_data[key_col_idx]] = row_data
+    return data
+
+
+def measure(label: str, builder, rows: int, cols: int):
+    """测量构建一侧行存储的内存占用和耗时"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = builder(synthetic_rows(rows, cols), 0)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} 内存: {current / 1024 / 1024:8.1f}MB  每行: {current / rows:7.1f}字节  "
+          f"构建: {elapsed:6.2f}秒")
+    return data, current
+
+
+def time_diff(label: str, builder, rows: int, cols: int):
+    """测量两侧（1%行有变更）的对比耗时"""
+    data1 = builder(synthetic_rows(rows, cols), 0)
+    data2 = builder(synthetic_rows(rows, cols, seed=1, change=0.01), 0)
+    headers = [f"H{c}" for c in range(cols)]
+    start = time.perf_counter()
+    diff = diff_keyed_rows(headers, data1, headers, data2)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} 对比: {elapsed:6.2f}秒  变更行: {len(diff.modified)}")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    print(f"📊 行存储内存基准: {rows}行 × {cols}列")
+
+    data, dict_bytes = measure("dict+list", build_dict_rows, rows, cols)
+    del data
+    data, packed_bytes = measure("PackedRows", build_keyed_rows, rows, cols)
+    del data
+    print(f"内存减少: {dict_bytes / packed_bytes:.1f}倍")
+
+    time_diff("dict+list", build_dict_rows, rows, cols)
+    time_diff("PackedRows", build_keyed_rows, rows, cols)
+
+
+if __name__ == "__main__":
+    main()
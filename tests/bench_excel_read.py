@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+tests/bench_excel_read.py
+工作表读取扩展性基准测试：只读模式下逐单元格cell()随机访问 与 SheetStream单次流式读取
+在不同行数下的耗时，检查流式读取的耗时随行数线性增长
+
+用法:
+    python tests/bench_excel_read.py [最大行数] [列数]    # 默认 40000 10
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook, load_workbook
+
+from tools.excel_processor import SheetStream, compare_sheets
+
+# 逐单元格读取随行数平方增长，只测到该行数
+CELLWISE_MAX_ROWS = 200
+
+
+def create_sheet(path: str, rows: int, cols: int):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([f"Column {c}" for c in range(1, cols + 1)])
+    for r in range(rows):
+        sheet.append([f"k{r}"] + [f"r{r}c{c}" if c % 2 else r * c for c in range(2, cols + 1)])
+    workbook.save(path)
+
+
+def read_cellwise(path: str, rows: int, cols: int) -> int:
+    """重构前的读取方式：只读工作簿上按行列逐个调用cell()（write_only生成的文件没有尺寸信息，直接传入）"""
+    workbook = load_workbook(path, read_only=True)
+    sheet = workbook.active
+    count = 0
+    for row in range(2, rows + 2):
+        values = [sheet.cell(row=row, column=col).value for col in range(1, cols + 1)]
+        count += values[0] is not None
+    workbook.close()
+    return count
+
+
+def read_streaming(path: str) -> int:
+    with SheetStream(path, cache=False) as stream:
+        return sum(1 for _ in stream.rows())
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    sizes = []
+    rows = max_rows
+    while rows >= 5000:
+        sizes.insert(0, rows)
+        rows //= 2
+    print(f"📊 工作表读取扩展性: {cols}列")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("逐单元格cell()（只读模式）:")
+        for rows in (50, 100, CELLWISE_MAX_ROWS):
+            path = os.path.join(tmp, f"cell{rows}.xlsx")
+            create_sheet(path, rows, cols)
+            print(f"  {rows:>6}行 {timed(read_cellwise, path, rows, cols):8.2f}秒")
+
+        print("SheetStream流式读取 / 文件与自身对比（python引擎）:")
+        per_row = []
+        for rows in sizes:
+            path = os.path.join(tmp, f"stream{rows}.xlsx")
+            create_sheet(path, rows, cols)
+            read = timed(read_streaming, path)
+            compare = timed(compare_sheets, path, path, 0, "python")
+            per_row.append(read / rows)
+            print(f"  {rows:>6}行 读取 {read:6.2f}秒  对比 {compare:6.2f}秒  "
+                  f"每千行 {read / rows * 1000 * 1000:.1f}毫秒")
+
+    # 线性扩展：最大规模的每行耗时不超过最小规模的1.5倍
+    ratio = per_row[-1] / per_row[0]
+    print(f"每行耗时比（{sizes[-1]}行 / {sizes[0]}行）: {ratio:.2f}")
+    assert ratio < 1.5, "流式读取耗时没有随行数线性增长"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+tests/bench_github_session.py
+GitHubClient连接复用基准测试：对本地模拟API串行获取文件，
+对比每次调用requests.get（每次新建连接）与客户端的连接池会话
+
+用法:
+    python tests/bench_github_session.py [调用次数]    # 默认 300
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from github_mcp_server import GitHubClient
+from tests.mock_github_api import MockGitHubAPI
+
+REPO = "octo/repo"
+
+
+def bench_bare(api: MockGitHubAPI, calls: int) -> float:
+    """每次调用单独发送requests.get（重构前的实现方式）"""
+    headers = {"Authorization": "Bearer test", "Accept": "application/vnd.github.v3+json"}
+    start = time.perf_counter()
+    for _ in range(calls):
+        response = requests.get(f"{api.url}/repos/{REPO}/contents/data.csv",
+                                headers=headers, params={"ref": "main"})
+        assert response.status_code == 200
+        response.json()
+    return time.perf_counter() - start
+
+
+def bench_pooled(api: MockGitHubAPI, calls: int) -> float:
+    """通过GitHubClient的共享会话获取（不启用缓存，每次都发出请求）"""
+    client = GitHubClient("test", base_url=api.url, single_flight=False)
+    start = time.perf_counter()
+    for _ in range(calls):
+        assert client.get_file_content(REPO, "data.csv")['path'] == "data.csv"
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    results = {}
+    for name, bench in (("requests.get", bench_bare), ("连接池会话", bench_pooled)):
+        with MockGitHubAPI({"data.csv": "key,value\na,1\n"}, repo=REPO) as api:
+            elapsed = bench(api, calls)
+            results[name] = (elapsed, api.connections)
+
+    print(f"串行获取 {calls} 次:")
+    for name, (elapsed, connections) in results.items():
+        print(f"  {name:<14} {elapsed / calls * 1000:6.2f} ms/次  TCP连接 {connections}")
+    assert results["连接池会话"][1] == 1, "连接池会话应只建立一个连接"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+tests/mock_github_api.py
+本地模拟GitHub API（代码搜索和contents API），可为每个文件设置响应延迟，
+记录请求路径和TCP连接数，供基准测试和验证脚本使用
+"""
+
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+
+class MockGitHubAPI:
+    """
+    在后台线程中运行的模拟API
+
+    - files: 路径 → 文件内容（str）
+    - delays: 路径 → 返回该文件内容前的延迟秒数
+    - search_order: 代码搜索返回的路径顺序（默认按files的插入顺序）
+    """
+
+    def __init__(self, files, delays=None, search_order=None, repo: str = "octo/repo"):
+        self.files = files
+        self.delays = delays or {}
+        self.search_order = search_order or list(files)
+        self.repo = repo
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def requested_paths(self):
+        """已请求内容的文件路径（按请求到达顺序）"""
+        with self._lock:
+            return list(self.requests)
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和响应体分两次写出，keep-alive连接上避免Nagle与延迟确认叠加的40ms等待
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with api._lock:
+                    api.connections += 1
+
+            def do_GET(self):
+                path = unquote(urlparse(self.path).path)
+                contents_prefix = f"/repos/{api.repo}/contents/"
+                if path == "/search/code":
+                    items = [{"name": p.rsplit('/', 1)[-1], "path": p, "sha": f"sha-{p}"}
+                             for p in api.search_order]
+                    self._send_json({"total_count": len(items), "items": items})
+                elif path.startswith(contents_prefix):
+                    file_path = path[len(contents_prefix):]
+                    with api._lock:
+                        api.requests.append(file_path)
+                    time.sleep(api.delays.get(file_path, 0))
+                    if file_path not in api.files:
+                        self._send_json({"message": "Not Found"}, 404)
+                        return
+                    content = api.files[file_path].encode('utf-8')
+                    self._send_json({
+                        "name": file_path.rsplit('/', 1)[-1],
+                        "path": file_path,
+                        "sha": f"sha-{file_path}",
+                        "size": len(content),
+                        "encoding": "base64",
+                        "content": base64.b64encode(content).decode('ascii'),
+                    })
+                else:
+                    self._send_json({"message": "Not Found"}, 404)
+
+            def _send_json(self, data, status: int = 200):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
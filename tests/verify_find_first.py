@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+tests/verify_find_first.py
+AsyncGitHubClient.find_first 验证：本地模拟API为每个文件注入延迟，
+检查结果是按搜索顺序最靠前的匹配（与串行查找一致），且找到后不再获取其余文件
+
+用法:
+    python tests/verify_find_first.py
+"""
+
+import asyncio
+import base64
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from github_mcp_server import AsyncGitHubClient, GitHubClient, parse_csv_content
+from tests.mock_github_api import MockGitHubAPI
+
+REPO = "octo/repo"
+KEY = "target"
+
+
+def csv_file(value=None) -> str:
+    rows = ["key,value", "other,0"]
+    if value is not None:
+        rows.append(f"{KEY},{value}")
+    return "\n".join(rows) + "\n"
+
+
+def make_match(client: GitHubClient):
+    def match(file_info):
+        file_data = client.get_file_content(REPO, file_info['path'])
+        return parse_csv_content(base64.b64decode(file_data['content']), KEY)
+    return match
+
+
+def serial_first(client: GitHubClient, files):
+    """串行查找（重构前的行为），作为顺序语义的参照"""
+    match = make_match(client)
+    for file_info in files:
+        try:
+            value = match(file_info)
+        except Exception:
+            continue
+        if value:
+            return file_info['path'], value
+    return None
+
+
+async def run_find_first(api: MockGitHubAPI, concurrency: int):
+    client = GitHubClient("test", base_url=api.url)
+    async_client = AsyncGitHubClient(client, max_concurrency=concurrency)
+    files = await async_client.search_files(REPO, "*.csv")
+    errors = []
+    start = time.perf_counter()
+    found = await async_client.find_first(files, make_match(client), errors)
+    elapsed = time.perf_counter() - start
+    return files, found, errors, elapsed, client
+
+
+def check_earliest_match_and_cancel():
+    """靠后的文件更快匹配时仍返回靠前的匹配；找到后排队中的获取不再发出"""
+    files = {
+        "a/0.csv": csv_file(),
+        "a/1.csv": csv_file("first"),
+        "a/2.csv": csv_file("second"),
+        "a/3.csv": csv_file("slow"),
+        "a/4.csv": csv_file(),
+        "a/5.csv": csv_file("never"),
+        "a/6.csv": csv_file("never"),
+    }
+    delays = {"a/0.csv": 0.3, "a/1.csv": 0.2, "a/2.csv": 0.05, "a/3.csv": 2.0, "a/4.csv": 2.0}
+    with MockGitHubAPI(files, delays, repo=REPO) as api:
+        listed, found, errors, elapsed, _ = asyncio.run(run_find_first(api, concurrency=3))
+        requested = api.requested_paths()
+
+    assert found is not None and (found[0]['path'], found[1]) == ("a/1.csv", "first"), found
+    assert not errors, errors
+    # a/0.csv完成（0.3秒）时即可返回，不等待2秒的a/3.csv和a/4.csv
+    assert elapsed < 1.0, f"find_first耗时 {elapsed:.2f}秒"
+    # 返回时a/5.csv和a/6.csv仍在排队：a/0.csv完成时释放的并发名额可能在同一轮事件循环中
+    # 被a/5.csv取得，但a/6.csv不应再发出请求
+    assert "a/6.csv" not in requested, requested
+    print(f"✅ 最靠前的匹配 a/1.csv（a/2.csv更早完成），耗时 {elapsed:.2f}秒，"
+          f"获取了 {len(requested)}/{len(listed)} 个文件")
+
+
+def check_matches_serial_order():
+    """获取失败的文件被跳过并记录错误，结果与串行查找一致"""
+    files = {
+        "b/1.csv": csv_file(),
+        "b/2.csv": csv_file("value"),
+        "b/3.csv": csv_file("later"),
+    }
+    order = ["b/missing.csv", "b/1.csv", "b/2.csv", "b/3.csv"]
+    delays = {"b/1.csv": 0.1, "b/3.csv": 0.01}
+    with MockGitHubAPI(files, delays, search_order=order, repo=REPO) as api:
+        listed, found, errors, _, client = asyncio.run(run_find_first(api, concurrency=4))
+        expected = serial_first(client, listed)
+
+    assert (found[0]['path'], found[1]) == expected == ("b/2.csv", "value"), (found, expected)
+    assert [item['path'] for item, _ in errors] == ["b/missing.csv"], errors
+    print("✅ 跳过获取失败的 b/missing.csv，结果与串行查找一致")
+
+
+def check_no_match():
+    """没有匹配时返回None，所有文件都被获取"""
+    files = {f"c/{i}.csv": csv_file() for i in range(5)}
+    delays = {path: 0.05 for path in files}
+    with MockGitHubAPI(files, delays, repo=REPO) as api:
+        _, found, errors, elapsed, _ = asyncio.run(run_find_first(api, concurrency=5))
+        requested = api.requested_paths()
+
+    assert found is None and not errors
+    assert sorted(requested) == sorted(files), requested
+    # 5个文件并发获取，总耗时接近单个文件的延迟
+    assert elapsed < 0.2, f"并发获取耗时 {elapsed:.2f}秒"
+    print(f"✅ 无匹配时返回None，5个文件并发获取耗时 {elapsed:.2f}秒")
+
+
+def main():
+    check_earliest_match_and_cancel()
+    check_matches_serial_order()
+    check_no_match()
+
+
+if __name__ == "__main__":
+    main()
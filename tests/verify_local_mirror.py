@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+tests/verify_local_mirror.py
+LocalRepoMirror 验证：用本地bare仓库代替GitHub远程仓库，检查文件搜索（含非ASCII路径）、
+目录列表、内容读取、增量fetch，以及token不出现在git命令行中
+
+用法:
+    python tests/verify_local_mirror.py
+"""
+
+import base64
+import os
+import subprocess
+import sys
+import tempfile
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.local_mirror import LocalRepoMirror
+
+REPO = "octo/repo"
+TOKEN = "ghp_verify_local_mirror_token"
+FILES = {
+    "README.md": "# demo\n",
+    "data/map.csv": "key,value\na,1\n",
+    "数据/映射表.csv": "键,值\n甲,一\n",
+    "数据/说明 文档.txt": "含空格的文件名\n",
+}
+# 子模块（gitlink，ls-tree中为commit条目），名称与文件名搜索的关键字重叠
+SUBMODULE = "vendor/map-lib"
+
+
+def git(*args, cwd=None):
+    subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True)
+
+
+def create_remote(root: str) -> str:
+    """创建工作仓库并推送到bare仓库，返回工作仓库目录"""
+    work = os.path.join(root, "work")
+    remote = os.path.join(root, "remote", REPO + ".git")
+    git('init', '--quiet', '--bare', '-b', 'main', remote)
+    git('init', '--quiet', '-b', 'main', work)
+    git('config', 'user.email', 'test@example.com', cwd=work)
+    git('config', 'user.name', 'test', cwd=work)
+    for path, content in FILES.items():
+        os.makedirs(os.path.dirname(os.path.join(work, path)) or work, exist_ok=True)
+        with open(os.path.join(work, path), 'w', encoding='utf-8') as f:
+            f.write(content)
+    git('add', '.', cwd=work)
+    git('update-index', '--add', '--cacheinfo', f'160000,{"1" * 40},{SUBMODULE}', cwd=work)
+    git('commit', '--quiet', '-m', 'init', cwd=work)
+    git('remote', 'add', 'origin', remote, cwd=work)
+    git('push', '--quiet', 'origin', 'main', cwd=work)
+    return work
+
+
+def paths(entries):
+    return sorted(entry['path'] for entry in entries)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        work = create_remote(root)
+        trace_path = os.path.join(root, "git-trace.log")
+        os.environ['GIT_TRACE'] = trace_path
+        mirror = LocalRepoMirror(
+            os.path.join(root, "mirrors"),
+            remote_template=os.path.join(root, "remote", "{repo}.git"),
+            token=TOKEN,
+            refresh_interval=0
+        )
+
+        # 文件名搜索：子串、glob、非ASCII路径
+        assert paths(mirror.search_files(REPO, "映射")) == ["数据/映射表.csv"]
+        assert paths(mirror.search_files(REPO, "*.csv")) == ["data/map.csv", "数据/映射表.csv"]
+        assert paths(mirror.search_files(REPO, "数据/*.txt")) == ["数据/说明 文档.txt"]
+        print("✅ 文件名搜索（含非ASCII路径和空格）")
+        assert paths(mirror.search_files(REPO, "map")) == ["data/map.csv"]
+        assert paths(mirror.search_files(REPO, "vendor/*")) == []
+        print("✅ 文件名搜索不返回子模块")
+
+        # 目录列表
+        root_entries = {entry['path']: entry['type'] for entry in mirror.list_directory(REPO)}
+        assert root_entries == {"README.md": "file", "data": "dir", "数据": "dir", "vendor": "dir"}, root_entries
+        assert mirror.list_directory(REPO, "vendor")[0]['type'] == "submodule"
+        assert paths(mirror.list_directory(REPO, "数据")) == ["数据/映射表.csv", "数据/说明 文档.txt"]
+        print("✅ 目录列表")
+
+        # 内容读取（contents API结构和流式读取）
+        file_data = mirror.get_file_content(REPO, "数据/映射表.csv")
+        assert base64.b64decode(file_data['content']).decode('utf-8') == FILES["数据/映射表.csv"]
+        streamed = b''.join(mirror.stream_file_content(REPO, "数据/映射表.csv", sha=file_data['sha']))
+        assert streamed.decode('utf-8') == FILES["数据/映射表.csv"]
+        print("✅ 内容读取")
+
+        # 远程仓库的新提交在下一次同步时被fetch
+        with open(os.path.join(work, "数据", "新增.csv"), 'w', encoding='utf-8') as f:
+            f.write("k,v\n")
+        git('add', '.', cwd=work)
+        git('commit', '--quiet', '-m', 'add', cwd=work)
+        git('push', '--quiet', 'origin', 'main', cwd=work)
+        assert "数据/新增.csv" in paths(mirror.search_files(REPO, "新增"))
+        print("✅ 增量fetch")
+
+        # token通过环境变量传递，git命令行中不应出现token或其base64凭据
+        del os.environ['GIT_TRACE']
+        with open(trace_path, encoding='utf-8', errors='replace') as f:
+            trace = f.read()
+        credential = base64.b64encode(f"x-access-token:{TOKEN}".encode()).decode()
+        assert "git clone" in trace or "'clone'" in trace, "GIT_TRACE未记录clone命令"
+        assert TOKEN not in trace and credential not in trace
+        print("✅ token未出现在git命令行中")
+
+
+if __name__ == "__main__":
+    main()
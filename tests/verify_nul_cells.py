@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+tests/verify_nul_cells.py
+单元格内含\0（XLSX中的_x0000_转义还原后）的回归检查：
+按\0拼接单元格的行编码不能把不同的行编码成相同的值
+
+用法:
+    python tests/verify_nul_cells.py
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.excel_incremental import row_hash
+from tools.excel_processor import PackedRows, diff_keyed_rows
+
+# 直接按\0拼接后完全相同、但单元格不同的行
+AMBIGUOUS_ROWS = [
+    ["k1", "a\0b", "c"],
+    ["k1", "a", "b\0c"],
+    ["k1", "a", "b", "c"],
+    ["k1", "a\\0b", "c"],
+    ["k1", "a\\", "0b", "c"],
+    ["k1", "a\0", "b", "c"],
+]
+
+
+def verify_row_hash():
+    hashes = [row_hash(row) for row in AMBIGUOUS_ROWS]
+    assert len(set(hashes)) == len(hashes), "含\\0的不同行得到了相同的行哈希"
+    assert row_hash(["k1", "a\0b", "c"]) == row_hash(["k1", "a\0b", "c"])
+    print("✅ row_hash: 含\\0的单元格不会与其他行混淆")
+
+
+def verify_packed_rows():
+    headers = ["Key", "A", "B", "C"]
+    for row1 in AMBIGUOUS_ROWS:
+        data1 = PackedRows()
+        data1.add("k1", row1)
+        assert data1["k1"] == row1, f"PackedRows拆分后的行与原始行不一致: {data1['k1']!r}"
+        for row2 in AMBIGUOUS_ROWS:
+            data2 = PackedRows()
+            data2.add("k1", row2)
+            diff = diff_keyed_rows(headers, data1, headers, data2)
+            assert (diff.modified == ["k1"]) == (row1 != row2), f"{row1!r} 与 {row2!r} 的对比结果不对"
+            if row1 != row2:
+                expected = [col for col in range(max(len(row1), len(row2)))
+                            if col >= len(row1) or col >= len(row2) or row1[col] != row2[col]]
+                assert diff.changed_columns["k1"] == expected
+    print("✅ PackedRows: 含\\0的行拆分无误，对比结果与逐单元格比较一致")
+
+
+def main():
+    verify_row_hash()
+    verify_packed_rows()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+tests/verify_server_metrics.py
+服务器指标验证：通过stdio调用几个会成功和会失败的工具（Excel文件不存在、本地镜像克隆失败的list_files），
+检查失败调用返回isError，并且server_metrics的JSON和Prometheus输出都把它们计为error
+
+用法:
+    python tests/verify_server_metrics.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_FILE = "tests/test_data/source_onedrive.xlsx"
+TARGET_FILE = "tests/test_data/target_local.xlsx"
+
+CALLS = [
+    # (工具, 参数, 是否应该失败)
+    ("compare_excel_files", {"file1": "/nonexistent/a.xlsx", "file2": "/nonexistent/b.xlsx"}, True),
+    ("compare_excel_files", {"file1": SOURCE_FILE, "file2": TARGET_FILE}, False),
+    ("list_files", {"repo_name": "nobody/missing"}, True),
+]
+
+
+def request(request_id, method, params):
+    return json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}) + "\n"
+
+
+def run_server(mirror_dir: str):
+    """按顺序发送请求并等待服务器处理完（stdin关闭后服务器退出），返回 id -> 响应"""
+    env = dict(os.environ,
+               GITHUB_TOKEN="",
+               GITHUB_BACKEND="local",
+               GITHUB_MIRROR_DIR=mirror_dir,
+               # 远程仓库不存在，git clone失败，list_files走异常分支
+               GITHUB_MIRROR_REMOTE=os.path.join(mirror_dir, "missing-remote", "{repo}.git"))
+    lines = [request(0, "initialize", {"protocolVersion": "2025-06-18"})]
+    for i, (tool, arguments, _) in enumerate(CALLS, 1):
+        lines.append(request(i, "tools/call", {"name": tool, "arguments": arguments}))
+    server = subprocess.Popen([sys.executable, "github_mcp_server.py"], cwd=PROJECT_ROOT, env=env,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              text=True)
+    responses = {}
+    for line in lines:
+        server.stdin.write(line)
+        server.stdin.flush()
+        response = json.loads(server.stdout.readline())
+        responses[response["id"]] = response
+    # 所有调用都已返回后再取指标
+    metrics_id = len(CALLS) + 1
+    server.stdin.write(request(metrics_id, "tools/call",
+                               {"name": "server_metrics", "arguments": {"response_format": "json"}}))
+    server.stdin.write(request(metrics_id + 1, "tools/call",
+                               {"name": "server_metrics", "arguments": {"prometheus": "true"}}))
+    server.stdin.close()
+    for line in server.stdout:
+        response = json.loads(line)
+        responses[response["id"]] = response
+    server.wait(timeout=30)
+    return responses, metrics_id
+
+
+def main():
+    with tempfile.TemporaryDirectory() as mirror_dir:
+        responses, metrics_id = run_server(mirror_dir)
+
+    expected = {}
+    for i, (tool, _, should_fail) in enumerate(CALLS, 1):
+        result = responses[i]["result"]
+        assert bool(result.get("isError")) == should_fail, f"{tool} 的isError不对: {result}"
+        calls, errors = expected.get(tool, (0, 0))
+        expected[tool] = (calls + 1, errors + should_fail)
+        print(f"✅ {tool}: {'失败' if should_fail else '成功'} - {result['content'][0]['text'].splitlines()[0]}")
+
+    tools = json.loads(responses[metrics_id]["result"]["content"][0]["text"])["tools"]
+    prometheus = responses[metrics_id + 1]["result"]["content"][0]["text"].splitlines()
+    for tool, (calls, errors) in expected.items():
+        assert (tools[tool]["calls"], tools[tool]["errors"]) == (calls, errors), \
+            f"{tool} 的指标不对: {tools[tool]}"
+        line = f'mcp_tool_calls_total{{tool="{tool}",status="error"}} {errors}'
+        assert line in prometheus, f"Prometheus输出中没有: {line}"
+        print(f"✅ {tool}: 调用 {calls} 次，失败 {errors} 次")
+    print("✅ 失败的调用在JSON和Prometheus指标中都计为error")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+tools/csv_lookup.py
+CSV键值查找模块（解析CSV内容并按文件blob SHA缓存键值索引）
+"""
+
+import codecs
+import csv
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from tools.github_cache import SingleFlight
+
+# 每个索引条目除键值字符串外的估算开销（字节）
+ENTRY_OVERHEAD = 120
+# 流式解码时每次处理的字节数
+CHUNK_SIZE = 64 * 1024
+# 自动识别分隔符时参考的文本长度及候选分隔符
+SNIFF_SIZE = 4096
+SNIFF_DELIMITERS = ',;\t|'
+# 非UTF-8内容的后备编码
+FALLBACK_ENCODING = 'gb18030'
+# CSV的行尾位置（\n之后，或不接\n的\r之后）
+LINE_SPLIT = re.compile(r'(?<=\n)|(?<=\r)(?!\n)')
+
+CSVSource = Union[str, bytes, Iterable[bytes]]
+
+
+def _iter_byte_chunks(source: CSVSource) -> Iterator[bytes]:
+    """将bytes或字节块迭代器统一为字节块迭代器"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield bytes(view[start:start + CHUNK_SIZE])
+    else:
+        for chunk in source:
+            if chunk:
+                yield chunk
+
+
+def sniff_encoding(head: bytes) -> str:
+    """根据BOM和开头内容推断编码"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith(codecs.BOM_UTF16_LE) or head.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+def _iter_text_chunks(source: CSVSource, encoding: Optional[str]) -> Iterator[str]:
+    """增量解码字节流，产出文本块（不会一次性生成完整字符串）"""
+    if isinstance(source, str):
+        for start in range(0, len(source), CHUNK_SIZE):
+            yield source[start:start + CHUNK_SIZE]
+        return
+
+    chunks = _iter_byte_chunks(source)
+    first = next(chunks, b'')
+    decoder = codecs.getincrementaldecoder(encoding or sniff_encoding(first))(errors='replace')
+    yield decoder.decode(first)
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def _iter_lines(text_chunks: Iterator[str]) -> Iterator[str]:
+    """
+    把文本块切分为保留换行符的行，供csv模块处理跨行的引号字段
+
+    只按CRLF、LF、CR切分（与open(newline='')一致）；str.splitlines还会在U+2028、
+    垂直制表符、文件分隔符等字符处切分，会把字段中的这些字符当作行尾。
+    """
+    pending = ''
+    for chunk in text_chunks:
+        if not chunk:
+            continue
+        text = pending + chunk
+        lines = text.splitlines(keepends=True)
+        line_ends = text.count('\n') + text.count('\r') - text.count('\r\n')
+        if len(lines) - (not text.endswith(('\n', '\r'))) != line_ends:
+            # 文本中有splitlines额外当作行尾的字符，改为只按行尾切分
+            lines = LINE_SPLIT.split(text)
+            if not lines[-1]:
+                lines.pop()
+        # 最后一行没有以\n结尾时可能不完整（或\r\n被块边界分开），留到下一个块拼接
+        pending = lines.pop() if lines and not lines[-1].endswith('\n') else ''
+        yield from lines
+    if pending:
+        yield pending
+
+
+def sniff_delimiter(sample: str) -> str:
+    """根据开头文本推断分隔符，无法判断时使用逗号"""
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+
+def iter_csv_rows(source: CSVSource, delimiter: Optional[str] = None,
+                  encoding: Optional[str] = None) -> Iterator[list]:
+    """
+    流式解析CSV，逐行产出字段列表
+
+    参数:
+    - source: 文本、字节或字节块迭代器（如HTTP响应的iter_content）
+    - delimiter: 分隔符，None表示自动识别
+    - encoding: 字节内容的编码，None表示自动识别
+    """
+    text_chunks = _iter_text_chunks(source, encoding)
+    head_chunks = []
+    head_len = 0
+    if delimiter is None:
+        # 预读少量文本用于识别分隔符，之后与剩余内容拼接继续解析
+        for chunk in text_chunks:
+            head_chunks.append(chunk)
+            head_len += len(chunk)
+            if head_len >= SNIFF_SIZE:
+                break
+        delimiter = sniff_delimiter(''.join(head_chunks)[:SNIFF_SIZE])
+
+    def all_chunks():
+        yield from head_chunks
+        yield from text_chunks
+
+    yield from csv.reader(_iter_lines(all_chunks()), delimiter=delimiter)
+
+
+def iter_csv_pairs(source: CSVSource, key_column: int = 1, value_column: int = 2,
+                   delimiter: Optional[str] = None,
+                   encoding: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """
+    流式解析CSV，依次产出 (关键列, 值列)，列号为1-based
+
+    调用方找到目标后停止迭代即可停止读取剩余内容。
+    """
+    key_idx = key_column - 1
+    value_idx = value_column - 1
+    min_len = max(key_idx, value_idx) + 1
+    for row in iter_csv_rows(source, delimiter, encoding):
+        if len(row) >= min_len:
+            # 去除多余的引号和空格
+            key = row[key_idx].strip().strip('"\'')
+            value = row[value_idx].strip().strip('"\'')
+            yield key, value
+
+
+def build_csv_index(source: CSVSource, **options) -> Dict[str, str]:
+    """构建 关键列→值列 的索引，重复的key保留第一次出现的值（与逐行查找一致）
+
+    options透传给iter_csv_pairs（key_column、value_column、delimiter、encoding）。
+    """
+    index = {}
+    for key, value in iter_csv_pairs(source, **options):
+        if key not in index:
+            index[key] = value
+    return index
+
+
+def estimate_index_size(index: Dict[str, str]) -> int:
+    """估算索引占用的内存（字节）"""
+    return sum(len(k) + len(v) + ENTRY_OVERHEAD for k, v in index.items())
+
+
+class CSVIndexCache:
+    """
+    按文件blob SHA缓存CSV索引
+
+    同一SHA的文件内容不变，索引只构建一次；同一SHA的并发构建合并为一次（single-flight），
+    等待方共享构建结果，不计入命中和未命中。总内存超过max_bytes时按LRU淘汰。
+    key可以是SHA本身，也可以是包含解析选项的元组。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._indexes = OrderedDict()  # sha -> (index, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._builds = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, sha, builder: Callable[[], Dict[str, str]]) -> Dict[str, str]:
+        """返回SHA对应的索引，不存在时调用builder构建并缓存"""
+        if not sha:
+            return builder()
+        index = self._get(sha)
+        if index is not None:
+            return index
+        return self._builds.do(sha, lambda: self._build(sha, builder))
+
+    def _get(self, sha) -> Optional[Dict[str, str]]:
+        with self._lock:
+            cached = self._indexes.get(sha)
+            if cached is None:
+                return None
+            self._indexes.move_to_end(sha)
+            self.hits += 1
+            return cached[0]
+
+    def _build(self, sha, builder: Callable[[], Dict[str, str]]) -> Dict[str, str]:
+        # 查找缓存和发起构建之间，上一次构建可能刚好完成
+        index = self._get(sha)
+        if index is not None:
+            return index
+        with self._lock:
+            self.misses += 1
+        index = builder()
+
+        size = estimate_index_size(index)
+        if size > self.max_bytes:
+            print(f"CSV索引过大，不缓存: {sha} ({size} 字节)", file=sys.stderr)
+            return index
+
+        with self._lock:
+            if sha not in self._indexes:
+                self._indexes[sha] = (index, size)
+                self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._indexes.popitem(last=False)
+                self._total_bytes -= evicted_size
+        return index
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存统计"""
+        with self._lock:
+            return {
+                'indexes': len(self._indexes),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_builds': self._builds.stats()['shared']
+            }
+
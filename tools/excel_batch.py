@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+tools/excel_batch.py
+Excel批量处理（多文件/多工作表任务展开，进程池并行执行，汇总为结构化报告）
+"""
+
+import glob
+import json
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from tools.excel_processor import compare_sheets, copy_sheet_data, load_workbook
+from tools.progress import PROGRESS_INTERVAL, RequestCancelled, report_progress
+from tools.tool_result import as_bool
+
+# 批量任务的进程数，0表示使用CPU核数
+BATCH_WORKERS = int(os.getenv("EXCEL_BATCH_WORKERS", "0"))
+# 报告中每类差异列出的key样本数
+SAMPLE_KEYS = 5
+
+
+def expand_paths(pattern: str):
+    """展开通配符路径，不含通配符时原样返回"""
+    pattern = os.path.expanduser(pattern)
+    if glob.has_magic(pattern):
+        return sorted(glob.glob(pattern))
+    return [pattern]
+
+
+def pair_paths(pattern: str, other: str):
+    """
+    把第一个路径（可含通配符）与第二个路径配对
+
+    第二个路径是目录（或第一个路径含通配符）时，按文件名在该目录下匹配同名文件
+    """
+    matches = expand_paths(pattern)
+    other = os.path.expanduser(other)
+    if glob.has_magic(os.path.expanduser(pattern)) or os.path.isdir(other):
+        return [(path, os.path.join(other, os.path.basename(path))) for path in matches]
+    return [(path, other) for path in matches]
+
+
+def list_sheets(file_path: str):
+    """工作簿中的工作表名称列表"""
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def resolve_sheets(spec, file1: str, file2: str):
+    """
+    解析工作表说明，返回 [(工作表1, 工作表2), ...]
+
+    - 空: 两个文件的活动工作表
+    - "*": 两个文件中同名的所有工作表（按文件1中的顺序）
+    - 列表: 元素为同名工作表名称，或 [工作表1, 工作表2] 对
+    """
+    if not spec:
+        return [(None, None)]
+    if spec == "*":
+        sheets2 = set(list_sheets(file2))
+        return [(name, name) for name in list_sheets(file1) if name in sheets2]
+    if isinstance(spec, str):
+        spec = [spec]
+    pairs = []
+    for entry in spec:
+        if isinstance(entry, (list, tuple)):
+            pairs.append((entry[0], entry[1]))
+        else:
+            pairs.append((entry, entry))
+    return pairs
+
+
+def parse_items(items: str):
+    """解析批量任务JSON（对象列表，单个对象视为只有一项）"""
+    parsed = json.loads(items) if isinstance(items, str) else items
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    if not isinstance(parsed, list) or not all(isinstance(item, dict) for item in parsed):
+        raise ValueError("批量任务应为JSON对象列表")
+    return parsed
+
+
+def expand_compare_items(items, key_column: str = "1"):
+    """把对比任务展开为 (文件1, 文件2, 工作表1, 工作表2, 关键列) 任务列表"""
+    tasks = []
+    for item in items:
+        if 'file1' not in item or 'file2' not in item:
+            raise ValueError(f"对比任务缺少file1/file2: {item}")
+        for file1, file2 in pair_paths(item['file1'], item['file2']):
+            if not os.path.exists(file1) or not os.path.exists(file2):
+                # 文件缺失作为单项错误报告，不影响其他任务
+                tasks.append({'file1': file1, 'file2': file2, 'sheet1': None, 'sheet2': None,
+                              'key_column': str(item.get('key_column', key_column))})
+                continue
+            for sheet1, sheet2 in resolve_sheets(item.get('sheets'), file1, file2):
+                tasks.append({'file1': file1, 'file2': file2, 'sheet1': sheet1, 'sheet2': sheet2,
+                              'key_column': str(item.get('key_column', key_column))})
+    return tasks
+
+
+def expand_copy_items(items, streaming: bool = False):
+    """把复制任务展开为 (源文件, 目标文件, 源工作表, 目标工作表, 映射) 任务列表"""
+    tasks = []
+    for item in items:
+        if 'source_file' not in item or 'target_file' not in item or 'mapping' not in item:
+            raise ValueError(f"复制任务缺少source_file/target_file/mapping: {item}")
+        mapping = item['mapping']
+        if isinstance(mapping, str):
+            mapping = json.loads(mapping)
+        for source_file, target_file in pair_paths(item['source_file'], item['target_file']):
+            sheets = [(None, None)]
+            if os.path.exists(source_file) and os.path.exists(target_file):
+                sheets = resolve_sheets(item.get('sheets'), source_file, target_file)
+            for source_sheet, target_sheet in sheets:
+                tasks.append({'source_file': source_file, 'target_file': target_file,
+                              'source_sheet': source_sheet, 'target_sheet': target_sheet,
+                              'mapping': mapping,
+                              'streaming': as_bool(item.get('streaming', streaming))})
+    return tasks
+
+
+def run_compare_task(task, engine: str = "auto", memory_budget_mb: int = 512):
+    """执行一个对比任务，返回可序列化的结果摘要（在工作进程中运行）"""
+    result = dict(task)
+    start = time.perf_counter()
+    try:
+        for key in ('file1', 'file2'):
+            if not os.path.exists(task[key]):
+                raise FileNotFoundError(f"文件不存在: {task[key]}")
+        diff = compare_sheets(task['file1'], task['file2'], int(task['key_column']) - 1,
+                              engine, memory_budget_mb, task['sheet1'], task['sheet2'])
+        result.update({
+            'status': 'ok',
+            'total_file1': diff.total1,
+            'total_file2': diff.total2,
+            'removed_count': len(diff.removed),
+            'new_count': len(diff.added),
+            'modified_count': len(diff.modified),
+            'unchanged_count': diff.common_count - len(diff.modified),
+            'removed_sample': list(diff.removed[:SAMPLE_KEYS]),
+            'new_sample': list(diff.added[:SAMPLE_KEYS]),
+            'modified_sample': list(diff.modified[:SAMPLE_KEYS]),
+        })
+    except Exception as e:
+        result.update({'status': 'error', 'error': str(e)})
+    result['elapsed'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_copy_tasks(tasks):
+    """
+    顺序执行写入同一目标文件的复制任务（在工作进程中运行）
+
+    同一个目标工作簿的多次写入不能并行，否则后保存的会覆盖先保存的。
+    """
+    results = []
+    for task in tasks:
+        result = {key: value for key, value in task.items() if key != 'mapping'}
+        start = time.perf_counter()
+        try:
+            for key in ('source_file', 'target_file'):
+                if not os.path.exists(task[key]):
+                    raise FileNotFoundError(f"文件不存在: {task[key]}")
+            source_count, copied_rows, target_headers = copy_sheet_data(
+                task['source_file'], task['target_file'], task['mapping'], task['streaming'],
+                task['source_sheet'], task['target_sheet']
+            )
+            result.update({
+                'status': 'ok',
+                'source_rows': source_count,
+                'copied_rows': copied_rows,
+                'target_headers': [str(h) if h is not None else None for h in target_headers],
+            })
+        except Exception as e:
+            result.update({'status': 'error', 'error': str(e)})
+        result['elapsed'] = round(time.perf_counter() - start, 3)
+        results.append(result)
+    return results
+
+
+def worker_count(max_workers: int, units: int) -> int:
+    """实际使用的进程数"""
+    workers = int(max_workers or 0) or BATCH_WORKERS or os.cpu_count() or 1
+    return max(1, min(workers, units))
+
+
+def _record_worker(pids):
+    """工作进程初始化：登记进程号，请求取消时父进程据此结束工作进程"""
+    pids.put(os.getpid())
+
+
+def terminate_workers(pids):
+    """结束已登记的工作进程（进程可能已经退出）"""
+    while not pids.empty():
+        try:
+            os.kill(pids.get(), signal.SIGTERM)
+        except OSError:
+            pass
+
+
+def run_parallel(fn, units, workers: int, *args):
+    """
+    在进程池中执行 fn(unit, *args)，按输入顺序返回结果
+
+    服务器本身是多线程的，fork可能把其他线程持有的锁复制到子进程，
+    因此使用spawn方式启动工作进程。只有一个任务时直接在当前进程执行。
+    每完成一项报告一次进度；请求被取消时丢弃排队的任务并结束工作进程。
+    """
+    if workers <= 1 or len(units) <= 1:
+        results = []
+        for unit in units:
+            results.append(fn(unit, *args))
+            report_progress(1, f"批量任务完成 {len(results)}/{len(units)}", total=len(units))
+        return results
+    context = multiprocessing.get_context("spawn")
+    pids = context.SimpleQueue()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_record_worker, initargs=(pids,)) as executor:
+        futures = [executor.submit(fn, unit, *args) for unit in units]
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                report_progress(len(done), f"批量任务完成 {len(futures) - len(pending)}/{len(futures)}",
+                                total=len(futures))
+        except RequestCancelled:
+            executor.shutdown(wait=False, cancel_futures=True)
+            # 正在执行的任务无法中断，直接结束工作进程释放内存
+            terminate_workers(pids)
+            raise
+        return [future.result() for future in futures]
+
+
+def build_report(operation: str, results, workers: int, wall_time: float) -> dict:
+    """汇总各项结果为批量报告"""
+    succeeded = sum(1 for result in results if result['status'] == 'ok')
+    return {
+        'operation': operation,
+        'items': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'workers': workers,
+        'wall_time': round(wall_time, 3),
+        'item_time_total': round(sum(result['elapsed'] for result in results), 3),
+        'results': results,
+    }
+
+
+def batch_compare(items, key_column: str = "1", engine: str = "auto",
+                  memory_budget_mb: int = 512, max_workers: int = 0) -> dict:
+    """批量对比，内存预算在各工作进程间平分"""
+    start = time.perf_counter()
+    tasks = expand_compare_items(parse_items(items), key_column)
+    workers = worker_count(max_workers, len(tasks))
+    budget = max(1, int(memory_budget_mb) // workers)
+    results = run_parallel(run_compare_task, tasks, workers, engine, budget)
+    return build_report('compare', results, workers, time.perf_counter() - start)
+
+
+def batch_copy(items, streaming: bool = False, max_workers: int = 0) -> dict:
+    """批量复制，按目标文件分组，不同目标文件之间并行"""
+    start = time.perf_counter()
+    tasks = expand_copy_items(parse_items(items), streaming)
+    groups = {}
+    for task in tasks:
+        groups.setdefault(os.path.abspath(task['target_file']), []).append(task)
+    units = list(groups.values())
+    workers = worker_count(max_workers, len(units))
+    results = [result for group in run_parallel(run_copy_tasks, units, workers) for result in group]
+    return build_report('copy', results, workers, time.perf_counter() - start)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+tools/excel_cache.py
+已解析工作表缓存（按 路径+修改时间+大小+工作表 缓存行数据，按内存占用LRU淘汰）
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# 行数据内存估算参数（tuple对象头、每个元素的指针、字符串/数值对象开销）
+ROW_OVERHEAD = 56
+POINTER_SIZE = 8
+STR_OVERHEAD = 49
+VALUE_SIZE = 32
+
+
+def estimate_row_size(row) -> int:
+    """估算一行数据（tuple）占用的内存（字节）"""
+    size = ROW_OVERHEAD + POINTER_SIZE * len(row)
+    for value in row:
+        if value is None:
+            continue
+        size += STR_OVERHEAD + len(value) if isinstance(value, str) else VALUE_SIZE
+    return size
+
+
+class SheetCache:
+    """
+    进程内的工作表解析结果缓存
+
+    key为 (绝对路径, 修改时间ns, 文件大小, 工作表名)，文件被修改后key自然失效；
+    本进程写入文件后还会调用invalidate立即清除，避免修改时间精度不足导致读到旧数据。
+    总内存超过max_bytes时按LRU淘汰。
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._sheets = OrderedDict()  # key -> (title, headers, rows, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(file_path: str, sheet_name: str = None) -> Optional[tuple]:
+        """根据文件状态生成缓存key，文件不存在时返回None"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, sheet_name)
+
+    def get(self, key):
+        """返回 (工作表标题, 表头, 行列表)，未命中返回None"""
+        if key is None:
+            return None
+        with self._lock:
+            cached = self._sheets.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            self._sheets.move_to_end(key)
+            self.hits += 1
+            return cached[:3]
+
+    def put(self, key, title: str, headers, rows, size: int) -> None:
+        """缓存工作表数据，size为估算的内存占用"""
+        if key is None:
+            return
+        if size > self.max_bytes:
+            print(f"工作表过大，不缓存: {key[0]} ({size} 字节)", file=sys.stderr)
+            return
+        with self._lock:
+            # 同一文件同一工作表的旧版本不会再被命中，直接移除
+            for old_key in [k for k in self._sheets if k[0] == key[0] and k[3] == key[3]]:
+                self._remove(old_key)
+            self._sheets[key] = (title, headers, rows, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._sheets)))
+                self.evictions += 1
+
+    def _remove(self, key) -> None:
+        _, _, _, size = self._sheets.pop(key)
+        self._total_bytes -= size
+
+    def invalidate(self, file_path: str) -> None:
+        """清除某个文件所有工作表的缓存（写入文件后调用）"""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            for key in [k for k in self._sheets if k[0] == path]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sheets.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存统计"""
+        with self._lock:
+            return {
+                'sheets': len(self._sheets),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+sheet_cache = SheetCache(
+    max_bytes=int(os.getenv("EXCEL_SHEET_CACHE_MB", "128")) * 1024 * 1024
+)
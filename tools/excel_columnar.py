@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+tools/excel_columnar.py
+Excel列式对比引擎（字典编码的NumPy列数组 + 向量化排序连接）
+"""
+
+try:
+    import numpy as np
+    COLUMNAR_AVAILABLE = True
+except ImportError:
+    COLUMNAR_AVAILABLE = False
+
+from array import array
+
+from tools.excel_processor import CompareResult, SheetStream
+from tools.excel_sidecar import T_FLOAT, T_INT, T_STR
+
+# 旁路文件中保存的文本与str(值)相同的值类型
+PLAIN_TEXT_TAGS = (T_STR, T_INT, T_FLOAT)
+
+
+class ValueCodes:
+    """
+    单元格文本的字典编码：每个不同的字符串对应一个整数编码
+
+    两个文件的所有列共用同一个编码表，编码相同即字符串相同，列比较和key连接都在整数数组上完成。
+    每个不同的值只保存一份，内存与数据量成正比（定长字符串数组会按最长的单元格分配每一项）。
+    """
+
+    EMPTY = 0
+
+    def __init__(self):
+        self.codes = {"": self.EMPTY}
+        self._values = []
+
+    def encode_all(self, texts):
+        """为texts中尚未编码的字符串按首次出现的顺序分配编码，返回编码表"""
+        codes = self.codes
+        missing = [text for text in dict.fromkeys(texts) if text not in codes]
+        codes.update(zip(missing, range(len(codes), len(codes) + len(missing))))
+        return codes
+
+    @property
+    def values(self):
+        """编码 → 字符串（编码按首次出现的顺序分配，与字典的插入顺序一致）"""
+        if len(self._values) != len(self.codes):
+            self._values = list(self.codes)
+        return self._values
+
+
+def read_keyed_columns(file_path: str, key_col_idx: int, value_codes: ValueCodes,
+                       sheet_name: str = None):
+    """
+    按列读取工作表，跳过关键列为空的行
+
+    返回 (表头, 列数组列表)，每列为单元格文本编码的int64数组，空单元格为ValueCodes.EMPTY
+    """
+    codes = value_codes.codes
+    encode = codes.setdefault
+    with SheetStream(file_path, sheet_name) as stream:
+        headers = stream.header_names()
+        if stream.sidecar is not None:
+            columns = _sidecar_columns(stream.sidecar, stream.width, key_col_idx, value_codes)
+            if columns is not None:
+                return headers, columns
+        columns = [array('q') for _ in range(stream.width)]
+        appends = [column.append for column in columns]
+        count = 0
+        for row in stream.rows():
+            key = row[key_col_idx] if key_col_idx < len(row) else None
+            if key is None or str(key) == "":
+                continue
+            if len(row) > len(columns):
+                # 行比表头宽（表格尺寸信息缺失时可能出现），补齐新增的列
+                columns.extend(array('q', [ValueCodes.EMPTY]) * count for _ in range(len(row) - len(columns)))
+                appends = [column.append for column in columns]
+            for append, cell_value in zip(appends, row):
+                # 新的字符串取当前编码表大小作为编码
+                append(encode("" if cell_value is None else str(cell_value), len(codes)))
+            for append in appends[len(row):]:
+                append(ValueCodes.EMPTY)
+            count += 1
+    return headers, [np.frombuffer(column, dtype=np.int64) for column in columns]
+
+
+def _pool_texts(sidecar):
+    """
+    旁路文件值池中每个值的单元格文本（与逐行读取时的 str(值) 相同，None为空字符串）
+
+    文本、整数和小数在值池中保存的就是str()的结果，直接切片，不逐个解码；
+    其余类型（布尔、日期时间等）解码后再转换为文本。
+    """
+    raw = bytes(sidecar.pool_bytes)
+    offsets = sidecar.pool_offsets.tolist()
+    if raw.isascii():
+        # 纯ASCII时字节偏移就是字符偏移，整体解码一次后切片
+        text = raw.decode('ascii')
+        texts = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+    else:
+        texts = [raw[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+    tags = np.frombuffer(sidecar.tags, dtype=np.uint8)
+    for value_id in np.flatnonzero(~np.isin(tags, PLAIN_TEXT_TAGS)).tolist():
+        value = sidecar.value(value_id)
+        texts[value_id] = "" if value is None else str(value)
+    del tags
+    return texts
+
+
+def _sidecar_columns(sidecar, width: int, key_col_idx: int, value_codes: ValueCodes):
+    """
+    从旁路文件的单元格值编号直接生成列编码数组（结果与逐行读取相同）
+
+    旁路文件中每个不同的值只出现一次，只需对值池逐个转换为文本并编码，
+    单元格通过数组索引一次性映射为编码，不再逐个单元格执行Python代码。
+    各行宽度不一致时返回None，由调用方逐行读取。
+    """
+    offsets = np.frombuffer(sidecar.row_offsets, dtype=np.uint64)
+    rows = len(offsets) - 1
+    row_width = int(offsets[1] - offsets[0]) if rows else width
+    if rows and not (np.diff(offsets) == row_width).all():
+        return None
+
+    texts = _pool_texts(sidecar)
+    lookup = np.fromiter(map(value_codes.encode_all(texts).__getitem__, texts),
+                         dtype=np.int64, count=len(texts))
+    cells = np.frombuffer(sidecar.cells, dtype=np.uint32).reshape(rows, row_width)
+    coded = lookup[cells]
+    # 释放对内存映射的引用，旁路文件关闭时才能解除映射
+    del cells, offsets
+    if key_col_idx < row_width:
+        coded = coded[coded[:, key_col_idx] != ValueCodes.EMPTY]
+    else:
+        coded = coded[:0]
+    columns = [np.ascontiguousarray(coded[:, col]) for col in range(row_width)]
+    columns += [np.full(len(coded), ValueCodes.EMPTY, dtype=np.int64)
+                for _ in range(width - row_width)]
+    return columns
+
+
+def _unique_keep_last(values):
+    """对数组去重并排序，重复值保留最后一次出现的行（与字典赋值语义一致）"""
+    reversed_values = values[::-1]
+    unique_values, first_in_reversed = np.unique(reversed_values, return_index=True)
+    return unique_values, len(values) - 1 - first_in_reversed
+
+
+def _sorted_join(left, right):
+    """两个有序去重数组的连接，返回 (left中匹配的掩码, 对应的right位置)"""
+    pos = np.searchsorted(right, left)
+    clipped = np.minimum(pos, max(len(right) - 1, 0))
+    matched = (pos < len(right)) & (right[clipped] == left) if len(right) else np.zeros(len(left), bool)
+    return matched, clipped
+
+
+class SortedKeyMap:
+    """
+    基于有序key编码数组的只读映射（key → 值），通过二分查找定位，
+    避免为全部key构建Python字典
+    """
+
+    def __init__(self, sorted_codes, value_codes: ValueCodes, value_at):
+        self.sorted_codes = sorted_codes
+        self.value_codes = value_codes
+        self.value_at = value_at
+
+    def position(self, key):
+        code = self.value_codes.codes.get(key)
+        if code is None:
+            raise KeyError(key)
+        pos = int(np.searchsorted(self.sorted_codes, code))
+        if pos >= len(self.sorted_codes) or self.sorted_codes[pos] != code:
+            raise KeyError(key)
+        return pos
+
+    def __getitem__(self, key):
+        return self.value_at(self.position(key))
+
+    def __contains__(self, key):
+        try:
+            self.position(key)
+            return True
+        except KeyError:
+            return False
+
+    def __len__(self):
+        return len(self.sorted_codes)
+
+
+def diff_columns(headers1, columns1, headers2, columns2, key_col_idx: int,
+                 value_codes: ValueCodes) -> CompareResult:
+    """
+    向量化对比两组列编码数组
+
+    key编码排序去重后用二分查找完成连接，再逐列比较编码得到每个key的变更列矩阵。
+    结果中key的顺序为编码顺序（即key在文件中首次出现的顺序）。
+    """
+    empty = np.array([], dtype=np.int64)
+    keys1 = columns1[key_col_idx] if key_col_idx < len(columns1) else empty
+    keys2 = columns2[key_col_idx] if key_col_idx < len(columns2) else empty
+    codes1, rows_idx1 = _unique_keep_last(keys1)
+    codes2, rows_idx2 = _unique_keep_last(keys2)
+
+    in2, pos_in2 = _sorted_join(codes1, codes2)
+    in1, _ = _sorted_join(codes2, codes1)
+
+    common_rows1 = rows_idx1[in2]
+    common_rows2 = rows_idx2[pos_in2[in2]]
+
+    width = max(len(columns1), len(columns2))
+    changed = np.zeros((len(common_rows1), width), dtype=bool)
+    for col in range(width):
+        if col < len(columns1) and col < len(columns2):
+            changed[:, col] = columns1[col][common_rows1] != columns2[col][common_rows2]
+        else:
+            # 只有一个文件有该列，整行视为不同
+            changed[:, col] = True
+
+    modified_mask = changed.any(axis=1)
+    modified_codes = codes1[in2][modified_mask]
+    modified_changes = changed[modified_mask]
+    decode = value_codes.values
+
+    def decode_keys(codes):
+        return [decode[code] for code in codes.tolist()]
+
+    def row_getter(columns, rows_idx):
+        return lambda pos: [decode[int(column[rows_idx[pos]])] for column in columns]
+
+    return CompareResult(
+        headers1, headers2, len(codes1), len(codes2),
+        decode_keys(codes1[~in2]), decode_keys(codes2[~in1]),
+        decode_keys(modified_codes), len(common_rows1),
+        SortedKeyMap(codes1, value_codes, row_getter(columns1, rows_idx1)),
+        SortedKeyMap(codes2, value_codes, row_getter(columns2, rows_idx2)),
+        SortedKeyMap(modified_codes, value_codes,
+                     lambda pos: np.nonzero(modified_changes[pos])[0].tolist()),
+        modified_changes.sum(axis=0).tolist()
+    )
+
+
+def compare_columnar(file1: str, file2: str, key_col_idx: int,
+                     sheet1: str = None, sheet2: str = None) -> CompareResult:
+    """读取两个文件为列编码数组并向量化对比"""
+    if not COLUMNAR_AVAILABLE:
+        raise Exception("列式对比引擎需要安装numpy: pip install numpy")
+    value_codes = ValueCodes()
+    headers1, columns1 = read_keyed_columns(file1, key_col_idx, value_codes, sheet1)
+    headers2, columns2 = read_keyed_columns(file2, key_col_idx, value_codes, sheet2)
+    return diff_columns(headers1, columns1, headers2, columns2, key_col_idx, value_codes)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+tools/excel_external.py
+Excel外存对比引擎（按key哈希分区落盘，逐分区连接对比，内存占用受预算限制）
+"""
+
+import json
+import math
+import os
+import tempfile
+import zlib
+from array import array
+from itertools import islice
+
+from tools.excel_processor import CompareResult, PackedRows, SheetStream, diff_keyed_rows
+from tools.progress import report_progress
+
+# XLSX为压缩格式，解析为Python对象后的内存占用约为文件大小的倍数（经验值）
+MEMORY_EXPANSION_FACTOR = 20
+# 分区数上限（每个文件每个分区各占用一个文件句柄）
+MAX_PARTITIONS = 256
+# 每类差异在内存中保留的样本行数
+SAMPLE_ROWS = 5
+
+
+def estimate_memory(file_path: str) -> int:
+    """估算完整加载文件所需的内存（字节）"""
+    return os.path.getsize(file_path) * MEMORY_EXPANSION_FACTOR
+
+
+class SpilledList:
+    """
+    只追加的列表，全部内容写入磁盘，内存中只保留开头一部分和每项的文件偏移
+
+    支持len()、迭代和切片，切片超出内存部分时定位到起始项直接读取，
+    分页读取时不需要从头扫描。
+    """
+
+    def __init__(self, path: str, head_size: int = 100):
+        self.path = path
+        self.head_size = head_size
+        self._head = []
+        self._offsets = array('Q')
+        self._size = 0
+        self._file = open(path, 'wb')
+
+    def append(self, item):
+        line = (json.dumps(item, ensure_ascii=False) + '\n').encode('utf-8')
+        self._offsets.append(self._size)
+        self._file.write(line)
+        self._size += len(line)
+        if len(self._head) < self.head_size:
+            self._head.append(item)
+
+    def finish(self):
+        """结束写入"""
+        self._file.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if stop <= len(self._head):
+                return self._head[start:stop:step]
+            if start >= stop:
+                return []
+            with open(self.path, 'rb') as f:
+                f.seek(self._offsets[start])
+                return [json.loads(line) for line in islice(f, 0, stop - start, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self[index:index + 1][0]
+
+
+def _partition_of(key: str, partitions: int) -> int:
+    return zlib.crc32(key.encode('utf-8')) % partitions
+
+
+def spill_sheet(file_path: str, key_col_idx: int, partitions: int, prefix: str,
+                sheet_name: str = None):
+    """流式读取工作表，按key哈希把行写入各分区文件，返回表头"""
+    files = [open(f"{prefix}.{p}", 'w', encoding='utf-8') for p in range(partitions)]
+    try:
+        # 外存对比用于超出内存的文件，不把整个工作表收集进缓存
+        with SheetStream(file_path, sheet_name, cache=False) as stream:
+            headers = stream.header_names()
+            for row in stream.rows():
+                row_data = [str(cell_value) if cell_value is not None else "" for cell_value in row]
+                if key_col_idx < len(row_data) and row_data[key_col_idx]:
+                    key = row_data[key_col_idx]
+                    files[_partition_of(key, partitions)].write(
+                        json.dumps(row_data, ensure_ascii=False) + '\n'
+                    )
+    finally:
+        for f in files:
+            f.close()
+    return headers
+
+
+def load_partition(path: str, key_col_idx: int):
+    """读取一个分区为 key→行数据 映射（后出现的行覆盖先出现的，与全量读取一致）"""
+    data = PackedRows()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            row_data = json.loads(line)
+            data.add(row_data[key_col_idx], row_data)
+    return data
+
+
+def compare_external(file1: str, file2: str, key_col_idx: int, memory_budget_mb: int = 512,
+                     sheet1: str = None, sheet2: str = None) -> CompareResult:
+    """
+    外存对比：两个文件按key哈希分区写入临时文件，每次只加载一对分区做连接对比
+
+    分区数根据文件大小和内存预算确定；完整的差异key列表写入磁盘，
+    内存中只保留统计数据和少量样本行。
+    """
+    budget = max(1, int(memory_budget_mb)) * 1024 * 1024
+    estimated = estimate_memory(file1) + estimate_memory(file2)
+    partitions = min(MAX_PARTITIONS, max(1, math.ceil(estimated / budget)))
+
+    # 临时目录随结果对象一起释放
+    workdir = tempfile.TemporaryDirectory(prefix="mcp-excel-diff-")
+    prefix1 = os.path.join(workdir.name, "file1")
+    prefix2 = os.path.join(workdir.name, "file2")
+    headers1 = spill_sheet(file1, key_col_idx, partitions, prefix1, sheet1)
+    headers2 = spill_sheet(file2, key_col_idx, partitions, prefix2, sheet2)
+
+    removed = SpilledList(os.path.join(workdir.name, "removed"))
+    added = SpilledList(os.path.join(workdir.name, "added"))
+    modified = SpilledList(os.path.join(workdir.name, "modified"))
+    # 与key列表按位置对应的行数据，分页读取完整差异时使用
+    spilled_rows = {
+        name: SpilledList(os.path.join(workdir.name, f"{name}.rows"), head_size=0)
+        for name in ("removed", "added", "modified")
+    }
+    rows1, rows2, changed_columns = {}, {}, {}
+    column_change_counts = [0] * max(len(headers1), len(headers2))
+    total1 = total2 = common_count = 0
+
+    for p in range(partitions):
+        report_progress(0, f"对比分区 {p + 1}/{partitions}")
+        data1 = load_partition(f"{prefix1}.{p}", key_col_idx)
+        data2 = load_partition(f"{prefix2}.{p}", key_col_idx)
+        part = diff_keyed_rows(headers1, data1, headers2, data2)
+        total1 += part.total1
+        total2 += part.total2
+        common_count += part.common_count
+
+        for key in part.removed:
+            if len(removed) < SAMPLE_ROWS:
+                rows1[key] = data1[key]
+            removed.append(key)
+            spilled_rows["removed"].append(data1[key])
+        for key in part.added:
+            if len(added) < SAMPLE_ROWS:
+                rows2[key] = data2[key]
+            added.append(key)
+            spilled_rows["added"].append(data2[key])
+        for key in part.modified:
+            if len(modified) < SAMPLE_ROWS:
+                rows1[key] = data1[key]
+                rows2[key] = data2[key]
+                changed_columns[key] = part.changed_columns[key]
+            modified.append(key)
+            spilled_rows["modified"].append([data1[key], data2[key], part.changed_columns[key]])
+        for col, count in enumerate(part.column_change_counts):
+            if col >= len(column_change_counts):
+                column_change_counts.append(0)
+            column_change_counts[col] += count
+
+        # 分区处理完即删除，释放磁盘空间
+        os.remove(f"{prefix1}.{p}")
+        os.remove(f"{prefix2}.{p}")
+
+    for spilled in (removed, added, modified, *spilled_rows.values()):
+        spilled.finish()
+
+    result = CompareResult(
+        headers1, headers2, total1, total2, removed, added, modified, common_count,
+        rows1, rows2, changed_columns, column_change_counts
+    )
+    result.workdir = workdir
+    result.spilled_rows = spilled_rows
+    result.partitions = partitions
+    return result
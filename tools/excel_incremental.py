@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+tools/excel_incremental.py
+Excel增量对比（保存每个key的行哈希清单，下次运行只报告哈希变化的key）
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from tools.excel_cache import estimate_row_size
+from tools.excel_processor import SheetStream
+from tools.result_pages import MappedSequence, PagedResult
+
+MANIFEST_VERSION = 2
+# 默认清单目录
+MANIFEST_DIR = os.path.expanduser(os.getenv("EXCEL_MANIFEST_DIR", "~/.cache/mcp-excel-manifests"))
+# 报告中每组列出的key数量
+SAMPLE_KEYS = 20
+
+# 差异状态
+REMOVED, ADDED, MODIFIED, UNCHANGED, GONE = "removed", "added", "modified", "unchanged", "gone"
+STATUS_LABELS = {
+    REMOVED: "🚫 只在文件1中存在",
+    ADDED: "🆕 只在文件2中存在",
+    MODIFIED: "🔄 两边都有但内容不同",
+    UNCHANGED: "✅ 两边一致",
+    GONE: "🗑️ 两个文件中都已删除",
+}
+STATUS_NAMES = {
+    REMOVED: "仅文件1", ADDED: "仅文件2", MODIFIED: "有变更", UNCHANGED: "一致", GONE: "已删除",
+}
+
+
+def row_hash(row_data) -> str:
+    """行数据（字符串列表）的哈希，列数不同的行哈希也不同"""
+    joined = '\0'.join(row_data)
+    if joined.count('\0') < len(row_data):
+        return hashlib.blake2b(joined.encode('utf-8'), digest_size=8).hexdigest()
+    # 单元格本身含\0（_x0000_转义还原后）时直接拼接会有歧义：
+    # 转义后再拼接，并用不同的personalization与不含\0的行区分
+    escaped = '\0'.join(cell.replace('\\', '\\\\').replace('\0', '\\0') for cell in row_data)
+    return hashlib.blake2b(escaped.encode('utf-8'), digest_size=8, person=b'nul-escaped').hexdigest()
+
+
+def hash_keyed_rows(file_path: str, key_col_idx: int, sheet_name: str = None):
+    """
+    流式读取工作表，只保留 key→行哈希，不保存行数据
+
+    单元格转换规则和重复key的处理（后出现的覆盖先出现的）与read_keyed_rows一致。
+    """
+    hashes = {}
+    with SheetStream(file_path, sheet_name) as stream:
+        for row in stream.rows():
+            row_data = [str(cell_value) if cell_value is not None else "" for cell_value in row]
+            if key_col_idx < len(row_data) and row_data[key_col_idx]:
+                hashes[row_data[key_col_idx]] = row_hash(row_data)
+    return hashes
+
+
+def key_status(key, hashes1, hashes2) -> str:
+    """根据两边的行哈希判断key的差异状态"""
+    hash1 = hashes1.get(key)
+    hash2 = hashes2.get(key)
+    if hash1 is None and hash2 is None:
+        return GONE
+    if hash2 is None:
+        return REMOVED
+    if hash1 is None:
+        return ADDED
+    return UNCHANGED if hash1 == hash2 else MODIFIED
+
+
+def default_manifest_path(file1: str, file2: str, key_col_idx: int, sheet1=None, sheet2=None) -> str:
+    """按文件路径、工作表和关键列生成默认清单路径"""
+    ident = json.dumps([os.path.abspath(file1), os.path.abspath(file2), key_col_idx, sheet1, sheet2])
+    name = hashlib.sha1(ident.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(MANIFEST_DIR, f"{name}.json")
+
+
+def manifest_identity(file1: str, file2: str, key_col_idx: int, sheet1=None, sheet2=None) -> dict:
+    """清单对应的对比参数（绝对路径、关键列和工作表），读取清单时必须全部一致"""
+    return {
+        'file1': os.path.abspath(file1),
+        'file2': os.path.abspath(file2),
+        'key_column': key_col_idx + 1,
+        'sheet1': sheet1,
+        'sheet2': sheet2,
+    }
+
+
+def load_manifest(path: str, identity: dict = None):
+    """
+    读取上次运行的清单，不存在、格式不符或与identity不一致时返回None
+
+    清单路径可以由调用方指定，同一路径被用于其他文件或其他关键列时，
+    旧清单中的哈希不能作为基线，丢弃后重新建立。
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except ValueError:
+        print(f"清单文件无法解析，将重新建立基线: {path}", file=sys.stderr)
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return None
+    if identity is not None:
+        mismatched = [field for field, value in identity.items() if manifest.get(field) != value]
+        if mismatched:
+            print(f"清单文件的 {', '.join(mismatched)} 与本次对比不一致，将重新建立基线: {path}",
+                  file=sys.stderr)
+            return None
+    return manifest
+
+
+def save_manifest(path: str, manifest: dict) -> None:
+    """原子写入清单"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.json', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class IncrementalResult:
+    """
+    增量对比结果
+
+    - counts: 当前各差异状态的key数量
+    - changed: 自上次运行以来行哈希发生变化的key，按当前状态分组
+    - previous_status: 变化key在上次运行时的状态
+    """
+
+    def __init__(self, total1, total2, counts, changed, previous_status, previous_run):
+        self.total1 = total1
+        self.total2 = total2
+        self.counts = counts
+        self.changed = changed
+        self.previous_status = previous_status
+        self.previous_run = previous_run
+
+    @property
+    def changed_count(self) -> int:
+        return sum(len(keys) for keys in self.changed.values())
+
+
+def compare_incremental(file1: str, file2: str, key_col_idx: int, manifest_path: str = None,
+                        sheet1: str = None, sheet2: str = None) -> IncrementalResult:
+    """
+    按行哈希对比两个文件，并与上次运行的清单比较，只找出哈希发生变化的key
+
+    首次运行（没有清单）时所有key都视为变化，并建立基线清单。
+    """
+    manifest_path = manifest_path or default_manifest_path(file1, file2, key_col_idx, sheet1, sheet2)
+    identity = manifest_identity(file1, file2, key_col_idx, sheet1, sheet2)
+    manifest = load_manifest(manifest_path, identity)
+    old1 = manifest['hashes1'] if manifest else {}
+    old2 = manifest['hashes2'] if manifest else {}
+
+    hashes1 = hash_keyed_rows(file1, key_col_idx, sheet1)
+    hashes2 = hash_keyed_rows(file2, key_col_idx, sheet2)
+
+    counts = {REMOVED: 0, ADDED: 0, MODIFIED: 0, UNCHANGED: 0}
+    for key, hash1 in hashes1.items():
+        hash2 = hashes2.get(key)
+        if hash2 is None:
+            counts[REMOVED] += 1
+        else:
+            counts[UNCHANGED if hash1 == hash2 else MODIFIED] += 1
+    counts[ADDED] = len(hashes2) - counts[UNCHANGED] - counts[MODIFIED]
+
+    changed = {status: [] for status in STATUS_LABELS}
+    previous_status = {}
+    for key in hashes1.keys() | hashes2.keys() | old1.keys() | old2.keys():
+        if hashes1.get(key) == old1.get(key) and hashes2.get(key) == old2.get(key):
+            continue
+        changed[key_status(key, hashes1, hashes2)].append(key)
+        previous_status[key] = key_status(key, old1, old2) if manifest else None
+
+    save_manifest(manifest_path, {
+        'version': MANIFEST_VERSION,
+        **identity,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'hashes1': hashes1,
+        'hashes2': hashes2,
+    })
+
+    return IncrementalResult(
+        len(hashes1), len(hashes2), counts,
+        {status: sorted(keys) for status, keys in changed.items()},
+        previous_status, manifest.get('created') if manifest else None
+    )
+
+
+def incremental_result_data(file1: str, file2: str, manifest_path: str, diff: IncrementalResult):
+    """增量对比结果的结构化数据，返回 (汇总字段, 明细字段)"""
+    data = {
+        'file1': file1,
+        'file2': file2,
+        'manifest_file': manifest_path,
+        'previous_run': diff.previous_run,
+        'metrics': {
+            'removed_count': diff.counts[REMOVED],
+            'new_count': diff.counts[ADDED],
+            'modified_count': diff.counts[MODIFIED],
+            'unchanged_count': diff.counts[UNCHANGED],
+            'total_file1': diff.total1,
+            'total_file2': diff.total2,
+            'changed_since_last_run': diff.changed_count,
+        },
+        'changed_counts': {status: len(keys) for status, keys in diff.changed.items()},
+    }
+    details = {
+        'changed': {
+            status: [
+                {'key': key, 'previous_status': diff.previous_status.get(key)}
+                for key in keys[:SAMPLE_KEYS]
+            ]
+            for status, keys in diff.changed.items() if keys
+        },
+    }
+    return data, details
+
+
+def incremental_pages(diff: IncrementalResult) -> PagedResult:
+    """增量对比结果的分页视图，每个差异状态一个分区，只包含自上次运行以来变化的key"""
+    def changed_item(key):
+        return {'key': key, 'previous_status': diff.previous_status.get(key)}
+
+    def changed_line(item):
+        previous = item['previous_status']
+        return f"{item['key']} (上次: {STATUS_NAMES[previous]})" if previous else item['key']
+
+    return PagedResult(
+        'incremental',
+        {status: MappedSequence(keys, changed_item) for status, keys in diff.changed.items()},
+        line={status: changed_line for status in diff.changed},
+        size=sum(estimate_row_size(keys) for keys in diff.changed.values())
+    )
+
+
+def format_incremental_report(file1: str, file2: str, manifest_path: str,
+                              diff: IncrementalResult) -> str:
+    """构建增量对比结果文本"""
+    counts = diff.counts
+    parts = [f"""📊 Excel增量对比分析
+
+📁 文件1: {file1} ({diff.total1}个项目)
+📁 文件2: {file2} ({diff.total2}个项目)
+🗂️ 清单文件: {manifest_path}
+上次运行: {diff.previous_run or '无（首次运行，已建立基线）'}
+
+🔍 当前差异统计:
+• 只在文件1中存在: {counts[REMOVED]} (可能已移除)
+• 只在文件2中存在: {counts[ADDED]} (新发现)
+• 共有项目中有变更: {counts[MODIFIED]}
+• 共有项目中无变更: {counts[UNCHANGED]}
+
+🔁 自上次运行以来行内容变化的项目: {diff.changed_count}"""]
+
+    for status, label in STATUS_LABELS.items():
+        keys = diff.changed[status]
+        if not keys:
+            continue
+        parts.append(f"\n\n{label} ({len(keys)}):")
+        for key in keys[:SAMPLE_KEYS]:
+            previous = diff.previous_status.get(key)
+            note = f" (上次: {STATUS_NAMES[previous]})" if previous and previous != status else ""
+            parts.append(f"\n  - {key}{note}")
+        if len(keys) > SAMPLE_KEYS:
+            parts.append(f"\n  ... 还有 {len(keys) - SAMPLE_KEYS} 个项目")
+
+    parts.append(f"""
+
+🤖 AI分析数据:
+  关键指标: {{
+    'removed_count': {counts[REMOVED]},
+    'new_count': {counts[ADDED]},
+    'modified_count': {counts[MODIFIED]},
+    'unchanged_count': {counts[UNCHANGED]},
+    'changed_since_last_run': {diff.changed_count}
+  }}""")
+    return "".join(parts)
@@ -4,8 +4,16 @@ tools/excel_processor.py
 Excel文件处理工具模块
 """
 
+import datetime
+import json
 import os
+import random
+import shutil
 import sys
+import tempfile
+from collections.abc import Mapping
+from functools import partial
+from operator import itemgetter
 
 try:
     import openpyxl
@@ -14,6 +22,799 @@ try:
 except ImportError:
     EXCEL_AVAILABLE = False
 
+from tools.excel_cache import estimate_row_size, sheet_cache
+from tools.excel_projection import can_project, iter_projected_rows
+from tools.metrics import metrics
+from tools.progress import track_rows
+from tools.result_pages import (
+    MappedSequence, PagedResult, ZippedSequence, format_cursors, result_store
+)
+from tools.tool_result import ToolError, ToolResult, as_bool
+from tools.excel_sidecar import (
+    SIDECAR_ENABLED, SidecarRows, UnsupportedValue, create_writer, open_sidecar
+)
+
+# 对比文件时的内存预算（MB），估算超出预算时自动使用外存对比引擎
+EXCEL_MEMORY_BUDGET_MB = int(os.getenv("EXCEL_MEMORY_BUDGET_MB", "512"))
+# 列结构分析时最多读取的数据行数（采样和统计都只在这些行中进行）
+EXCEL_SCAN_ROWS = int(os.getenv("EXCEL_SCAN_ROWS", "1000"))
+SAMPLING_MODES = ("head", "reservoir", "stratified")
+# 对比报告中列出的样本数量（只在一侧存在的项目 / 有变更的项目）
+REPORT_SAMPLES = 5
+REPORT_MODIFIED_SAMPLES = 3
+# 估算对比结果内存占用时每个分区采样的行数
+SIZE_SAMPLE_ROWS = 16
+
+
+class SheetStream:
+    """
+    单次流式读取工作表（基于iter_rows(values_only=True)）
+
+    只读模式下的cell()随机访问每次都会重新扫描XML，整体耗时随行数平方增长；
+    这里顺序读取每一行一次，耗时与行数成线性关系。
+
+    完整读取过的工作表会放入进程内的sheet_cache，文件未修改时再次读取直接使用缓存，
+    不再打开工作簿；cache=False时只读取缓存、不写入（用于需要限制内存的场景）。
+    设置EXCEL_SIDECAR=1时，完整读取的工作表还会写入源文件旁边的列式旁路文件，
+    之后（包括其他进程）读取时内存映射旁路文件，不再解析XLSX。
+    指定columns（0-based列索引）时只解析这些列，其余列的值为None（表头完整读取），
+    这种部分读取的结果不写入缓存和旁路文件。
+
+    用法:
+        with SheetStream(file_path) as stream:
+            stream.headers      # 第一行原始值
+            for row in stream.rows():
+                ...             # 从第2行开始，每行为补齐到表头宽度的tuple
+    """
+
+    def __init__(self, file_path: str, sheet_name: str = None, cache: bool = True,
+                 columns=None):
+        self.file_path = file_path
+        self.sheet_name = sheet_name
+        self.cache = cache
+        self.columns = columns
+        self.workbook = None
+        self.sheet = None
+        self.title = None
+        self.headers = []
+        self.width = 0
+        self._rows = None
+        self._cache_key = None
+        self._cached_rows = None
+        self._sidecar = None
+
+    def __enter__(self):
+        self._cache_key = sheet_cache.make_key(self.file_path, self.sheet_name)
+        cached = sheet_cache.get(self._cache_key)
+        if cached is not None:
+            self.title, headers, self._cached_rows = cached
+            self.headers = list(headers)
+            self.width = len(self.headers)
+            return self
+
+        if SIDECAR_ENABLED:
+            self._sidecar = open_sidecar(self.file_path, self.sheet_name)
+            if self._sidecar is not None:
+                self.title = self._sidecar.title
+                self.headers = list(self._sidecar.headers)
+                self.width = len(self.headers)
+                self._cached_rows = SidecarRows(self._sidecar)
+                return self
+
+        self.workbook = load_workbook(self.file_path, read_only=True)
+        self.sheet = self.workbook[self.sheet_name] if self.sheet_name else self.workbook.active
+        self.title = self.sheet.title
+        if self.columns is not None and can_project(self.sheet):
+            self._rows = iter_projected_rows(self.sheet, self.columns)
+        else:
+            # 不支持投影读取时完整读取（结果相同，只是更慢）
+            self.columns = None
+            self._rows = self.sheet.iter_rows(values_only=True)
+        self.headers = list(next(self._rows, ()))
+        self.width = len(self.headers)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.workbook is not None:
+            self.workbook.close()
+            self.workbook = None
+        if self._sidecar is not None:
+            self._sidecar.close()
+            self._sidecar = None
+
+    @property
+    def sidecar(self):
+        """数据来自旁路文件时为打开的SidecarSheet（可以直接读取单元格值编号），否则为None"""
+        return self._sidecar
+
+    def header_names(self):
+        """表头名称，空表头使用Column_N"""
+        return [str(h) if h is not None else f"Column_{i}" for i, h in enumerate(self.headers, 1)]
+
+    def rows(self, limit: int = None):
+        """依次产出数据行（不含表头），limit限制读取的行数"""
+        label = f"读取 {os.path.basename(self.file_path)}"
+        if self._cached_rows is not None:
+            rows = self._cached_rows if limit is None else self._cached_rows[:limit]
+            yield from track_rows(rows, label)
+            return
+
+        width = self.width
+        # 边读边收集，读完整个工作表后写入缓存；超出缓存容量时放弃收集
+        partial = self.columns is not None
+        collected = [] if self.cache and not partial else None
+        size = estimate_row_size(self.headers)
+        # 只有完整读取时才生成旁路文件
+        writer = self._sidecar_writer() if limit is None and not partial else None
+        try:
+            for count, row in enumerate(track_rows(self._rows, label)):
+                if limit is not None and count >= limit:
+                    return
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+                if collected is not None:
+                    collected.append(row)
+                    size += estimate_row_size(row)
+                    if size > sheet_cache.max_bytes:
+                        collected = None
+                if writer is not None:
+                    try:
+                        writer.add_row(row)
+                    except UnsupportedValue:
+                        writer.abort()
+                        writer = None
+                yield row
+            if writer is not None:
+                try:
+                    writer.finish(self.title, self.headers)
+                except Exception as e:
+                    print(f"⚠️  旁路文件写入失败: {writer.path} ({e})", file=sys.stderr)
+                writer = None
+        finally:
+            if writer is not None:
+                writer.abort()
+        if collected is not None:
+            sheet_cache.put(self._cache_key, self.title, tuple(self.headers), collected, size)
+
+    def _sidecar_writer(self):
+        """创建旁路文件写入器（未启用或无法写入时返回None）"""
+        if not SIDECAR_ENABLED:
+            return None
+        try:
+            return create_writer(self.file_path, self.sheet_name)
+        except OSError as e:
+            print(f"⚠️  无法创建旁路文件: {self.file_path} ({e})", file=sys.stderr)
+            return None
+
+def value_type_name(value) -> str:
+    """单元格值的类型名称"""
+    if isinstance(value, bool):
+        return "布尔"
+    if isinstance(value, int):
+        return "整数"
+    if isinstance(value, float):
+        return "小数"
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return "日期"
+    if isinstance(value, str):
+        return "文本"
+    return "其他"
+
+class ColumnStats:
+    """单列的类型分布和基数统计（只统计扫描范围内的行）"""
+
+    def __init__(self):
+        self.rows = 0
+        self.non_empty = 0
+        self.types = {}
+        self.distinct = set()
+
+    def observe(self, value) -> None:
+        self.rows += 1
+        if value is None or value == "":
+            return
+        self.non_empty += 1
+        type_name = value_type_name(value)
+        self.types[type_name] = self.types.get(type_name, 0) + 1
+        self.distinct.add(value)
+
+    def sorted_types(self):
+        """按出现次数从多到少排列的 (类型名, 次数)"""
+        return sorted(self.types.items(), key=lambda item: -item[1])
+
+    def as_dict(self) -> dict:
+        return {
+            'types': dict(self.sorted_types()),
+            'non_empty': self.non_empty,
+            'rows': self.rows,
+            'distinct': len(self.distinct),
+        }
+
+    def summary(self) -> str:
+        types = "/".join(f"{name}{count}" for name, count in self.sorted_types()) or "无数据"
+        return f"类型: {types} | 非空: {self.non_empty}/{self.rows} | 不同值: {len(self.distinct)}"
+
+def sample_rows_from(rows, sample_rows: int, sampling: str, seed: int = 0):
+    """
+    从扫描窗口中选出样本行，返回 (样本行列表, 扫描的行数)
+
+    - head: 前sample_rows行
+    - reservoir: 蓄水池抽样，窗口内每行被选中的概率相同
+    - stratified: 把窗口等分为sample_rows段，每段随机取一行
+    """
+    rng = random.Random(seed)
+    if sampling == "stratified":
+        window = list(rows)
+        if len(window) <= sample_rows:
+            return window, len(window)
+        bounds = [len(window) * i // sample_rows for i in range(sample_rows + 1)]
+        return [window[rng.randrange(bounds[i], bounds[i + 1])] for i in range(sample_rows)], len(window)
+
+    sampled = []
+    scanned = 0
+    for index, row in enumerate(rows):
+        scanned += 1
+        if index < sample_rows:
+            sampled.append((index, row))
+        elif sampling == "reservoir":
+            slot = rng.randrange(index + 1)
+            if slot < sample_rows:
+                sampled[slot] = (index, row)
+    return [row for _, row in sorted(sampled, key=lambda item: item[0])], scanned
+
+def read_column_samples(file_path: str, sample_rows: int = 6, sampling: str = "head",
+                        scan_rows: int = EXCEL_SCAN_ROWS):
+    """
+    单次流式读取前scan_rows行，返回 (表头, 每列非空样本, 每列统计, 扫描行数)
+
+    读取量与文件大小无关；head模式下的样本为前sample_rows行的非空值
+    """
+    with SheetStream(file_path) as stream:
+        headers = stream.header_names()
+        stats = [ColumnStats() for _ in headers]
+
+        def observed_rows():
+            for row in stream.rows(limit=max(scan_rows, sample_rows)):
+                for col, column_stats in enumerate(stats):
+                    column_stats.observe(row[col] if col < len(row) else None)
+                yield row
+
+        sampled, scanned = sample_rows_from(observed_rows(), sample_rows, sampling)
+
+    samples = [[] for _ in headers]
+    for row in sampled:
+        for col, cell_value in enumerate(row[:len(headers)]):
+            if cell_value is not None:
+                samples[col].append(str(cell_value))
+    return headers, samples, stats, scanned
+
+def column_structure_data(file_path: str, headers, samples, stats, scanned: int):
+    """列结构的结构化数据，返回 (汇总字段, 明细字段)，明细中每列附带样本和统计"""
+    summary = {'file': file_path, 'column_count': len(headers), 'scanned_rows': scanned}
+    return (
+        {**summary, 'columns': [
+            {'index': i, 'name': header} for i, header in enumerate(headers, 1)
+        ]},
+        {**summary, 'columns': [
+            {'index': i, 'name': header, 'samples': column_samples, 'stats': column_stats.as_dict()}
+            for i, (header, column_samples, column_stats) in enumerate(zip(headers, samples, stats), 1)
+        ]},
+    )
+
+class PackedRows(Mapping):
+    """
+    紧凑的 key→行数据 存储
+
+    每行的单元格字符串用\\0拼接成一个字符串保存，一行只占一个对象，
+    不再为每个单元格单独分配str和list。对比时直接比较拼接后的字符串，
+    只有展示或定位变更列时才拆分为列表。
+    单元格本身含\\0（_x0000_转义还原后）的行拼接后无法无歧义地拆分，按单元格tuple保存。
+    """
+
+    __slots__ = ('_rows',)
+    SEP = '\0'
+
+    def __init__(self):
+        self._rows = {}
+
+    def add(self, key: str, row_data) -> None:
+        """加入一行（字符串列表），重复的key后加入的覆盖先加入的"""
+        packed = self.SEP.join(row_data)
+        if packed.count(self.SEP) >= len(row_data):
+            packed = tuple(row_data)
+        self._rows[key] = packed
+
+    def packed(self, key: str):
+        """
+        拼接后的行字符串，用于快速比较
+
+        单元格含\\0的行返回单元格tuple：与字符串永远不相等，两行都是tuple时按单元格比较
+        """
+        return self._rows[key]
+
+    def __getitem__(self, key):
+        packed = self._rows[key]
+        if isinstance(packed, str):
+            return packed.split(self.SEP)
+        return list(packed)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def keys(self):
+        return self._rows.keys()
+
+def build_keyed_rows(rows, key_col_idx: int) -> PackedRows:
+    """把原始行（单元格值tuple）转换为按关键列索引的字符串行，跳过关键列为空的行"""
+    data = PackedRows()
+    for row in rows:
+        row_data = [str(cell_value) if cell_value is not None else "" for cell_value in row]
+        # 使用关键列作为key
+        if key_col_idx < len(row_data) and row_data[key_col_idx]:
+            data.add(row_data[key_col_idx], row_data)
+    return data
+
+def read_keyed_rows(file_path: str, key_col_idx: int, sheet_name: str = None):
+    """读取表头和按关键列索引的行数据（单元格转换为字符串，空值为""）"""
+    with SheetStream(file_path, sheet_name) as stream:
+        headers = stream.header_names()
+        data = build_keyed_rows(stream.rows(), key_col_idx)
+    return headers, data
+
+class CompareResult:
+    """
+    两个文件按关键列对比的结果，供不同对比引擎共用
+
+    - removed/added/modified: 只在文件1中/只在文件2中/两边都有但有变更的key序列
+    - rows1/rows2: key → 整行数据（字符串列表）的映射
+    - changed_columns: key → 有变更的列索引（0-based）列表的映射
+    - column_change_counts: 每列发生变更的key数量
+    """
+
+    def __init__(self, headers1, headers2, total1, total2, removed, added, modified,
+                 common_count, rows1, rows2, changed_columns, column_change_counts):
+        self.headers1 = headers1
+        self.headers2 = headers2
+        self.total1 = total1
+        self.total2 = total2
+        self.removed = removed
+        self.added = added
+        self.modified = modified
+        self.common_count = common_count
+        self.rows1 = rows1
+        self.rows2 = rows2
+        self.changed_columns = changed_columns
+        self.column_change_counts = column_change_counts
+
+    def column_name(self, col_idx: int) -> str:
+        """列索引对应的列名（优先使用文件1的表头）"""
+        for headers in (self.headers1, self.headers2):
+            if col_idx < len(headers):
+                return headers[col_idx]
+        return f"Column_{col_idx + 1}"
+
+def changed_column_indices(row1, row2):
+    """对比两行数据，返回不相同的列索引（长度不同时缺失的列视为变更）"""
+    return [
+        col for col in range(max(len(row1), len(row2)))
+        if col >= len(row1) or col >= len(row2) or row1[col] != row2[col]
+    ]
+
+def diff_keyed_rows(headers1, data1, headers2, data2) -> CompareResult:
+    """逐行对比两个 key→行数据 映射（纯Python引擎），支持PackedRows和普通字典"""
+    keys1 = set(data1.keys())
+    keys2 = set(data2.keys())
+    row1 = data1.packed if isinstance(data1, PackedRows) else data1.__getitem__
+    row2 = data2.packed if isinstance(data2, PackedRows) else data2.__getitem__
+
+    # 只在文件1中存在（已移除的项目）
+    only_in_file1 = keys1 - keys2
+    # 只在文件2中存在（新增的项目）
+    only_in_file2 = keys2 - keys1
+    # 两个文件都存在（可能有变更）
+    common_keys = keys1 & keys2
+
+    # 检查共同项目的数据变更
+    modified = []
+    changed_columns = {}
+    column_change_counts = [0] * max(len(headers1), len(headers2))
+    for key in common_keys:
+        if row1(key) != row2(key):
+            modified.append(key)
+            changed = changed_column_indices(data1[key], data2[key])
+            changed_columns[key] = changed
+            for col in changed:
+                if col >= len(column_change_counts):
+                    column_change_counts.extend([0] * (col + 1 - len(column_change_counts)))
+                column_change_counts[col] += 1
+
+    return CompareResult(
+        headers1, headers2, len(data1), len(data2),
+        list(only_in_file1), list(only_in_file2), modified, len(common_keys),
+        data1, data2, changed_columns, column_change_counts
+    )
+
+def column_change_summary(diff: CompareResult) -> dict:
+    """列名 → 发生变更的key数量（只包含有变更的列）"""
+    return {
+        diff.column_name(col): count
+        for col, count in enumerate(diff.column_change_counts) if count
+    }
+
+def compare_result_data(file1: str, file2: str, diff: CompareResult):
+    """
+    对比结果的结构化数据，返回 (汇总字段, 明细字段)
+
+    明细中的样本数量与文本报告一致。
+    """
+    data = {
+        'file1': file1,
+        'file2': file2,
+        'headers1': list(diff.headers1),
+        'headers2': list(diff.headers2),
+        'metrics': {
+            'removed_count': len(diff.removed),
+            'new_count': len(diff.added),
+            'modified_count': len(diff.modified),
+            'unchanged_count': diff.common_count - len(diff.modified),
+            'common_count': diff.common_count,
+            'total_file1': diff.total1,
+            'total_file2': diff.total2,
+        },
+        'column_changes': column_change_summary(diff),
+    }
+    details = {
+        'removed': [{'key': key, 'row': diff.rows1[key]} for key in diff.removed[:REPORT_SAMPLES]],
+        'added': [{'key': key, 'row': diff.rows2[key]} for key in diff.added[:REPORT_SAMPLES]],
+        'modified': [
+            {
+                'key': key,
+                'row1': diff.rows1[key],
+                'row2': diff.rows2[key],
+                'changed_columns': [diff.column_name(col) for col in diff.changed_columns[key]],
+            }
+            for key in diff.modified[:REPORT_MODIFIED_SAMPLES]
+        ],
+    }
+    return data, details
+
+# 分页读取完整差异时各分区的名称
+COMPARE_SECTION_LABELS = {
+    'removed': "只在文件1中存在",
+    'added': "只在文件2中存在",
+    'modified': "数据有变更",
+}
+
+def estimate_compare_size(diff: CompareResult) -> int:
+    """
+    估算分页保留对比结果时占用的内存（字节）
+
+    内存引擎的结果引用两个文件的全部行数据，用差异行样本的平均行大小乘以总行数估算；
+    外存引擎的行数据和key序列都在磁盘上，不计入。
+    """
+    if getattr(diff, 'spilled_rows', None) is not None:
+        return 0
+    def row_size(rows, key):
+        # PackedRows中每行只是一个拼接后的字符串
+        if isinstance(rows, PackedRows):
+            packed = rows.packed(key)
+            return estimate_row_size((packed,) if isinstance(packed, str) else packed)
+        return estimate_row_size(rows[key])
+
+    samples = [row_size(diff.rows1, key) for key in diff.removed[:SIZE_SAMPLE_ROWS]]
+    samples += [row_size(diff.rows2, key) for key in diff.added[:SIZE_SAMPLE_ROWS]]
+    samples += [row_size(diff.rows1, key) for key in diff.modified[:SIZE_SAMPLE_ROWS]]
+    if not samples:
+        return 0
+    return int(sum(samples) / len(samples) * (diff.total1 + diff.total2))
+
+def compare_pages(diff: CompareResult) -> PagedResult:
+    """
+    对比结果的分页视图（removed/added/modified三个分区，每项为 key 与行数据）
+
+    行数据在读取某一页时才从行存储（外存引擎为磁盘上的行文件）中取出。
+    """
+    payloads = getattr(diff, 'spilled_rows', None) or {
+        'removed': MappedSequence(diff.removed, lambda key: diff.rows1[key]),
+        'added': MappedSequence(diff.added, lambda key: diff.rows2[key]),
+        'modified': MappedSequence(
+            diff.modified, lambda key: (diff.rows1[key], diff.rows2[key], diff.changed_columns[key])
+        ),
+    }
+    sections = {
+        name: ZippedSequence(getattr(diff, name), payloads[name]) for name in COMPARE_SECTION_LABELS
+    }
+
+    def row_item(pair):
+        return {'key': pair[0], 'row': pair[1]}
+
+    def modified_item(pair):
+        key, (row1, row2, changed) = pair
+        return {'key': key, 'row1': row1, 'row2': row2,
+                'changed_columns': [diff.column_name(col) for col in changed]}
+
+    def row_line(item):
+        return f"{item['key']}: {item['row']}"
+
+    def modified_line(item):
+        return (f"{item['key']}: 文件1 {item['row1']} → 文件2 {item['row2']} "
+                f"(变更列: {item['changed_columns']})")
+
+    return PagedResult(
+        'compare', sections,
+        item={'removed': row_item, 'added': row_item, 'modified': modified_item},
+        line={'removed': row_line, 'added': row_line, 'modified': modified_line},
+        owner=diff, size=estimate_compare_size(diff)
+    )
+
+def format_compare_report(file1: str, file2: str, diff: CompareResult) -> str:
+    """构建AI友好的对比结果文本"""
+    removed = diff.removed
+    added = diff.added
+    modified = diff.modified
+
+    parts = [f"""📊 Excel文件对比分析
+
+📁 文件1分析: {file1}
+表头: {diff.headers1}
+数据行数: {diff.total1}
+
+📁 文件2分析: {file2}
+表头: {diff.headers2}
+数据行数: {diff.total2}
+
+🔍 差异统计:
+• 总计文件1项目: {diff.total1}
+• 总计文件2项目: {diff.total2}
+• 只在文件1中存在: {len(removed)} (可能已移除)
+• 只在文件2中存在: {len(added)} (新发现)
+• 两文件共有项目: {diff.common_count}
+• 共有项目中有变更: {len(modified)}
+
+📝 详细差异:
+
+🚫 只在文件1中存在 (已移除项目):"""]
+
+    for item in removed[:REPORT_SAMPLES]:
+        parts.append(f"\n  - {item}: {diff.rows1[item]}")
+    if len(removed) > REPORT_SAMPLES:
+        parts.append(f"\n  ... 还有 {len(removed) - REPORT_SAMPLES} 个项目")
+
+    parts.append("\n\n🆕 只在文件2中存在 (新发现项目):")
+    for item in added[:REPORT_SAMPLES]:
+        parts.append(f"\n  - {item}: {diff.rows2[item]}")
+    if len(added) > REPORT_SAMPLES:
+        parts.append(f"\n  ... 还有 {len(added) - REPORT_SAMPLES} 个项目")
+
+    parts.append("\n\n🔄 数据有变更的项目:")
+    for item in modified[:REPORT_MODIFIED_SAMPLES]:
+        changed = [diff.column_name(col) for col in diff.changed_columns[item]]
+        parts.append(f"\n  - {item}:")
+        parts.append(f"\n    文件1: {diff.rows1[item]}")
+        parts.append(f"\n    文件2: {diff.rows2[item]}")
+        parts.append(f"\n    变更列: {changed}")
+    if len(modified) > REPORT_MODIFIED_SAMPLES:
+        parts.append(f"\n  ... 还有 {len(modified) - REPORT_MODIFIED_SAMPLES} 个变更项目")
+
+    column_changes = column_change_summary(diff)
+    if column_changes:
+        parts.append(f"\n\n📈 各列变更数量: {column_changes}")
+
+    # 添加AI分析用的结构化数据
+    parts.append(f"""
+
+🤖 AI分析数据:
+  关键指标: {{
+    'removed_count': {len(removed)},
+    'new_count': {len(added)},
+    'modified_count': {len(modified)},
+    'unchanged_count': {diff.common_count - len(modified)},
+    'total_file1': {diff.total1},
+    'total_file2': {diff.total2}
+  }}""")
+
+    return "".join(parts)
+
+def batch_report_result(report: dict) -> ToolResult:
+    """批量报告：compact只返回汇总，verbose附带每项结果；文本格式为缩进的JSON"""
+    summary = {name: value for name, value in report.items() if name != 'results'}
+    return ToolResult(
+        summary, text=lambda: json.dumps(report, ensure_ascii=False, indent=2),
+        details={'results': report['results']}
+    )
+
+def columnar_available() -> bool:
+    """列式对比引擎是否可用（需要NumPy）"""
+    try:
+        from tools.excel_columnar import COLUMNAR_AVAILABLE
+    except ImportError:
+        return False
+    return COLUMNAR_AVAILABLE
+
+def compile_mapping(mapping: dict):
+    """把映射规则转换为 (源列0-based索引, 目标列1-based索引) 列表，跳过无效映射"""
+    pairs = []
+    for src_col_str, target_col_str in mapping.items():
+        try:
+            src_col = int(src_col_str) - 1
+            target_col = int(target_col_str)
+        except (TypeError, ValueError):
+            continue
+        if src_col >= 0 and target_col >= 1:
+            pairs.append((src_col, target_col))
+    return pairs
+
+# 源行中不存在的列（行比映射的源列短），复制时跳过
+MISSING = object()
+
+class ColumnProjection:
+    """
+    编译后的列映射：一次取出源行中所有映射列的值，按目标列生成要写入的数据
+
+    源行只在投影中访问被映射的列，未映射的列不做任何处理。
+    """
+
+    def __init__(self, pairs):
+        self.src_cols = [src_col for src_col, _ in pairs]
+        self.target_cols = [target_col for _, target_col in pairs]
+        self.width = max(self.src_cols) + 1 if self.src_cols else 0
+        if len(self.src_cols) > 1:
+            self._getter = itemgetter(*self.src_cols)
+        elif self.src_cols:
+            only = self.src_cols[0]
+            self._getter = lambda row: (row[only],)
+        else:
+            self._getter = lambda row: ()
+
+    def project(self, row) -> tuple:
+        """取出映射列的值（行长度不足时缺失的列为MISSING）"""
+        if len(row) < self.width:
+            row = tuple(row) + (MISSING,) * (self.width - len(row))
+        return self._getter(row)
+
+    def target_items(self, values):
+        """投影值对应的 (目标列, 值) 序列，空值写为""，跳过缺失的列"""
+        return [
+            (target_col, value if value is not None else "")
+            for target_col, value in zip(self.target_cols, values)
+            if value is not MISSING
+        ]
+
+def copy_rows_in_place(source_file: str, target_file: str, mapping: dict,
+                       source_sheet_name: str = None, target_sheet_name: str = None):
+    """
+    编辑模式复制：打开目标文件，清空数据行后按行追加映射后的数据并保存，保留其他工作表和格式
+
+    工作表名称为空时使用活动工作表。返回 (源数据行数, 复制行数, 目标表头)
+    """
+    projection = ColumnProjection(compile_mapping(mapping))
+
+    # 只读取源文件中被映射的列（跳过表头）
+    with SheetStream(source_file, source_sheet_name, columns=projection.src_cols) as source:
+        source_data = [projection.project(row) for row in source.rows()]
+
+    # 打开目标文件进行编辑
+    target_wb = load_workbook(target_file)
+    target_sheet = target_wb[target_sheet_name] if target_sheet_name else target_wb.active
+
+    # 保存目标文件的表头
+    target_headers = []
+    for col in range(1, target_sheet.max_column + 1):
+        header = target_sheet.cell(row=1, column=col).value
+        target_headers.append(header)
+
+    # 清空目标文件的数据行（保留表头）
+    if target_sheet.max_row > 1:
+        target_sheet.delete_rows(2, target_sheet.max_row - 1)
+
+    # 根据映射关系逐行追加数据（从第2行开始，第1行是表头；只创建被映射的单元格）
+    copied_rows = 0
+    for values in track_rows(source_data, f"写入 {os.path.basename(target_file)}"):
+        target_sheet.append(dict(projection.target_items(values)))
+        copied_rows += 1
+
+    # 保存目标文件
+    target_wb.save(target_file)
+    target_wb.close()
+    sheet_cache.invalidate(target_file)
+
+    return len(source_data), copied_rows, target_headers
+
+def copy_rows_streaming(source_file: str, target_file: str, mapping: dict,
+                        source_sheet_name: str = None, target_sheet_name: str = None):
+    """
+    流式复制：目标表头写入新的write_only工作簿，边读源文件边追加映射后的行，
+    最后原子替换目标文件。内存占用与文件大小无关。
+
+    注意：新文件只包含目标工作表（默认活动工作表）的表头和复制的数据，不保留其他工作表和单元格格式。
+    返回 (源数据行数, 复制行数, 目标表头)
+    """
+    projection = ColumnProjection(compile_mapping(mapping))
+
+    with SheetStream(target_file, target_sheet_name) as target:
+        target_headers = list(target.headers)
+        sheet_title = target.title
+    width = max([len(target_headers)] + projection.target_cols)
+
+    out_wb = Workbook(write_only=True)
+    out_sheet = out_wb.create_sheet(title=sheet_title)
+    out_sheet.append(target_headers)
+
+    source_rows = 0
+    copied_rows = 0
+    with SheetStream(source_file, source_sheet_name, columns=projection.src_cols) as source:
+        for row in source.rows():
+            source_rows += 1
+            target_row = [None] * width
+            for target_col, value in projection.target_items(projection.project(row)):
+                target_row[target_col - 1] = value
+            out_sheet.append(target_row)
+            copied_rows += 1
+
+    # 先写入同目录下的临时文件，再原子替换目标文件
+    target_dir = os.path.dirname(os.path.abspath(target_file))
+    fd, tmp_path = tempfile.mkstemp(suffix='.xlsx', dir=target_dir)
+    os.close(fd)
+    try:
+        out_wb.save(tmp_path)
+        # mkstemp创建的文件权限为0600，替换前沿用目标文件原有的权限
+        shutil.copymode(target_file, tmp_path)
+        os.replace(tmp_path, target_file)
+        sheet_cache.invalidate(target_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return source_rows, copied_rows, target_headers
+
+COMPARE_ENGINES = ("auto", "python", "columnar", "external")
+
+def compare_sheets(file1: str, file2: str, key_col_idx: int, engine: str = "auto",
+                   memory_budget_mb: int = EXCEL_MEMORY_BUDGET_MB,
+                   sheet1: str = None, sheet2: str = None) -> CompareResult:
+    """
+    按指定引擎对比两个工作表（工作表名称为空时使用活动工作表）
+
+    不支持的引擎名称抛出ValueError
+    """
+    if engine not in COMPARE_ENGINES:
+        raise ValueError(f"不支持的对比引擎: {engine}（可选 {'、'.join(COMPARE_ENGINES)}）")
+
+    if engine == "auto":
+        from tools.excel_external import estimate_memory
+        estimated = estimate_memory(file1) + estimate_memory(file2)
+        if estimated > int(memory_budget_mb) * 1024 * 1024:
+            engine = "external"
+        else:
+            engine = "columnar" if columnar_available() else "python"
+
+    if engine == "external":
+        from tools.excel_external import compare_external
+        return compare_external(file1, file2, key_col_idx, memory_budget_mb, sheet1, sheet2)
+    if engine == "columnar":
+        from tools.excel_columnar import compare_columnar
+        return compare_columnar(file1, file2, key_col_idx, sheet1, sheet2)
+
+    # 读取两个文件数据，使用字典，key为关键列的值，value为整行数据
+    headers1, data1 = read_keyed_rows(file1, key_col_idx, sheet1)
+    headers2, data2 = read_keyed_rows(file2, key_col_idx, sheet2)
+    return diff_keyed_rows(headers1, data1, headers2, data2)
+
+def copy_sheet_data(source_file: str, target_file: str, mapping: dict, streaming: bool = False,
+                    source_sheet: str = None, target_sheet: str = None):
+    """按映射复制工作表数据，返回 (源数据行数, 复制行数, 目标表头)"""
+    copy_rows = copy_rows_streaming if streaming else copy_rows_in_place
+    return copy_rows(source_file, target_file, mapping, source_sheet, target_sheet)
+
 def register_excel_tools(server):
     """
     注册Excel处理相关的MCP工具到服务器
@@ -21,14 +822,22 @@ def register_excel_tools(server):
     参数:
     - server: MCP服务器实例
     """
+    metrics.register_collector('excel_sheet_cache', sheet_cache.stats)
+
     @server.tool()
-    def smart_column_mapping(source_file: str, target_file: str):
+    def smart_column_mapping(source_file: str, target_file: str, sample_rows: int = 6,
+                             sampling: str = "head", scan_rows: int = EXCEL_SCAN_ROWS):
         """
         对比两个Excel文件的列结构，为AI映射分析提供清晰的数据展示
         
         参数:
         - source_file: 源文件路径（要复制数据的文件）
         - target_file: 目标文件路径（要接收数据的文件）
+        - sample_rows: 每列展示的样本行数（默认6）
+        - sampling: 采样方式，head（默认，前几行）、reservoir（扫描范围内蓄水池随机抽样）
+          或 stratified（扫描范围内分段抽样）
+        - scan_rows: 最多读取的数据行数（默认EXCEL_SCAN_ROWS=1000），样本和列统计都来自这些行，
+          耗时与文件大小无关
         
         AI使用指导:
         请根据列名和数据样本分析列的对应关系，然后输出JSON格式的映射规则：
@@ -43,99 +852,94 @@ def register_excel_tools(server):
         如果某列无法找到合适映射，请在JSON中省略该列
         """
         if not EXCEL_AVAILABLE:
-            return "❌ Excel处理功能不可用"
+            return ToolError("❌ Excel处理功能不可用")
         
         try:
             # 检查文件存在性
             if not os.path.exists(source_file):
-                return f"❌ 源文件不存在: {source_file}"
+                return ToolError(f"❌ 源文件不存在: {source_file}")
             if not os.path.exists(target_file):
-                return f"❌ 目标文件不存在: {target_file}"
-            
-            # 分析源文件结构
-            source_wb = load_workbook(source_file, read_only=True)
-            source_sheet = source_wb.active
-            source_headers = []
-            source_samples = []
-            
-            for col in range(1, source_sheet.max_column + 1):
-                # 获取列名
-                header = source_sheet.cell(row=1, column=col).value
-                header = str(header) if header is not None else f"Column_{col}"
-                source_headers.append(header)
-                
-                # 获取该列的6个数据样本
-                samples = []
-                for row in range(2, min(8, source_sheet.max_row + 1)):
-                    cell_value = source_sheet.cell(row=row, column=col).value
-                    if cell_value is not None:
-                        samples.append(str(cell_value))
-                source_samples.append(samples)
+                return ToolError(f"❌ 目标文件不存在: {target_file}")
             
-            source_wb.close()
+            if sampling not in SAMPLING_MODES:
+                return ToolError(f"❌ 不支持的采样方式: {sampling}（可选 {'、'.join(SAMPLING_MODES)}）")
+            sample_rows = int(sample_rows)
+            scan_rows = int(scan_rows)
             
-            # 分析目标文件结构
-            target_wb = load_workbook(target_file, read_only=True)
-            target_sheet = target_wb.active
-            target_headers = []
-            target_samples = []
-            
-            for col in range(1, target_sheet.max_column + 1):
-                # 获取列名
-                header = target_sheet.cell(row=1, column=col).value
-                header = str(header) if header is not None else f"Column_{col}"
-                target_headers.append(header)
-                
-                # 获取该列的6个数据样本
-                samples = []
-                for row in range(2, min(8, target_sheet.max_row + 1)):
-                    cell_value = target_sheet.cell(row=row, column=col).value
-                    if cell_value is not None:
-                        samples.append(str(cell_value))
-                target_samples.append(samples)
-            
-            target_wb.close()
+            # 分析源文件和目标文件结构
+            source_headers, source_samples, source_stats, source_scanned = read_column_samples(
+                source_file, sample_rows, sampling, scan_rows
+            )
+            target_headers, target_samples, target_stats, target_scanned = read_column_samples(
+                target_file, sample_rows, sampling, scan_rows
+            )
             
             # 构建AI友好的对比结果
-            result = f"""📊 文件列结构对比分析
+            def render():
+                parts = [f"""📊 文件列结构对比分析
 
         🗂️ 源文件: {source_file}
         列数: {len(source_headers)}
         ┌─────┬──────────────────┬────────────────────────────────────┐
         │ 列号 │ 列名              │ 数据样本                            │
-        ├─────┼──────────────────┼────────────────────────────────────┤"""
+        ├─────┼──────────────────┼────────────────────────────────────┤"""]
 
-            for i, (header, samples) in enumerate(zip(source_headers, source_samples), 1):
-                samples_str = " | ".join(samples[:5]) if samples else "无数据"
-                result += f"\n│ {i:2d}  │ {header:<16} │ {samples_str:<34} │"
+                for i, (header, samples) in enumerate(zip(source_headers, source_samples), 1):
+                    samples_str = " | ".join(samples[:5]) if samples else "无数据"
+                    parts.append(f"\n│ {i:2d}  │ {header:<16} │ {samples_str:<34} │")
 
-            result += f"""
+                parts.append(f"""
         └─────┴──────────────────┴────────────────────────────────────┘
 
+        📈 列统计（扫描前{source_scanned}行）:""")
+                for i, (header, stats) in enumerate(zip(source_headers, source_stats), 1):
+                    parts.append(f"\n│ {i:2d}  │ {header:<16} │ {stats.summary()} │")
+
+                parts.append(f"""
+
         🗂️ 目标文件: {target_file}  
         列数: {len(target_headers)}
         ┌─────┬──────────────────┬────────────────────────────────────┐
         │ 列号 │ 列名              │ 数据样本                            │
-        ├─────┼──────────────────┼────────────────────────────────────┤"""
+        ├─────┼──────────────────┼────────────────────────────────────┤""")
 
-            for i, (header, samples) in enumerate(zip(target_headers, target_samples), 1):
-                samples_str = " | ".join(samples[:5]) if samples else "无数据"
-                result += f"\n│ {i:2d}  │ {header:<16} │ {samples_str:<34} │"
+                for i, (header, samples) in enumerate(zip(target_headers, target_samples), 1):
+                    samples_str = " | ".join(samples[:5]) if samples else "无数据"
+                    parts.append(f"\n│ {i:2d}  │ {header:<16} │ {samples_str:<34} │")
 
-            result += f"""
+                parts.append(f"""
         └─────┴──────────────────┴────────────────────────────────────┘
 
+        📈 列统计（扫描前{target_scanned}行）:""")
+                for i, (header, stats) in enumerate(zip(target_headers, target_stats), 1):
+                    parts.append(f"\n│ {i:2d}  │ {header:<16} │ {stats.summary()} │")
+
+                parts.append(f"""
+
         🤖 AI映射指导:
         请分析上述列结构，输出映射JSON，格式如: {{"1": "3", "2": "1", "3": "2"}}
-        说明: 将源文件的列映射到目标文件的对应列"""
+        说明: 将源文件的列映射到目标文件的对应列""")
 
-            return result
+                return "".join(parts)
+
+            source = column_structure_data(
+                source_file, source_headers, source_samples, source_stats, source_scanned
+            )
+            target = column_structure_data(
+                target_file, target_headers, target_samples, target_stats, target_scanned
+            )
+            return ToolResult(
+                {'source': source[0], 'target': target[0], 'sampling': sampling},
+                text=render,
+                details={'source': source[1], 'target': target[1]}
+            )
             
         except Exception as e:
-            return f"❌ 智能映射分析时出错: {str(e)}"
+            return ToolError(f"❌ 智能映射分析时出错: {str(e)}")
 
     @server.tool()
-    def copy_data_by_mapping(source_file: str, target_file: str, mapping_rules: str):
+    def copy_data_by_mapping(source_file: str, target_file: str, mapping_rules: str,
+                             streaming: bool = False):
         """
         根据映射关系复制数据
         
@@ -144,97 +948,60 @@ def register_excel_tools(server):
         - target_file: 目标文件路径  
         - mapping_rules: 映射规则JSON字符串，格式如：
           '{"1": "3", "2": "1", "3": "2"}'  # 源列1→目标列3, 源列2→目标列1, 源列3→目标列2
+        - streaming: 是否使用流式写入模式（默认否）。适合大文件，内存占用恒定；
+          生成的目标文件只保留活动工作表的表头和复制的数据，不保留其他工作表和格式
         """
         if not EXCEL_AVAILABLE:
-            return "❌ Excel处理功能不可用"
+            return ToolError("❌ Excel处理功能不可用")
         
         try:
             # 检查文件存在性
             if not os.path.exists(source_file):
-                return f"❌ 源文件不存在: {source_file}"
+                return ToolError(f"❌ 源文件不存在: {source_file}")
             if not os.path.exists(target_file):
-                return f"❌ 目标文件不存在: {target_file}"
+                return ToolError(f"❌ 目标文件不存在: {target_file}")
             
             # 解析映射规则
             import json
             try:
                 mapping = json.loads(mapping_rules)
             except json.JSONDecodeError:
-                return f"❌ 映射规则格式错误，应为JSON格式: {mapping_rules}"
-            
-            # 读取源文件数据
-            source_wb = load_workbook(source_file, read_only=True)
-            source_sheet = source_wb.active
-            
-            # 获取源文件的所有数据（跳过表头）
-            source_data = []
-            for row in range(2, source_sheet.max_row + 1):
-                row_data = []
-                for col in range(1, source_sheet.max_column + 1):
-                    cell_value = source_sheet.cell(row=row, column=col).value
-                    row_data.append(cell_value if cell_value is not None else "")
-                source_data.append(row_data)
+                return ToolError(f"❌ 映射规则格式错误，应为JSON格式: {mapping_rules}")
             
-            source_wb.close()
-            
-            # 打开目标文件进行编辑
-            target_wb = load_workbook(target_file)
-            target_sheet = target_wb.active
-            
-            # 保存目标文件的表头
-            target_headers = []
-            for col in range(1, target_sheet.max_column + 1):
-                header = target_sheet.cell(row=1, column=col).value
-                target_headers.append(header)
-            
-            # 清空目标文件的数据行（保留表头）
-            if target_sheet.max_row > 1:
-                target_sheet.delete_rows(2, target_sheet.max_row - 1)
-            
-            # 根据映射关系复制数据
-            copied_rows = 0
-            for src_row_idx, src_row_data in enumerate(source_data):
-                target_row_idx = src_row_idx + 2  # 从第2行开始写入（第1行是表头）
-                
-                # 根据映射规则复制每一列
-                for src_col_str, target_col_str in mapping.items():
-                    try:
-                        src_col = int(src_col_str) - 1  # 转换为0-based索引
-                        target_col = int(target_col_str)  # 1-based索引
-                        
-                        # 检查索引有效性
-                        if 0 <= src_col < len(src_row_data):
-                            src_value = src_row_data[src_col]
-                            target_sheet.cell(row=target_row_idx, column=target_col, value=src_value)
-                        
-                    except (ValueError, IndexError) as e:
-                        continue  # 跳过无效的映射
-                
-                copied_rows += 1
-            
-            # 保存目标文件
-            target_wb.save(target_file)
-            target_wb.close()
+            source_count, copied_rows, target_headers = copy_sheet_data(
+                source_file, target_file, mapping, as_bool(streaming)
+            )
             
             # 构建映射描述
             mapping_desc = []
             for src_col, target_col in mapping.items():
                 mapping_desc.append(f"源列{src_col}→目标列{target_col}")
             
-            result = f"""✅ 数据复制完成
-源文件: {source_file} ({len(source_data)}行数据)
+            return ToolResult(
+                {
+                    'source_file': source_file,
+                    'target_file': target_file,
+                    'source_rows': source_count,
+                    'copied_rows': copied_rows,
+                    'mapping': mapping,
+                    'target_headers': list(target_headers),
+                    'streaming': as_bool(streaming),
+                },
+                text=lambda: f"""✅ 数据复制完成{'（流式写入）' if as_bool(streaming) else ''}
+源文件: {source_file} ({source_count}行数据)
 目标文件: {target_file}
 复制映射: {', '.join(mapping_desc)}
 成功复制: {copied_rows}行数据
 目标文件表头: {target_headers}"""
-            
-            return result
+            )
             
         except Exception as e:
-            return f"❌ 复制数据时出错: {str(e)}"
-        
+            return ToolError(f"❌ 复制数据时出错: {str(e)}")
+
     @server.tool()
-    def compare_excel_files(file1: str, file2: str, key_column: str = "1"):
+    def compare_excel_files(file1: str, file2: str, key_column: str = "1", engine: str = "auto",
+                            memory_budget_mb: int = EXCEL_MEMORY_BUDGET_MB, manifest_file: str = "",
+                            page_size: int = 0):
         """
         对比两个Excel文件的差异，用于AI分析
         
@@ -242,142 +1009,132 @@ def register_excel_tools(server):
         - file1: 第一个文件路径（通常是人工维护的清单）
         - file2: 第二个文件路径（通常是系统扫描结果）
         - key_column: 用于匹配的关键列（默认第1列，1-based索引）
+        - engine: 对比引擎，auto（默认，按内存预算和NumPy可用性选择）、python、columnar（列式向量化）
+          或 external（外存分区对比，适合超出内存的大文件）
+        - memory_budget_mb: 内存预算（MB），auto模式下估算超出预算时使用external，
+          external模式下决定分区数量
+        - manifest_file: 增量对比清单路径（默认不使用）。指定后按行哈希对比，并与上次运行保存的
+          清单比较，只报告自上次运行以来内容发生变化的key；传入"auto"时使用EXCEL_MANIFEST_DIR下的默认路径
+        - page_size: 大于0时在服务器上保留完整对比结果，报告中附带各类差异的分页游标，
+          之后用fetch_result_page按页获取全部差异（每页page_size项），无需重新对比
         """
         if not EXCEL_AVAILABLE:
-            return "❌ Excel处理功能不可用"
+            return ToolError("❌ Excel处理功能不可用")
         
         try:
             # 检查文件存在性
             if not os.path.exists(file1):
-                return f"❌ 文件1不存在: {file1}"
+                return ToolError(f"❌ 文件1不存在: {file1}")
             if not os.path.exists(file2):
-                return f"❌ 文件2不存在: {file2}"
-            
-            # 读取文件1数据
-            wb1 = load_workbook(file1, read_only=True)
-            sheet1 = wb1.active
-            
-            headers1 = []
-            for col in range(1, sheet1.max_column + 1):
-                header = sheet1.cell(row=1, column=col).value
-                headers1.append(str(header) if header is not None else f"Column_{col}")
+                return ToolError(f"❌ 文件2不存在: {file2}")
             
-            data1 = {}  # 使用字典，key为关键列的值，value为整行数据
             key_col_idx = int(key_column) - 1  # 转换为0-based索引
+            paginate = int(page_size) > 0
             
-            for row in range(2, sheet1.max_row + 1):
-                row_data = []
-                for col in range(1, sheet1.max_column + 1):
-                    cell_value = sheet1.cell(row=row, column=col).value
-                    row_data.append(str(cell_value) if cell_value is not None else "")
-                
-                # 使用关键列作为key
-                if key_col_idx < len(row_data) and row_data[key_col_idx]:
-                    key_value = row_data[key_col_idx]
-                    data1[key_value] = row_data
-            
-            wb1.close()
-            
-            # 读取文件2数据
-            wb2 = load_workbook(file2, read_only=True)
-            sheet2 = wb2.active
-            
-            headers2 = []
-            for col in range(1, sheet2.max_column + 1):
-                header = sheet2.cell(row=1, column=col).value
-                headers2.append(str(header) if header is not None else f"Column_{col}")
+            if manifest_file:
+                from tools.excel_incremental import (
+                    STATUS_NAMES, compare_incremental, default_manifest_path,
+                    format_incremental_report, incremental_pages, incremental_result_data
+                )
+                if manifest_file == "auto":
+                    manifest_file = default_manifest_path(file1, file2, key_col_idx)
+                diff = compare_incremental(file1, file2, key_col_idx, manifest_file)
+                data, details = incremental_result_data(file1, file2, manifest_file, diff)
+                report = partial(format_incremental_report, file1, file2, manifest_file, diff)
+                pages = incremental_pages(diff) if paginate else None
+                labels = STATUS_NAMES
+            else:
+                try:
+                    diff = compare_sheets(file1, file2, key_col_idx, engine, memory_budget_mb)
+                except ValueError as e:
+                    return ToolError(f"❌ {e}")
+                data, details = compare_result_data(file1, file2, diff)
+                report = partial(format_compare_report, file1, file2, diff)
+                pages = compare_pages(diff) if paginate else None
+                labels = COMPARE_SECTION_LABELS
             
-            data2 = {}
-            for row in range(2, sheet2.max_row + 1):
-                row_data = []
-                for col in range(1, sheet2.max_column + 1):
-                    cell_value = sheet2.cell(row=row, column=col).value
-                    row_data.append(str(cell_value) if cell_value is not None else "")
-                
-                # 使用关键列作为key
-                if key_col_idx < len(row_data) and row_data[key_col_idx]:
-                    key_value = row_data[key_col_idx]
-                    data2[key_value] = row_data
+            if pages is None:
+                return ToolResult(data, text=report, details=details)
             
-            wb2.close()
+            # 保留完整结果供分页读取
+            handle, cursors = result_store.publish(pages, page_size)
+            data['pages'] = {'handle': handle, 'cursors': cursors}
+            return ToolResult(
+                data, text=lambda: report() + format_cursors(cursors, labels, pages.size),
+                details=details
+            )
             
-            # 分析差异
-            keys1 = set(data1.keys())
-            keys2 = set(data2.keys())
-            
-            # 只在文件1中存在（已移除的项目）
-            only_in_file1 = keys1 - keys2
-            # 只在文件2中存在（新增的项目）
-            only_in_file2 = keys2 - keys1
-            # 两个文件都存在（可能有变更）
-            common_keys = keys1 & keys2
-            
-            # 检查共同项目的数据变更
-            modified_items = []
-            for key in common_keys:
-                if data1[key] != data2[key]:
-                    modified_items.append({
-                        'key': key,
-                        'file1_data': data1[key],
-                        'file2_data': data2[key]
-                    })
-            
-            # 构建AI友好的对比结果
-            result = f"""📊 Excel文件对比分析
-
-📁 文件1分析: {file1}
-表头: {headers1}
-数据行数: {len(data1)}
-
-📁 文件2分析: {file2}
-表头: {headers2}
-数据行数: {len(data2)}
-
-🔍 差异统计:
-• 总计文件1项目: {len(data1)}
-• 总计文件2项目: {len(data2)}
-• 只在文件1中存在: {len(only_in_file1)} (可能已移除)
-• 只在文件2中存在: {len(only_in_file2)} (新发现)
-• 两文件共有项目: {len(common_keys)}
-• 共有项目中有变更: {len(modified_items)}
+        except Exception as e:
+            return ToolError(f"❌ 对比文件时出错: {str(e)}")
 
-📝 详细差异:
+    @server.tool()
+    def batch_compare_excel_files(items: str, key_column: str = "1", engine: str = "auto",
+                                  memory_budget_mb: int = EXCEL_MEMORY_BUDGET_MB,
+                                  max_workers: int = 0):
+        """
+        批量对比多组Excel文件/工作表，多进程并行执行，返回JSON格式的汇总报告
+        
+        参数:
+        - items: 任务列表JSON，每项格式如：
+          {"file1": "manual/*.xlsx", "file2": "scan/", "sheets": "*", "key_column": "2"}
+          file1可使用通配符，此时file2为目录，按文件名配对；
+          sheets为空时对比活动工作表，"*"对比两边同名的所有工作表，
+          也可以是工作表名称列表或 [工作表1, 工作表2] 对的列表
+        - key_column: 默认关键列（1-based），可在每项中单独指定
+        - engine: 对比引擎，同compare_excel_files
+        - memory_budget_mb: 总内存预算（MB），在各工作进程间平分
+        - max_workers: 进程数（默认EXCEL_BATCH_WORKERS或CPU核数）
+        """
+        if not EXCEL_AVAILABLE:
+            return ToolError("❌ Excel处理功能不可用")
+        
+        try:
+            from tools.excel_batch import batch_compare
+            report = batch_compare(items, key_column, engine, memory_budget_mb, max_workers)
+            return batch_report_result(report)
+        except (ValueError, json.JSONDecodeError) as e:
+            return ToolError(f"❌ 批量任务格式错误: {str(e)}")
+        except Exception as e:
+            return ToolError(f"❌ 批量对比时出错: {str(e)}")
 
-🚫 只在文件1中存在 (已移除项目):"""
-            
-            for item in list(only_in_file1)[:5]:  # 最多显示5个
-                result += f"\n  - {item}: {data1[item]}"
-            if len(only_in_file1) > 5:
-                result += f"\n  ... 还有 {len(only_in_file1) - 5} 个项目"
-            
-            result += f"\n\n🆕 只在文件2中存在 (新发现项目):"
-            for item in list(only_in_file2)[:5]:  # 最多显示5个
-                result += f"\n  - {item}: {data2[item]}"
-            if len(only_in_file2) > 5:
-                result += f"\n  ... 还有 {len(only_in_file2) - 5} 个项目"
-            
-            result += f"\n\n🔄 数据有变更的项目:"
-            for item in modified_items[:3]:  # 最多显示3个
-                result += f"\n  - {item['key']}:"
-                result += f"\n    文件1: {item['file1_data']}"
-                result += f"\n    文件2: {item['file2_data']}"
-            if len(modified_items) > 3:
-                result += f"\n  ... 还有 {len(modified_items) - 3} 个变更项目"
-            
-            # 添加AI分析用的结构化数据
-            result += f"\n\n🤖 AI分析数据:"
-            result += f"\n  关键指标: {{"
-            result += f"\n    'removed_count': {len(only_in_file1)},"
-            result += f"\n    'new_count': {len(only_in_file2)},"
-            result += f"\n    'modified_count': {len(modified_items)},"
-            result += f"\n    'unchanged_count': {len(common_keys) - len(modified_items)},"
-            result += f"\n    'total_file1': {len(data1)},"
-            result += f"\n    'total_file2': {len(data2)}"
-            result += f"\n  }}"
-            
-            return result
-            
+    @server.tool()
+    def batch_copy_data_by_mapping(items: str, streaming: bool = False, max_workers: int = 0):
+        """
+        批量按映射复制多组Excel文件/工作表，多进程并行执行，返回JSON格式的汇总报告
+        
+        参数:
+        - items: 任务列表JSON，每项格式如：
+          {"source_file": "in/*.xlsx", "target_file": "out/", "mapping": {"1": "3"}, "sheets": ["Data"]}
+          source_file可使用通配符，此时target_file为目录，按文件名配对；sheets规则同batch_compare_excel_files
+        - streaming: 默认是否使用流式写入模式，可在每项中单独指定
+        - max_workers: 进程数（默认EXCEL_BATCH_WORKERS或CPU核数）
+        
+        写入同一个目标文件的任务在同一进程中顺序执行
+        """
+        if not EXCEL_AVAILABLE:
+            return ToolError("❌ Excel处理功能不可用")
+        
+        try:
+            from tools.excel_batch import batch_copy
+            report = batch_copy(items, as_bool(streaming), max_workers)
+            return batch_report_result(report)
+        except (ValueError, json.JSONDecodeError) as e:
+            return ToolError(f"❌ 批量任务格式错误: {str(e)}")
         except Exception as e:
-            return f"❌ 对比文件时出错: {str(e)}"
+            return ToolError(f"❌ 批量复制时出错: {str(e)}")
+
+    @server.tool()
+    def excel_cache_stats():
+        """
+        查看已解析工作表缓存的统计信息（缓存的工作表数、内存占用、命中/未命中次数）
+        """
+        stats = sheet_cache.stats()
+        return ToolResult(stats, text=lambda: f"""📦 Excel工作表缓存统计
+缓存工作表: {stats['sheets']}
+内存占用: {stats['bytes'] / 1024 / 1024:.1f}MB / {stats['max_bytes'] / 1024 / 1024:.0f}MB
+命中: {stats['hits']}
+未命中: {stats['misses']}
+淘汰: {stats['evictions']}
+写入失效: {stats['invalidations']}""")
 
     print("✅ Excel处理工具已注册", file=sys.stderr)
\ No newline at end of file
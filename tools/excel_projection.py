@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+tools/excel_projection.py
+按列投影读取只读工作表（只解析需要的列，其余单元格只读取坐标）
+"""
+
+import sys
+from itertools import islice
+
+try:
+    from openpyxl.utils.cell import column_index_from_string
+    from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+    from openpyxl.worksheet._reader import WorkSheetParser
+    PROJECTION_AVAILABLE = True
+except ImportError:
+    # 依赖openpyxl内部模块，版本不兼容时退回到完整读取
+    PROJECTION_AVAILABLE = False
+
+DIGITS = "0123456789"
+
+
+if PROJECTION_AVAILABLE:
+    class ProjectedParser(WorkSheetParser):
+        """
+        只解析指定列单元格的工作表解析器
+
+        openpyxl逐个单元格做类型转换、共享字符串查找和日期转换，宽表上只需要少数几列时
+        大部分时间都花在不需要的单元格上。这里第一行（表头）完整解析，之后每行只对
+        指定列调用parse_cell，其余单元格只根据坐标推进列计数。
+        """
+
+        def __init__(self, src, shared_strings, columns, **kwargs):
+            super().__init__(src, shared_strings, **kwargs)
+            self.columns = columns
+            self.rows_parsed = 0
+
+        def parse_row(self, row):
+            coordinate = row.get('r')
+            self.row_counter = int(float(coordinate)) if coordinate else self.row_counter + 1
+            self.col_counter = 0
+            parse_all = self.rows_parsed == 0
+            self.rows_parsed += 1
+
+            values = {}
+            last_column = 0
+            for element in row:
+                coordinate = element.get('r')
+                if coordinate:
+                    column = column_index_from_string(coordinate.rstrip(DIGITS))
+                else:
+                    column = self.col_counter + 1
+                if parse_all or column in self.columns:
+                    values[column] = self.parse_cell(element)['value']
+                self.col_counter = column
+                last_column = column
+            return self.row_counter, (values, last_column)
+
+
+def can_project(worksheet) -> bool:
+    """工作表是否支持投影读取（只读模式打开的工作表）"""
+    return PROJECTION_AVAILABLE and isinstance(worksheet, ReadOnlyWorksheet)
+
+
+def iter_projected_rows(worksheet, columns):
+    """
+    按行产出工作表的值tuple，只有columns（0-based列索引）中的列有值，其余为None
+
+    缺失行、行宽和工作表尺寸的处理与 iter_rows(values_only=True) 一致。
+    投影读取依赖openpyxl的内部接口，接口不兼容（AttributeError/TypeError）时
+    从已产出的行之后改用 iter_rows 继续读取，并在本进程内停用投影读取。
+    """
+    global PROJECTION_AVAILABLE
+    produced = 0
+    try:
+        for row in _iter_projected(worksheet, {col + 1 for col in columns}):
+            yield row
+            produced += 1
+    except (AttributeError, TypeError) as e:
+        PROJECTION_AVAILABLE = False
+        print(f"按列投影读取与当前openpyxl版本不兼容，改为完整读取: {e!r}", file=sys.stderr)
+        yield from islice(worksheet.iter_rows(values_only=True), produced, None)
+
+
+def _iter_projected(worksheet, wanted):
+    """iter_projected_rows的实现，wanted为1-based列号集合"""
+    workbook = worksheet.parent
+    max_row = worksheet.max_row
+    max_col = worksheet.max_column
+    empty_row = (None,) * max_col if max_col is not None else ()
+
+    counter = 1
+    idx = 1
+    with worksheet._get_source() as src:
+        parser = ProjectedParser(
+            src, worksheet._shared_strings, wanted,
+            data_only=workbook.data_only, epoch=workbook.epoch,
+            date_formats=workbook._date_formats, timedelta_formats=workbook._timedelta_formats
+        )
+        for idx, (values, last_column) in parser.parse():
+            if max_row is not None and idx > max_row:
+                break
+
+            # 缺失的行
+            for _ in range(counter, idx):
+                counter += 1
+                yield empty_row
+
+            if counter <= idx:
+                counter += 1
+                width = max_col or last_column
+                if not width:
+                    yield ()
+                    continue
+                row = [None] * width
+                for column, value in values.items():
+                    if column <= width:
+                        row[column - 1] = value
+                yield tuple(row)
+
+    if max_row is not None and max_row < idx:
+        for _ in range(counter, max_row + 1):
+            yield empty_row
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+tools/excel_sidecar.py
+工作表列式旁路文件（内存映射的类型化数组 + 值池），避免重复解析XLSX
+
+文件布局（小端，各段按8字节对齐）:
+    魔数(8) | 元数据长度(u32) | 元数据JSON
+    | 值池偏移(u64 × (值数+1)) | 值类型(u8 × 值数) | 值池内容(UTF-8)
+    | 行偏移(u64 × (行数+1)) | 单元格值编号(u32 × 单元格数)
+
+值编号0固定为None；相同类型和内容的值只存一份。元数据中记录源文件的SHA-256，
+源文件内容变化后旁路文件自动失效。
+"""
+
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from urllib.parse import quote
+
+MAGIC = b"XLCOL01\0"
+SUFFIX = ".xlcol"
+# 单元格编号缓冲区达到该数量时写入临时文件
+FLUSH_CELLS = 64 * 1024
+
+# 是否启用旁路文件（默认关闭，开启后会在源文件旁边写入文件）
+SIDECAR_ENABLED = os.getenv("EXCEL_SIDECAR", "0").strip().lower() in ('1', 'true', 'yes', 'on')
+
+# 值类型标记
+T_NONE, T_STR, T_INT, T_FLOAT, T_BOOL, T_DATETIME, T_DATE, T_TIME, T_TIMEDELTA = range(9)
+
+
+class UnsupportedValue(Exception):
+    """单元格值类型无法写入旁路文件"""
+
+
+def encode_value(value):
+    """把单元格值编码为 (类型标记, 文本)"""
+    if isinstance(value, str):
+        return T_STR, value
+    if isinstance(value, bool):
+        return T_BOOL, "1" if value else "0"
+    if isinstance(value, int):
+        return T_INT, str(value)
+    if isinstance(value, float):
+        return T_FLOAT, repr(value)
+    if isinstance(value, datetime.datetime):
+        return T_DATETIME, value.isoformat()
+    if isinstance(value, datetime.date):
+        return T_DATE, value.isoformat()
+    if isinstance(value, datetime.time):
+        return T_TIME, value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return T_TIMEDELTA, repr(value.total_seconds())
+    raise UnsupportedValue(type(value).__name__)
+
+
+def decode_value(tag: int, text: str):
+    """encode_value的逆操作"""
+    if tag == T_STR:
+        return text
+    if tag == T_INT:
+        return int(text)
+    if tag == T_FLOAT:
+        return float(text)
+    if tag == T_BOOL:
+        return text == "1"
+    if tag == T_DATETIME:
+        return datetime.datetime.fromisoformat(text)
+    if tag == T_DATE:
+        return datetime.date.fromisoformat(text)
+    if tag == T_TIME:
+        return datetime.time.fromisoformat(text)
+    if tag == T_TIMEDELTA:
+        return datetime.timedelta(seconds=float(text))
+    return None
+
+
+def sidecar_path(file_path: str, sheet_name: str = None) -> str:
+    """旁路文件路径：源文件旁边的 <文件名>[.<工作表名>].xlcol"""
+    if sheet_name:
+        return f"{file_path}.{quote(sheet_name, safe='')}{SUFFIX}"
+    return f"{file_path}{SUFFIX}"
+
+
+def file_hash(file_path: str) -> str:
+    """源文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class SidecarWriter:
+    """
+    边读取工作表边生成旁路文件
+
+    单元格编号分批写入临时文件，内存中只保留去重后的值池和行偏移。
+    """
+
+    def __init__(self, file_path: str, sheet_name: str = None):
+        self.file_path = file_path
+        self.path = sidecar_path(file_path, sheet_name)
+        self.source_hash = file_hash(file_path)
+        self._ids = {}
+        self._pool = [(T_NONE, "")]
+        self._row_offsets = array('Q', [0])
+        self._cells = array('I')
+        self._cell_count = 0
+        self._spill = tempfile.TemporaryFile()
+
+    def _id(self, value) -> int:
+        if value is None:
+            return 0
+        key = encode_value(value)
+        value_id = self._ids.get(key)
+        if value_id is None:
+            value_id = self._ids[key] = len(self._pool)
+            self._pool.append(key)
+        return value_id
+
+    def add_row(self, row) -> None:
+        self._cells.extend(self._id(value) for value in row)
+        self._cell_count += len(row)
+        self._row_offsets.append(self._cell_count)
+        if len(self._cells) >= FLUSH_CELLS:
+            self._cells.tofile(self._spill)
+            self._cells = array('I')
+
+    def finish(self, title: str, headers) -> None:
+        """写入旁路文件（先写临时文件再原子替换）"""
+        header_ids = [self._id(value) for value in headers]
+        self._cells.tofile(self._spill)
+
+        texts = [text.encode('utf-8') for _, text in self._pool]
+        pool_offsets = array('Q', [0])
+        for data in texts:
+            pool_offsets.append(pool_offsets[-1] + len(data))
+        tags = bytes(tag for tag, _ in self._pool)
+
+        meta = {
+            'source_hash': self.source_hash,
+            'title': title,
+            'headers': header_ids,
+            'values': len(self._pool),
+            'rows': len(self._row_offsets) - 1,
+            'cells': self._cell_count,
+        }
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+
+        target_dir = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(suffix=SUFFIX, dir=target_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(MAGIC)
+                out.write(struct.pack('<I', len(meta_bytes)))
+                out.write(meta_bytes)
+                for section in (pool_offsets.tobytes(), tags, b''.join(texts),
+                                self._row_offsets.tobytes()):
+                    out.write(b'\0' * (_align(out.tell()) - out.tell()))
+                    out.write(section)
+                out.write(b'\0' * (_align(out.tell()) - out.tell()))
+                self._spill.seek(0)
+                for chunk in iter(lambda: self._spill.read(1024 * 1024), b''):
+                    out.write(chunk)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            self.abort()
+
+    def abort(self) -> None:
+        """放弃生成（例如只读取了部分行）"""
+        self._spill.close()
+
+
+class SidecarRows:
+    """旁路文件中的数据行序列，支持迭代和切片，每行为tuple"""
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+
+    def __len__(self):
+        return self.sheet.rows
+
+    def __iter__(self):
+        pool = self.sheet.values()
+        cells = self.sheet.cells
+        offsets = self.sheet.row_offsets
+        for row in range(self.sheet.rows):
+            yield tuple(map(pool.__getitem__, cells[offsets[row]:offsets[row + 1]]))
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("只支持切片访问")
+        value = self.sheet.value
+        cells = self.sheet.cells
+        offsets = self.sheet.row_offsets
+        return [
+            tuple(value(value_id) for value_id in cells[offsets[row]:offsets[row + 1]])
+            for row in range(*index.indices(self.sheet.rows))
+        ]
+
+
+class SidecarSheet:
+    """内存映射方式打开的旁路文件"""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"不是有效的旁路文件: {path}")
+
+        meta_len, = struct.unpack_from('<I', self._map, len(MAGIC))
+        offset = len(MAGIC) + 4
+        self.meta = json.loads(self._map[offset:offset + meta_len].decode('utf-8'))
+        offset += meta_len
+        self.title = self.meta['title']
+        self.rows = self.meta['rows']
+
+        view = memoryview(self._map)
+        values = self.meta['values']
+
+        def section(size):
+            nonlocal offset
+            offset = _align(offset)
+            data = view[offset:offset + size]
+            offset += size
+            return data
+
+        self.pool_offsets = section(8 * (values + 1)).cast('Q')
+        self.tags = section(values)
+        self.pool_bytes = section(self.pool_offsets[values] if values else 0)
+        self.row_offsets = section(8 * (self.rows + 1)).cast('Q')
+        self.cells = section(4 * self.meta['cells']).cast('I')
+        self._views = [view, self.pool_offsets, self.tags, self.pool_bytes,
+                       self.row_offsets, self.cells]
+        self._values = None
+        self.headers = [self.value(value_id) for value_id in self.meta['headers']]
+
+    def value(self, value_id: int):
+        """按编号解码单个值"""
+        if self._values is not None:
+            return self._values[value_id]
+        start, end = self.pool_offsets[value_id], self.pool_offsets[value_id + 1]
+        return decode_value(self.tags[value_id], str(self.pool_bytes[start:end], 'utf-8'))
+
+    def values(self):
+        """解码整个值池（完整读取时使用）"""
+        if self._values is None:
+            self._values = [self.value(value_id) for value_id in range(self.meta['values'])]
+        return self._values
+
+    def close(self) -> None:
+        for view in reversed(getattr(self, '_views', [])):
+            view.release()
+        self._views = []
+        try:
+            self._map.close()
+        except BufferError:
+            # 仍有行数据切片引用映射内存，交给垃圾回收关闭
+            pass
+        self._file.close()
+
+
+def open_sidecar(file_path: str, sheet_name: str = None):
+    """打开与源文件内容一致的旁路文件，不存在或已失效时返回None"""
+    path = sidecar_path(file_path, sheet_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        sheet = SidecarSheet(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"旁路文件无法读取，忽略: {path} ({e})", file=sys.stderr)
+        return None
+    if sheet.meta.get('source_hash') != file_hash(file_path):
+        sheet.close()
+        return None
+    return sheet
+
+
+def create_writer(file_path: str, sheet_name: str = None):
+    """创建旁路文件写入器，源文件所在目录不可写时返回None"""
+    if not os.access(os.path.dirname(os.path.abspath(file_path)), os.W_OK):
+        return None
+    return SidecarWriter(file_path, sheet_name)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+tools/github_cache.py
+GitHub API响应缓存模块（基于ETag的条件请求，以及并发相同请求的合并）
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from tools.progress import RequestCancelled
+
+
+class ResponseCache:
+    """
+    GitHub响应缓存，key为 (repo, path, ref)
+
+    - 在ttl秒内的条目直接返回，不发请求
+    - 超过ttl的条目携带ETag发起条件请求，304时继续使用缓存数据（计为重新验证），
+      返回200时计为未命中
+    - 条目数超过max_entries或估算内存超过max_bytes时按LRU淘汰
+    - 可选持久化到磁盘，服务器重启后继续使用；累计save_every次写入或距上次保存超过
+      save_interval秒时在写入线程中保存，退出时由调用方再保存一次
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 60.0, persist_path: str = None,
+                 max_bytes: int = 64 * 1024 * 1024, save_every: int = 32, save_interval: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        if persist_path:
+            self.load()
+
+    @staticmethod
+    def make_key(repo: str, path: str, ref: str = "") -> str:
+        """生成缓存key（字符串形式便于持久化）"""
+        return f"{repo}\x00{path}\x00{ref or ''}"
+
+    @staticmethod
+    def estimate_size(data: Any) -> int:
+        """按JSON编码长度估算条目占用的字节数"""
+        return len(json.dumps(data, ensure_ascii=False))
+
+    def lookup(self, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        查找缓存条目
+
+        返回 (是否新鲜, 条目)。新鲜条目计为命中；过期条目先计为未命中，
+        由调用方用ETag重新验证，304时通过revalidate改计为重新验证。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            if time.time() - entry['time'] < self.ttl:
+                self.hits += 1
+                return True, entry
+            self.misses += 1
+            return False, entry
+
+    def revalidate(self, key: str) -> Optional[Dict[str, Any]]:
+        """收到304后刷新条目时间并返回条目"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['time'] = time.time()
+                self.misses -= 1
+                self.revalidated += 1
+                self._unsaved += 1
+        self._maybe_save()
+        return entry
+
+    def store(self, key: str, etag: Optional[str], data: Any, size: int = None):
+        """写入缓存条目（size为响应体字节数，未提供时按JSON估算），必要时按LRU淘汰"""
+        if size is None:
+            size = self.estimate_size(data)
+        if size > self.max_bytes:
+            print(f"GitHub响应过大，不缓存: {key!r} ({size} 字节)", file=sys.stderr)
+            with self._lock:
+                self._remove(key)
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {'etag': etag, 'data': data, 'time': time.time(), 'size': size}
+            self._total_bytes += size
+            self._evict()
+            self._unsaved += 1
+        self._maybe_save()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry['size']
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._total_bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry['size']
+            self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存计数器"""
+        with self._lock:
+            total = self.hits + self.misses + self.revalidated
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'evictions': self.evictions,
+                'unsaved': self._unsaved,
+                'hit_rate': round((self.hits + self.revalidated) / total, 4) if total else 0.0
+            }
+
+    def load(self):
+        """从磁盘加载缓存"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            with self._lock:
+                for key, entry in saved.get('entries', []):
+                    entry.setdefault('size', self.estimate_size(entry.get('data')))
+                    self._remove(key)
+                    self._entries[key] = entry
+                    self._total_bytes += entry['size']
+                self._evict()
+            print(f"加载GitHub缓存: {len(self._entries)} 个条目", file=sys.stderr)
+        except Exception as e:
+            print(f"读取GitHub缓存文件时出错: {e}", file=sys.stderr)
+
+    def _maybe_save(self):
+        """未保存的写入达到save_every次或距上次保存超过save_interval秒时保存"""
+        if not self.persist_path:
+            return
+        with self._lock:
+            due = self._unsaved >= self.save_every or (
+                self._unsaved and time.monotonic() - self._last_save >= self.save_interval)
+        if due:
+            self.save(wait=False)
+
+    def save(self, wait: bool = True):
+        """将缓存原子地写入磁盘（wait=False时若其他线程正在保存则跳过）"""
+        if not self.persist_path:
+            return
+        if not self._save_lock.acquire(blocking=wait):
+            return
+        unsaved = 0
+        try:
+            with self._lock:
+                snapshot = list(self._entries.items())
+                unsaved = self._unsaved
+                self._unsaved = 0
+                self._last_save = time.monotonic()
+            tmp_path = f"{self.persist_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'entries': snapshot}, f)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            with self._lock:
+                self._unsaved += unsaved
+            print(f"保存GitHub缓存文件时出错: {e}", file=sys.stderr)
+        finally:
+            self._save_lock.release()
+
+
+class _Call:
+    """正在进行中的一次调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    合并相同的并发调用（single-flight）
+
+    同一key的调用在进行中时，后来的调用方等待并共享第一次调用的结果或异常，
+    不再重复发送上游请求。基于线程实现，同步调用和通过线程池执行的异步调用都适用。
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """
+        执行fn，若相同key的调用正在进行则等待其结果
+
+        第一次调用抛出的任何异常（包括KeyboardInterrupt等BaseException）都会在等待方重新抛出。
+        第一次调用所属的请求被取消（RequestCancelled）时，等待方不受影响，重新发起调用。
+        """
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                return self._run(key, call, fn)
+            call.event.wait()
+            if isinstance(call.error, RequestCancelled):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def _join(self, key):
+        """登记调用，返回 (调用, 是否由当前调用方执行)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+        return call, leader
+
+    def _run(self, key, call: _Call, fn):
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self) -> Dict[str, int]:
+        """返回调用统计，shared即节省的上游调用次数"""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.executed,
+                'shared': self.shared
+            }
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+tools/local_mirror.py
+本地仓库镜像模块（bare clone + 增量fetch，替代GitHub代码搜索API）
+"""
+
+import base64
+import fnmatch
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from tools.csv_lookup import CHUNK_SIZE
+from tools.metrics import metrics
+
+GLOB_CHARS = '*?['
+
+
+class LocalRepoMirror:
+    """
+    在本地维护仓库的bare clone，从本地磁盘回答文件搜索、目录列表和内容读取
+
+    接口与GitHubClient保持一致（search_files、list_directory、
+    get_file_content、stream_file_content），可以直接替换使用。
+    """
+
+    def __init__(self, cache_dir: str, remote_template: str = "https://github.com/{repo}.git",
+                 token: str = None, refresh_interval: float = 300.0):
+        self.cache_dir = cache_dir
+        self.remote_template = remote_template
+        self.token = token
+        self.refresh_interval = refresh_interval
+        self._last_fetch = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _repo_dir(self, repo: str) -> str:
+        return os.path.join(self.cache_dir, repo.replace('/', '__') + '.git')
+
+    def _repo_lock(self, repo: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(repo, threading.Lock())
+
+    def _auth_env(self) -> Optional[Dict[str, str]]:
+        """
+        通过环境变量中的临时配置传递token（git 2.31+的GIT_CONFIG_COUNT）
+
+        不写入仓库配置，也不出现在命令行参数中（ps可以看到其他进程的命令行）。
+        """
+        if not self.token:
+            return None
+        credential = base64.b64encode(f"x-access-token:{self.token}".encode()).decode()
+        return dict(
+            os.environ,
+            GIT_CONFIG_COUNT='1',
+            GIT_CONFIG_KEY_0='http.extraHeader',
+            GIT_CONFIG_VALUE_0=f'Authorization: Basic {credential}',
+            GIT_TERMINAL_PROMPT='0'
+        )
+
+    def _git(self, args: List[str], cwd: str = None, env: Dict[str, str] = None) -> str:
+        """执行git命令并返回标准输出"""
+        result = subprocess.run(
+            ['git'] + args, cwd=cwd, env=env, capture_output=True, text=True, encoding='utf-8'
+        )
+        if result.returncode != 0:
+            raise Exception(f"git命令失败: git {args[0]} - {result.stderr.strip()}")
+        return result.stdout
+
+    def sync(self, repo: str, force: bool = False) -> str:
+        """确保镜像存在，并在超过刷新间隔后增量fetch，返回镜像目录"""
+        repo_dir = self._repo_dir(repo)
+        with self._repo_lock(repo):
+            if not os.path.exists(repo_dir):
+                remote = self.remote_template.format(repo=repo)
+                print(f"克隆仓库镜像: {repo}", file=sys.stderr)
+                self._git(['clone', '--bare', '--quiet', remote, repo_dir], env=self._auth_env())
+                metrics.count('github_mirror_syncs', operation='clone')
+                self._last_fetch[repo] = time.time()
+            elif force or time.time() - self._last_fetch.get(repo, 0) >= self.refresh_interval:
+                self._git(['fetch', '--quiet', '--prune', 'origin', '+refs/heads/*:refs/heads/*'],
+                          cwd=repo_dir, env=self._auth_env())
+                metrics.count('github_mirror_syncs', operation='fetch')
+                self._last_fetch[repo] = time.time()
+        return repo_dir
+
+    def _ls_tree(self, repo: str, ref: str, recursive: bool = False, path: str = "") -> List[Dict]:
+        """
+        解析git ls-tree输出为与GitHub API相同结构的条目
+
+        使用-z输出：路径不做引号转义（否则非ASCII路径会被输出为"\\346\\225..."），条目以NUL分隔。
+        """
+        repo_dir = self.sync(repo)
+        args = ['ls-tree', '-z', '--long'] + (['-r'] if recursive else []) + [ref]
+        if path:
+            args += ['--', f'{path}/']
+        output = self._git(args, cwd=repo_dir)
+        entries = []
+        for line in output.split('\0'):
+            if not line:
+                continue
+            meta, path = line.split('\t', 1)
+            _, obj_type, sha, size = meta.split()
+            entries.append({
+                'name': path.rsplit('/', 1)[-1],
+                'path': path,
+                'sha': sha,
+                'size': int(size) if size != '-' else 0,
+                'type': {'blob': 'file', 'tree': 'dir', 'commit': 'submodule'}.get(obj_type, obj_type)
+            })
+        return entries
+
+    def search_files(self, repo: str, filename: str, ref: str = "HEAD") -> List[Dict]:
+        """
+        按文件名搜索仓库中的文件（只返回blob条目，不包括目录和子模块）
+
+        filename包含通配符时按glob匹配文件名或路径，否则按文件名子串匹配（不区分大小写）。
+        """
+        if any(ch in filename for ch in GLOB_CHARS):
+            def matches(entry):
+                return fnmatch.fnmatch(entry['name'], filename) or fnmatch.fnmatch(entry['path'], filename)
+        else:
+            needle = filename.lower()
+
+            def matches(entry):
+                return needle in entry['name'].lower()
+
+        return [entry for entry in self._ls_tree(repo, ref, recursive=True)
+                if entry['type'] == 'file' and matches(entry)]
+
+    def list_directory(self, repo: str, path: str = "", ref: str = "HEAD") -> List[Dict]:
+        """列出仓库目录内容"""
+        return self._ls_tree(repo, ref, path=path.strip('/'))
+
+    def stream_file_content(self, repo: str, path: str, ref: str = "HEAD",
+                            sha: str = None, size: int = None,
+                            chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """从本地镜像按块读取文件内容"""
+        repo_dir = self.sync(repo)
+        process = subprocess.Popen(
+            ['git', 'cat-file', 'blob', sha or f'{ref}:{path}'],
+            cwd=repo_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        return self._iter_process(process, chunk_size, path)
+
+    @staticmethod
+    def _iter_process(process, chunk_size: int, path: str) -> Iterator[bytes]:
+        """逐块读取子进程输出，迭代结束或提前停止时结束子进程"""
+        try:
+            while True:
+                chunk = process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            if process.wait() != 0:
+                raise Exception(f"获取文件失败: {path} - {process.stderr.read().decode().strip()}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.stderr.close()
+            process.wait()
+
+    def get_file_content(self, repo: str, path: str, ref: str = "HEAD") -> Dict:
+        """获取文件内容，返回与contents API相同结构的字典"""
+        data = b''.join(self.stream_file_content(repo, path, ref))
+        sha = self._git(['rev-parse', f'{ref}:{path}'], cwd=self._repo_dir(repo)).strip()
+        return {
+            'name': path.rsplit('/', 1)[-1],
+            'path': path,
+            'sha': sha,
+            'size': len(data),
+            'encoding': 'base64',
+            'content': base64.b64encode(data).decode('ascii')
+        }
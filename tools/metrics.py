@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+tools/metrics.py
+服务器运行指标：按工具统计调用次数、延迟分位数、错误数和收发字节数，
+上游调用计数，以及各缓存的统计；支持导出Prometheus文本格式（文件或HTTP端口）
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+# 计算延迟分位数使用的最近调用数（每个工具）
+METRICS_WINDOW = int(os.getenv("MCP_METRICS_WINDOW", "1024"))
+# Prometheus直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+PERCENTILES = (50, 95, 99)
+# 调用结果状态
+CALL_STATUSES = ("ok", "error", "cancelled")
+METRIC_PREFIX = "mcp"
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """已排序数据的分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class ToolMetrics:
+    """
+    单个工具的调用指标
+
+    - 直方图桶和总数覆盖服务器启动以来的全部调用（用于Prometheus）
+    - 分位数按最近window次调用精确计算
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.calls = 0
+        self.status = dict.fromkeys(CALL_STATUSES, 0)
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float, status: str, bytes_in: int, bytes_out: int) -> None:
+        self.calls += 1
+        self.status[status] = self.status.get(status, 0) + 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.recent.append(seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        latency = {f"p{pct}": round(percentile(recent, pct), 4) for pct in PERCENTILES}
+        latency['avg'] = round(self.seconds / self.calls, 4) if self.calls else 0.0
+        latency['max'] = round(self.max_seconds, 4)
+        return {
+            'calls': self.calls,
+            'errors': self.status['error'],
+            'cancelled': self.status['cancelled'],
+            'latency': latency,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+
+
+class MetricsRegistry:
+    """
+    进程内的指标注册表
+
+    - observe_call: 记录一次工具调用
+    - count: 带标签的计数器（例如上游GitHub请求按端点和状态码计数）
+    - register_collector: 注册返回统计dict的函数（例如缓存的stats），读取指标时调用
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self.started = time.time()
+        self._tools: Dict[str, ToolMetrics] = {}
+        self._counters: Dict[tuple, int] = {}
+        self._collectors: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def observe_call(self, tool: str, seconds: float, status: str = "ok",
+                     bytes_in: int = 0, bytes_out: int = 0) -> None:
+        with self._lock:
+            metrics = self._tools.get(tool)
+            if metrics is None:
+                metrics = self._tools[tool] = ToolMetrics(self.window)
+            metrics.observe(seconds, status, bytes_in, bytes_out)
+
+    def count(self, name: str, amount: int = 1, **labels) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_collector(self, name: str, collector: Callable[[], Optional[Dict[str, Any]]]) -> None:
+        self._collectors[name] = collector
+
+    def _collect(self) -> Dict[str, Dict[str, Any]]:
+        collected = {}
+        for name, collector in list(self._collectors.items()):
+            try:
+                stats = collector()
+            except Exception as e:
+                print(f"读取指标 {name} 时出错: {e}", file=sys.stderr)
+                continue
+            if stats is not None:
+                collected[name] = stats
+        return collected
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前全部指标"""
+        with self._lock:
+            tools = {name: metrics.as_dict() for name, metrics in sorted(self._tools.items())}
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                label = ",".join(f"{k}={v}" for k, v in labels)
+                counters.setdefault(name, {})[label or "total"] = value
+        return {
+            'uptime': round(time.time() - self.started, 1),
+            'tools': tools,
+            'counters': counters,
+            'collectors': self._collect(),
+        }
+
+    def prometheus_text(self) -> str:
+        """Prometheus文本格式（exposition format 0.0.4）"""
+        with self._lock:
+            tools = [
+                (name, metrics.calls, dict(metrics.status), metrics.bytes_in, metrics.bytes_out,
+                 list(metrics.buckets), metrics.seconds, sorted(metrics.recent))
+                for name, metrics in sorted(self._tools.items())
+            ]
+            counters = sorted(self._counters.items())
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_uptime_seconds Seconds since the server started",
+            f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge",
+            f"{METRIC_PREFIX}_uptime_seconds {time.time() - self.started:.3f}",
+        ]
+
+        name = f"{METRIC_PREFIX}_tool_calls_total"
+        lines += [f"# HELP {name} Tool calls by result status", f"# TYPE {name} counter"]
+        for tool, _, status, *_ in tools:
+            for state in CALL_STATUSES:
+                lines.append(f"{name}{_labels(tool=tool, status=state)} {status.get(state, 0)}")
+
+        for field, index, help_text in (("received", 3, "Request bytes received"),
+                                        ("sent", 4, "Response bytes sent")):
+            name = f"{METRIC_PREFIX}_tool_bytes_{field}_total"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for entry in tools:
+                lines.append(f"{name}{_labels(tool=entry[0])} {entry[index]}")
+
+        name = f"{METRIC_PREFIX}_tool_duration_seconds"
+        lines += [f"# HELP {name} Tool call latency", f"# TYPE {name} histogram"]
+        for tool, count, _, _, _, buckets, seconds, _ in tools:
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS + (None,), buckets):
+                cumulative += bucket
+                le = "+Inf" if bound is None else repr(bound)
+                lines.append(f"{name}_bucket{_labels(tool=tool, le=le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(tool=tool)} {seconds:.6f}")
+            lines.append(f"{name}_count{_labels(tool=tool)} {count}")
+
+        name = f"{METRIC_PREFIX}_tool_duration_recent_seconds"
+        lines += [f"# HELP {name} Tool call latency quantiles over the last {self.window} calls",
+                  f"# TYPE {name} gauge"]
+        for tool, *_, recent in tools:
+            for pct in PERCENTILES:
+                lines.append(f"{name}{_labels(tool=tool, quantile=pct / 100)} {percentile(recent, pct):.6f}")
+
+        typed = set()
+        for (counter, labels), value in counters:
+            name = f"{METRIC_PREFIX}_{_metric_name(counter)}_total"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(**dict(labels))} {value}")
+
+        # 采集函数返回的数值统一作为gauge导出
+        for collector, stats in self._collect().items():
+            for field, value in sorted(stats.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{METRIC_PREFIX}_{_metric_name(collector)}_{_metric_name(field)}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(value: str) -> str:
+    """把任意字符串转换为合法的Prometheus指标名片段"""
+    return "".join(c if c.isalnum() or c == '_' else '_' for c in str(value)).lower()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def write_prometheus_file(registry: MetricsRegistry, path: str) -> None:
+    """写出Prometheus文本文件（先写临时文件再替换，读取方不会看到写了一半的文件）"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.prometheus_text())
+    os.replace(temp_path, path)
+
+
+def start_file_export(registry: MetricsRegistry, path: str, interval: float = 15.0) -> threading.Thread:
+    """后台线程每隔interval秒写出一次指标文件，进程退出时再写一次"""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_prometheus_file(registry, path)
+            except OSError as e:
+                print(f"写出指标文件失败: {e}", file=sys.stderr)
+
+    def final():
+        try:
+            write_prometheus_file(registry, path)
+        except OSError:
+            pass
+
+    atexit.register(final)
+    thread = threading.Thread(target=loop, name="mcp-metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_http_export(registry: MetricsRegistry, port: int, host: str = "127.0.0.1"):
+    """在后台线程中启动HTTP服务，GET /metrics 返回Prometheus文本"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # stdout是MCP协议通道，默认的访问日志写stderr也没有必要
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, name="mcp-metrics-http", daemon=True)
+    thread.start()
+    return httpd
+
+
+def start_exporters(registry: MetricsRegistry) -> None:
+    """
+    按环境变量启动指标导出
+
+    - MCP_METRICS_FILE: Prometheus文本文件路径（可配合node_exporter的textfile采集）
+    - MCP_METRICS_INTERVAL: 写文件的间隔秒数，默认15
+    - MCP_METRICS_PORT / MCP_METRICS_HOST: HTTP导出端口和监听地址（默认127.0.0.1）
+    """
+    path = os.getenv("MCP_METRICS_FILE")
+    if path:
+        start_file_export(registry, path, float(os.getenv("MCP_METRICS_INTERVAL", "15")))
+        print(f"指标文件导出: {path}", file=sys.stderr)
+    port = os.getenv("MCP_METRICS_PORT")
+    if port:
+        host = os.getenv("MCP_METRICS_HOST", "127.0.0.1")
+        try:
+            start_http_export(registry, int(port), host)
+            print(f"指标HTTP导出: http://{host}:{port}/metrics", file=sys.stderr)
+        except OSError as e:
+            print(f"指标HTTP导出启动失败: {e}", file=sys.stderr)
+
+
+# 全局指标注册表（服务器、GitHub客户端和本地镜像共用）
+metrics = MetricsRegistry()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+tools/progress.py
+工具调用的进度通知和取消（MCP progressToken / notifications/cancelled）
+
+服务器为每个请求创建RequestContext并绑定到当前上下文（contextvars，线程池中执行的
+同步工具和asyncio.to_thread都会继承）。工具在处理数据块之间调用report_progress或
+check_cancelled：请求被取消后抛出RequestCancelled，工具尽快退出并释放内存。
+"""
+
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+# 两次进度通知之间的最短间隔（秒）
+PROGRESS_INTERVAL = float(os.getenv("MCP_PROGRESS_INTERVAL", "0.5"))
+# Excel按行处理时，每隔多少行报告一次进度并检查取消
+PROGRESS_ROWS = 1000
+
+_current = contextvars.ContextVar('mcp_request_context', default=None)
+
+
+class RequestCancelled(BaseException):
+    """
+    请求已被客户端取消
+
+    继承BaseException（与asyncio.CancelledError相同），不会被工具中的
+    except Exception捕获为普通错误。
+    """
+
+
+class RequestContext:
+    """
+    单个请求的进度和取消状态
+
+    - progress_token: 客户端在 _meta.progressToken 中提供的令牌，没有时不发送进度通知
+    - send: 发送通知的函数 send(method, params)，可以在任意线程中调用
+    """
+
+    def __init__(self, request_id, progress_token=None, send: Callable = None,
+                 interval: float = PROGRESS_INTERVAL):
+        self.request_id = request_id
+        self.progress_token = progress_token
+        self.send = send
+        self.interval = interval
+        self.cancelled = threading.Event()
+        self.reason = None
+        self.progress = 0
+        self.total = None
+        self._last_sent = 0.0
+        self._last_progress = 0
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str = None) -> None:
+        self.reason = reason
+        self.cancelled.set()
+
+    def check(self) -> None:
+        """请求已取消时抛出RequestCancelled"""
+        if self.cancelled.is_set():
+            raise RequestCancelled(self.reason or f"请求已取消: {self.request_id}")
+
+    def advance(self, amount: int = 1, message: str = None, total: int = None) -> None:
+        """
+        累加进度并检查取消，按时间间隔节流发送进度通知
+
+        进度值在整个请求内累加（MCP要求同一令牌的进度值递增）。
+        """
+        self.check()
+        with self._lock:
+            self.progress += amount
+            if total is not None:
+                self.total = total
+            if self.progress_token is None or self.send is None:
+                return
+            now = time.monotonic()
+            # 进度值没有增加时不发送（同一令牌的进度值必须递增）
+            if self.progress <= self._last_progress or now - self._last_sent < self.interval:
+                return
+            self._last_sent = now
+            self._last_progress = self.progress
+            params = {'progressToken': self.progress_token, 'progress': self.progress}
+            if self.total is not None:
+                params['total'] = self.total
+            if message:
+                params['message'] = message
+        self.send('notifications/progress', params)
+
+
+def current() -> Optional[RequestContext]:
+    """当前请求的上下文（不在服务器请求中执行时为None）"""
+    return _current.get()
+
+
+def bind(context: RequestContext):
+    """把请求上下文绑定到当前上下文，返回用于unbind的令牌"""
+    return _current.set(context)
+
+
+def unbind(token) -> None:
+    _current.reset(token)
+
+
+def check_cancelled() -> None:
+    """当前请求已取消时抛出RequestCancelled"""
+    context = _current.get()
+    if context is not None:
+        context.check()
+
+
+def cancellable_sleep(seconds: float) -> None:
+    """
+    可取消的等待：在服务器请求中等待取消事件，请求被取消时立即抛出RequestCancelled
+
+    不在服务器请求中执行时等同于time.sleep。
+    """
+    context = _current.get()
+    if context is None:
+        time.sleep(seconds)
+    elif context.cancelled.wait(seconds):
+        context.check()
+
+
+def report_progress(amount: int = 1, message: str = None, total: int = None) -> None:
+    """报告当前请求的进度（同时检查取消）"""
+    context = _current.get()
+    if context is not None:
+        context.advance(amount, message, total)
+
+
+def track_rows(rows, label: str):
+    """
+    逐行透传，每PROGRESS_ROWS行报告一次进度（同时检查取消）
+
+    不在服务器请求中执行时直接返回原迭代对象，没有额外开销。
+    """
+    context = _current.get()
+    if context is None:
+        return rows
+    return _tracked_rows(rows, context, label)
+
+
+def _tracked_rows(rows, context: RequestContext, label: str):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % PROGRESS_ROWS == 0:
+            context.advance(PROGRESS_ROWS, f"{label}: {count}行")
+    context.advance(count % PROGRESS_ROWS, f"{label}: {count}行")
+
+
+def cancellable(iterable):
+    """逐项透传，每项之前检查取消；提前结束时关闭底层迭代器（例如释放网络连接）"""
+    iterator = iter(iterable)
+    try:
+        for item in iterator:
+            check_cancelled()
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
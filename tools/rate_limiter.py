@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+tools/rate_limiter.py
+GitHub API限流调度模块（令牌桶排队 + 限流响应头感知 + 抖动退避重试）
+"""
+
+import math
+import random
+import sys
+import threading
+import time
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+from tools.progress import cancellable_sleep
+
+# 按端点类别区分的默认配额: (每个周期的请求数, 周期秒数, 突发容量)
+DEFAULT_LIMITS = {
+    'search': (30, 60.0, 10),
+    'core': (5000, 3600.0, 100),
+}
+
+
+def parse_number(value) -> Optional[float]:
+    """解析数值响应头，缺失、格式错误或不是有限数时返回None"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """
+    解析Retry-After响应头（秒数或HTTP日期），返回还需要等待的秒数，无法解析时返回None
+    """
+    seconds = parse_number(value)
+    if seconds is not None:
+        return max(0.0, seconds)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """令牌桶：按固定速率补充令牌，容量限制突发请求数"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """尝试取一个令牌，成功返回0，否则返回需要等待的秒数"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimitScheduler:
+    """
+    所有GitHub请求共享的限流调度器
+
+    - 每类端点（search/core）一个令牌桶，请求超出速率时排队等待而不是失败
+    - 读取X-RateLimit-Remaining/Reset和Retry-After，配额用尽时暂停该类请求直到重置
+    - 5xx和403/429限流响应使用带抖动的指数退避重试
+    """
+
+    def __init__(self, limits: Dict[str, tuple] = None, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._buckets = {
+            name: TokenBucket(count / period, burst)
+            for name, (count, period, burst) in self.limits.items()
+        }
+        self._blocked_until = {name: 0.0 for name in self.limits}
+        self._lock = threading.Lock()
+        # 指标
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.requests = 0
+        self.waited_requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+
+    @staticmethod
+    def classify(url: str) -> str:
+        """根据URL判断端点类别"""
+        return 'search' if '/search/' in url else 'core'
+
+    def acquire(self, endpoint: str):
+        """等待直到该类端点允许发送请求（所在请求被取消时抛出RequestCancelled）"""
+        bucket = self._buckets[endpoint]
+        start = time.monotonic()
+        with self._lock:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._blocked_until[endpoint] - time.time()
+                    if wait <= 0:
+                        wait = bucket.reserve(time.monotonic())
+                if wait <= 0:
+                    break
+                # 排队等待期间请求被取消时立即退出
+                cancellable_sleep(wait)
+        finally:
+            waited = time.monotonic() - start
+            with self._lock:
+                self.queue_depth -= 1
+                self.requests += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+                if waited > 0.001:
+                    self.waited_requests += 1
+
+    def update(self, endpoint: str, headers, attempt: int = 0) -> None:
+        """
+        根据响应头更新剩余配额和暂停时间
+
+        响应头格式错误时忽略该响应头；Retry-After无法解析时按第attempt次重试的退避时间暂停
+        """
+        remaining = parse_number(headers.get('X-RateLimit-Remaining'))
+        reset = parse_number(headers.get('X-RateLimit-Reset'))
+        retry_after = headers.get('Retry-After')
+        with self._lock:
+            if remaining is not None:
+                bucket = self._buckets[endpoint]
+                bucket.tokens = min(bucket.tokens, max(0.0, remaining))
+                if remaining <= 0 and reset is not None:
+                    self._blocked_until[endpoint] = max(self._blocked_until[endpoint], reset)
+            if retry_after is not None:
+                delay = parse_retry_after(retry_after)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                    print(f"无法解析Retry-After响应头: {retry_after!r}，暂停{delay:.1f}秒", file=sys.stderr)
+                self._blocked_until[endpoint] = max(self._blocked_until[endpoint], time.time() + delay)
+
+    @staticmethod
+    def _is_rate_limited(response) -> bool:
+        """判断403/429响应是否为限流（而不是权限错误）"""
+        if response.status_code not in (403, 429):
+            return False
+        if response.status_code == 429 or 'Retry-After' in response.headers:
+            return True
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            return True
+        return 'rate limit' in response.text.lower()
+
+    def _backoff(self, attempt: int) -> float:
+        """带抖动的指数退避时间"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, url: str, send: Callable[[], object]):
+        """排队发送请求，限流和服务端错误时自动重试，返回最后一次的响应"""
+        endpoint = self.classify(url)
+        for attempt in range(self.max_retries + 1):
+            self.acquire(endpoint)
+            response = send()
+            self.update(endpoint, response.headers, attempt)
+
+            rate_limited = self._is_rate_limited(response)
+            if not (rate_limited or response.status_code >= 500) or attempt == self.max_retries:
+                return response
+
+            with self._lock:
+                self.retries += 1
+                if rate_limited:
+                    self.rate_limited += 1
+            response.close()
+            # 限流响应已通过update设置暂停时间，下一次acquire会等待到恢复
+            delay = self._backoff(attempt)
+            print(f"GitHub请求重试({attempt + 1}/{self.max_retries}): "
+                  f"{response.status_code} {url}，{delay:.1f}秒后重试", file=sys.stderr)
+            cancellable_sleep(delay)
+
+    def stats(self) -> Dict[str, float]:
+        """返回调度器指标"""
+        with self._lock:
+            return {
+                'queue_depth': self.queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'requests': self.requests,
+                'waited_requests': self.waited_requests,
+                'total_wait': round(self.total_wait, 3),
+                'avg_wait': round(self.total_wait / self.requests, 4) if self.requests else 0.0,
+                'max_wait': round(self.max_wait, 3),
+                'retries': self.retries,
+                'rate_limited': self.rate_limited,
+                'blocked_until': {
+                    name: until for name, until in self._blocked_until.items() if until > time.time()
+                }
+            }
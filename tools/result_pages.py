@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+tools/result_pages.py
+服务器端保存的计算结果和基于游标的分页读取（大型对比差异、目录列表等）
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence
+
+# 同时保留的结果数量，超出时按LRU释放
+RESULT_HANDLES = int(os.getenv("MCP_RESULT_HANDLES", "16"))
+# 结果在最后一次访问后保留的秒数
+RESULT_TTL = float(os.getenv("MCP_RESULT_TTL", "900"))
+# 保留结果的估算内存上限（MB），超出时按LRU释放
+RESULT_CACHE_MB = int(os.getenv("MCP_RESULT_CACHE_MB", "256"))
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class PagedResult:
+    """
+    可分页读取的结果，由若干命名分区组成
+
+    - sections: 分区名 → 支持len()和切片的序列（只在读取某一页时切片，不会整体转换）
+    - item: 分区名 → 把序列中的一项转换为返回条目的函数（默认原样返回）
+    - line: 分区名 → 条目的文本格式（text格式下使用）
+    - owner: 需要与结果一起保留的对象（例如外存对比的临时目录）
+    - size: 结果（包括owner）占用内存的估算字节数，用于ResultStore的内存上限
+    """
+
+    def __init__(self, kind: str, sections: Dict[str, Sequence],
+                 item: Dict[str, Callable] = None, line: Dict[str, Callable] = None,
+                 owner: Any = None, size: int = 0):
+        self.kind = kind
+        self.sections = sections
+        self.item = item or {}
+        self.line = line or {}
+        self.owner = owner
+        self.size = size
+
+    def page(self, section: str, offset: int, size: int):
+        """读取一页，返回 (条目列表, 分区总数)"""
+        sequence = self.sections[section]
+        total = len(sequence)
+        convert = self.item.get(section)
+        items = sequence[offset:offset + size]
+        if convert is not None:
+            items = [convert(value) for value in items]
+        return list(items), total
+
+
+class ZippedSequence:
+    """按位置组合多个等长序列，只支持切片，切片时才读取对应位置的元素"""
+
+    def __init__(self, *sequences):
+        self.sequences = sequences
+
+    def __len__(self):
+        return len(self.sequences[0])
+
+    def __getitem__(self, index):
+        return list(zip(*(sequence[index] for sequence in self.sequences)))
+
+
+class MappedSequence:
+    """对序列的切片结果逐项应用函数（只支持切片）"""
+
+    def __init__(self, sequence, func: Callable):
+        self.sequence = sequence
+        self.func = func
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def __getitem__(self, index):
+        return [self.func(value) for value in self.sequence[index]]
+
+
+def make_cursor(handle: str, section: str, offset: int, size: int) -> str:
+    """生成游标（对客户端是不透明字符串）"""
+    return f"{handle}:{section}:{offset}:{size}"
+
+
+def parse_cursor(cursor: str):
+    """解析游标，返回 (句柄, 分区名, 偏移, 页大小)，格式无效时抛出ValueError"""
+    parts = str(cursor).split(':')
+    if len(parts) != 4:
+        raise ValueError(f"无效的游标: {cursor}")
+    handle, section, offset, size = parts
+    return handle, section, int(offset), int(size)
+
+
+def page_size_of(value, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """解析页大小参数（0或空使用默认值，超过上限时截断）"""
+    size = int(value or 0) or default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+class ResultStore:
+    """
+    按句柄保存计算结果，供后续分页读取
+
+    - 条目在ttl秒内没有被访问时过期
+    - 条目数超过max_handles或估算内存超过max_bytes时按LRU释放
+    - 单个结果的估算内存超过max_bytes时不保存
+    """
+
+    def __init__(self, max_handles: int = 16, ttl: float = 900.0,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.max_handles = max_handles
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.created = 0
+        self.pages = 0
+        self.expired = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    def _remove(self, handle: str) -> bool:
+        entry = self._entries.pop(handle, None)
+        if entry is None:
+            return False
+        self._total_bytes -= entry[0].size
+        return True
+
+    def _expire(self, now: float) -> None:
+        for handle in [h for h, (_, accessed) in self._entries.items() if now - accessed > self.ttl]:
+            self._remove(handle)
+            self.expired += 1
+
+    def put(self, result: PagedResult) -> Optional[str]:
+        """保存结果，返回句柄；估算内存超过上限时不保存，返回None"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if result.size > self.max_bytes:
+                self.rejected += 1
+                return None
+            handle = secrets.token_hex(8)
+            self._entries[handle] = (result, now)
+            self._total_bytes += result.size
+            self.created += 1
+            while len(self._entries) > self.max_handles or self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evicted += 1
+        return handle
+
+    def get(self, handle: str) -> Optional[PagedResult]:
+        """按句柄取出结果并刷新访问时间，不存在或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            self._entries[handle] = (entry[0], now)
+            self._entries.move_to_end(handle)
+            return entry[0]
+
+    def publish(self, result: PagedResult, page_size: int = 0):
+        """
+        保存结果，返回 (句柄, 各非空分区第一页的游标)
+
+        所有分区都为空（没有可读取的页）或结果超过内存上限时不保存，返回 (None, {})。
+        """
+        sections = [section for section, sequence in result.sections.items() if len(sequence)]
+        handle = self.put(result) if sections else None
+        if handle is None:
+            return None, {}
+        size = page_size_of(page_size)
+        return handle, {section: make_cursor(handle, section, 0, size) for section in sections}
+
+    def release(self, handle: str) -> bool:
+        """主动释放结果"""
+        with self._lock:
+            return self._remove(handle)
+
+    def page(self, cursor: str, page_size: int = 0):
+        """
+        按游标读取一页，返回 (分页数据, 条目的文本格式函数或None)
+
+        page_size为0时使用游标中的页大小。句柄不存在或已过期时抛出KeyError。
+        """
+        handle, section, offset, size = parse_cursor(cursor)
+        size = page_size_of(page_size, size)
+        result = self.get(handle)
+        if result is None:
+            raise KeyError(f"结果不存在或已过期: {handle}")
+        if section not in result.sections:
+            raise ValueError(f"结果中没有分区: {section}")
+        items, total = result.page(section, max(0, offset), size)
+        with self._lock:
+            self.pages += 1
+        end = offset + len(items)
+        return {
+            'handle': handle,
+            'kind': result.kind,
+            'section': section,
+            'offset': offset,
+            'total': total,
+            'items': items,
+            'next_cursor': make_cursor(handle, section, end, size) if end < total else None,
+        }, result.line.get(section)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'handles': len(self._entries),
+                'max_handles': self.max_handles,
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'created': self.created,
+                'pages': self.pages,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'rejected': self.rejected,
+            }
+
+
+def format_page(page: Dict[str, Any], line: Callable = None) -> str:
+    """分页结果的文本格式"""
+    start = page['offset'] + 1 if page['items'] else page['offset']
+    lines = [f"📄 {page['section']}: 第{start}-{page['offset'] + len(page['items'])}项 / 共{page['total']}项"]
+    for item in page['items']:
+        lines.append(f"  - {line(item) if line else item}")
+    if page['next_cursor']:
+        lines.append(f"下一页游标: {page['next_cursor']}")
+    else:
+        lines.append("已到最后一页")
+    return "\n".join(lines)
+
+
+def format_cursors(cursors: Dict[str, str], labels: Dict[str, str] = None, size: int = 0) -> str:
+    """完整结果分页读取入口的文本格式（size为结果的估算内存，超过上限未保存时给出说明）"""
+    if not cursors:
+        if size > result_store.max_bytes:
+            return (f"\n\n📄 完整结果约{size / 1024 / 1024:.0f}MB，超过分页结果的内存上限"
+                    f"（{result_store.max_bytes // 1024 // 1024}MB，MCP_RESULT_CACHE_MB），未保留分页读取")
+        return ""
+    lines = [f"\n\n📄 完整结果可通过 fetch_result_page 分页获取（{int(result_store.ttl)}秒内未访问将释放）:"]
+    for section, cursor in cursors.items():
+        lines.append(f"  - {(labels or {}).get(section, section)}: {cursor}")
+    return "\n".join(lines)
+
+
+# 全局结果存储（Excel工具和GitHub工具共用）
+result_store = ResultStore(RESULT_HANDLES, RESULT_TTL, RESULT_CACHE_MB * 1024 * 1024)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+tools/tool_result.py
+工具的结构化返回值，以及MCP工具调用结果的构建和JSON编码
+"""
+
+import datetime
+import json
+import os
+from typing import Any, Callable, Dict
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    # 未安装orjson时使用标准库json
+    ORJSON_AVAILABLE = False
+
+# 返回格式: text（可读的文本报告）或 json（结构化数据）
+RESPONSE_FORMATS = ("text", "json")
+# 详细程度: compact（只有汇总字段）或 verbose（附带明细），只影响json格式
+VERBOSITY_LEVELS = ("compact", "verbose")
+DEFAULT_RESPONSE_FORMAT = os.getenv("MCP_RESPONSE_FORMAT", "text").strip().lower()
+DEFAULT_VERBOSITY = os.getenv("MCP_RESPONSE_VERBOSITY", "verbose").strip().lower()
+
+# 工具调用参数中由服务器处理的保留参数，不会传给工具函数
+FORMAT_ARGUMENT = "response_format"
+VERBOSITY_ARGUMENT = "verbosity"
+
+
+def _default(value):
+    """JSON编码器无法直接处理的值"""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+
+def encode_json(obj) -> bytes:
+    """把对象编码为紧凑的UTF-8 JSON（优先使用orjson）"""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # 超出64位的整数等orjson不支持的值
+            pass
+    return _encoder.encode(obj).encode('utf-8')
+
+
+def dumps(obj) -> str:
+    """encode_json的字符串版本"""
+    return encode_json(obj).decode('utf-8')
+
+
+class ToolError:
+    """
+    工具的错误返回值（参数错误、文件不存在、执行失败等）
+
+    以文本返回给客户端，并按MCP规范在调用结果中标记isError；服务器据此把调用计为error。
+    """
+
+    __slots__ = ('message',)
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class ToolResult:
+    """
+    工具的结构化返回值
+
+    - data: 汇总字段（compact和verbose都返回）
+    - details: 明细字段（只在verbose时合并到data中）
+    - text: 生成文本报告的函数，只在text格式下调用
+    """
+
+    __slots__ = ('data', 'details', 'text')
+
+    def __init__(self, data: Dict[str, Any], text: Callable[[], str] = None,
+                 details: Dict[str, Any] = None):
+        self.data = data
+        self.details = details or {}
+        self.text = text
+
+    def structured(self, verbose: bool = True) -> Dict[str, Any]:
+        """按详细程度返回结构化数据"""
+        if verbose and self.details:
+            return {**self.data, **self.details}
+        return self.data
+
+    def render_text(self) -> str:
+        """文本报告（没有提供文本报告时使用缩进的JSON）"""
+        if self.text is not None:
+            return self.text()
+        return json.dumps(self.structured(), ensure_ascii=False, indent=2, default=_default)
+
+    def __str__(self):
+        return self.render_text()
+
+
+class EncodedResponse:
+    """
+    已编码好的JSON-RPC响应行（以换行结尾）
+
+    工具调用的结果在工具线程中渲染和编码，事件循环线程只负责写出data。
+    status为调用结果状态（ok/error），用于指标统计。
+    """
+
+    __slots__ = ('data', 'status')
+
+    def __init__(self, data: bytes, status: str = "ok"):
+        self.data = data
+        self.status = status
+
+
+def as_bool(value) -> bool:
+    """解析工具参数中的布尔值（可能以字符串传入）"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def pop_output_options(arguments: Dict[str, Any]):
+    """
+    从工具调用参数中取出返回格式和详细程度
+
+    返回 (response_format, verbose)，取值无效时抛出ValueError。
+    """
+    response_format = str(arguments.pop(FORMAT_ARGUMENT, None) or DEFAULT_RESPONSE_FORMAT).lower()
+    verbosity = str(arguments.pop(VERBOSITY_ARGUMENT, None) or DEFAULT_VERBOSITY).lower()
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f"不支持的返回格式: {response_format}（可选 {'、'.join(RESPONSE_FORMATS)}）")
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"不支持的详细程度: {verbosity}（可选 {'、'.join(VERBOSITY_LEVELS)}）")
+    return response_format, verbosity == "verbose"
+
+
+def build_call_result(result, response_format: str = "text", verbose: bool = True,
+                      structured_content: bool = False) -> Dict[str, Any]:
+    """
+    把工具返回值转换为tools/call的result
+
+    - 普通返回值（提示信息）始终作为文本返回
+    - ToolError作为文本返回，并标记isError
+    - ToolResult在text格式下返回文本报告，json格式下返回编码后的结构化数据
+    - structured_content: 客户端支持structuredContent（协议版本2025-06-18及以后）时，
+      同时在structuredContent中返回结构化数据
+    """
+    if isinstance(result, ToolError):
+        return {"content": [{"type": "text", "text": result.message}], "isError": True}
+    if not isinstance(result, ToolResult):
+        return {"content": [{"type": "text", "text": str(result)}]}
+
+    data = result.structured(verbose)
+    text = dumps(data) if response_format == "json" else result.render_text()
+    call_result = {"content": [{"type": "text", "text": text}]}
+    if structured_content:
+        call_result["structuredContent"] = data
+    return call_result